@@ -11,13 +11,19 @@ two formats.
 Usage
 -----
 $ python append_scenarios.py --source new_scenarios.json --target ESLFeeder/Config/scenarios.json
+
+# Large catalogs (JSON array or JSON Lines): constant memory
+$ python append_scenarios.py --stream --source catalog.jsonl --target ESLFeeder/Config/scenarios.json --output out.json
 """
 
 import argparse
 import json
 import re
+import sys
 from pathlib import Path
 
+from scenario_catalog import expand_catalog, load_catalog
+
 # ----- Configuration ---------------------------------------------------------
 
 # Maps field names from the source file to the target file
@@ -184,6 +190,65 @@ def transform_scenario(source_scenario):
     return target_scenario
 
 
+# ----- Streaming ---------------------------------------------------------------
+
+def gate_members(scenario, shared):
+    """
+    The (reason_code, process_level) groups ``scenario`` is checked in and its
+    (id, required, forbidden) condition tuples, read like normalize_scenarios.
+    Inactive and skip scenarios are left out (skip scenarios only affect
+    coverage gaps).  Equal condition tuples are shared through ``shared``.
+    """
+    from evaluate_scenarios import normalize_scenarios
+    normalized = normalize_scenarios({"scenarios": [scenario]})
+    if not normalized or normalized[0]["is_skip_scenario"]:
+        return [], None
+    s = normalized[0]
+    required = tuple(s["required"])
+    forbidden = tuple(s["forbidden"])
+    member = (s["id"], shared.setdefault(required, required), shared.setdefault(forbidden, forbidden))
+    return [(s["reason_code"], level) for level in sorted(s["process_levels"])], member
+
+
+def stream_scenarios(source_path, target_path, output_path, collect=True):
+    """
+    Transform and write scenarios one at a time.
+
+    The source may be a JSON array or JSON Lines; only the IDs of the target
+    scenarios are kept while writing.  With ``collect`` each new scenario's
+    id and condition names are kept per (reason, level) group, and the target
+    is read a second time for the groups the new scenarios fall in, since
+    overlaps are only possible within a group.
+    Returns (number written, {(reason, level): [(id, required, forbidden)]}, new ids).
+    """
+    from json_stream import ArrayWriter, iter_scenarios
+
+    existing_ids = {s["id"] for s in iter_scenarios(target_path)}
+
+    groups, new_ids, shared = {}, set(), {}
+    with open(output_path, "w", encoding="utf-8") as f, ArrayWriter(f) as writer:
+        for source_scenario in iter_scenarios(source_path):
+            if source_scenario["id"] in existing_ids:
+                print(f"Warning: Scenario ID {source_scenario['id']} already exists in target. Skipping.")
+                continue
+            transformed = transform_scenario(source_scenario)
+            writer.write(transformed)
+            if collect:
+                keys, member = gate_members(transformed, shared)
+                for key in keys:
+                    groups.setdefault(key, []).append(member)
+                if keys:
+                    new_ids.add(member[0])
+
+    if groups:
+        for scenario in iter_scenarios(target_path):
+            keys, member = gate_members(scenario, shared)
+            for key in keys:
+                if key in groups:
+                    groups[key].append(member)
+    return writer.count, groups, new_ids
+
+
 # ----- CLI -------------------------------------------------------------------
 
 def main():
@@ -191,6 +256,10 @@ def main():
     ap.add_argument("-s", "--source", required=True, help="Path to source JSON file with new scenarios")
     ap.add_argument("-t", "--target", required=True, help="Path to the existing scenarios.json to check for duplicate IDs")
     ap.add_argument("-o", "--output", required=True, help="Path to write the new, transformed scenarios")
+    ap.add_argument("--skip-overlap-check", action="store_true",
+                    help="Do not check the new scenarios for overlaps with the existing ones")
+    ap.add_argument("--stream", action="store_true",
+                    help="Read the source (JSON array or JSON Lines) and write the output one scenario at a time")
     args = ap.parse_args()
 
     source_path = Path(args.source)
@@ -204,9 +273,22 @@ def main():
         print(f"Error: Target file for duplicate check not found at {target_path}")
         return
 
+    if args.stream:
+        count, groups, new_ids = stream_scenarios(
+            source_path, target_path, output_path, collect=not args.skip_overlap_check)
+        print(f"Successfully transformed {count} new scenarios to {output_path.resolve()}")
+        if not args.skip_overlap_check:
+            from check_scenario_overlap import run_group_gate
+            status = run_group_gate(groups, new_ids)
+            if status:
+                print("Error: overlap check failed. Fix the conditions or rerun with --skip-overlap-check.")
+                sys.exit(status)
+        return
+
     # Load source and target files
     source_scenarios = json.loads(source_path.read_text())
-    target_data = json.loads(target_path.read_text())
+    # Today's layout even when the target is a compact catalog (scenario_catalog.py)
+    target_data = expand_catalog(load_catalog(target_path))
 
     existing_scenarios = target_data.get("scenarios", [])
     existing_ids = {s["id"] for s in existing_scenarios}
@@ -225,6 +307,14 @@ def main():
 
     print(f"Successfully transformed {len(scenarios_to_load)} new scenarios to {output_path.resolve()}")
 
+    # Gate: the new scenarios must not overlap (or be shadowed by) existing ones
+    if not args.skip_overlap_check:
+        from check_scenario_overlap import run_gate
+        status = run_gate(target_data, scenarios_to_load)
+        if status:
+            print("Error: overlap check failed. Fix the conditions or rerun with --skip-overlap-check.")
+            sys.exit(status)
+
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
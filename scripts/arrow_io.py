@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+arrow_io.py
+-----------
+Read and write leave input and processed files as Parquet or Arrow IPC
+(Feather v2) with a fixed schema, instead of CSV text.
+
+Every known column has a fixed Arrow type:
+
+- dates (PAY_START_DATE, CTPL_END, RTW_FT, ...)       date32
+- ids and small ints (CLAIM_ID, PROCESS_LEVEL, ...)   int64 / int16 / int8
+- amounts and hours (PAY_RATE, PTO_AVAIL, ...)        float64
+- Y/N flags (CTPL_FORM, EE_PTO_SUPP, ...)             bool
+- scenario hours (STD_HOURS, PTO_HRS, ...)            float64
+- SCENARIO_ID int32, ENTRY_DATE timestamp[s], everything else string
+
+Empty cells are nulls.  The text layout of each column (M/D/YYYY or
+MM/DD/YYYY 00:00:00, two decimals, ...) is kept in the field metadata, so
+reading a file back gives exactly the strings the CSV had and the pipeline
+(evaluate_scenarios.load_input / write_output accept .parquet and .arrow
+paths) produces the same results.  A column whose values mix layouts (e.g.
+"0" and "0.74") is stored with the layout of the majority and read back in
+that layout; input values that do not fit the column type at all are an
+error.  Scenario hour columns that hold literal text (a "string" field such
+as "variables.PtoUsable", written as-is like the feeder does), and flag
+columns with values other than Y/N (e.g. "y", which the scorer accepts), are
+stored as strings for that file, with a warning.
+
+Readers can select columns and filter on PROCESS_LEVEL and REASON_CODE; the
+filters are pushed down to the Parquet row groups.  REASON_CODE is matched
+trimmed and case-insensitively, as the scorer reads it.
+
+Usage
+-----
+$ python arrow_io.py -i ../ESL_Test_Hao_2025-04-25_Input.csv -o input.parquet
+$ python arrow_io.py -i processed.parquet -o subset.csv --columns CLAIM_ID,STD_HOURS,PTO_HRS --process-level 500
+$ python arrow_io.py -i processed.parquet -o bonding.arrow --reason-code BONDING
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from evaluate_scenarios import (ARROW_SUFFIXES, COLUMN_MAPPINGS, REASON_CODE_NORMALIZATION, _parse_dates,
+                                _parse_numbers, format_datetime, format_doubles, map_unique)
+from row_store import DATE_FORMATS, SCHEMA, encode_column, format_days, format_fixed
+
+
+# ----- Configuration ---------------------------------------------------------
+
+PARQUET_SUFFIXES = {".parquet", ".pq"}
+IPC_SUFFIXES = set(ARROW_SUFFIXES) - PARQUET_SUFFIXES
+
+DEFAULT_ROW_GROUP_ROWS = 65_536
+
+# Field metadata keys
+FORMAT_KEY = b"esl_format"
+NORMALIZED_KEY = b"esl_normalized"
+
+# Number columns that hold whole numbers
+INTEGER_TYPES = {
+    "WEEK_OF_PP": pa.int8(),
+    "PROCESS_LEVEL": pa.int16(),
+    "CLAIM_ID": pa.int64(),
+    "CHECK_SEQ": pa.int64(),
+    "EMPLOYEE": pa.int64(),
+}
+
+# Scenario output columns that hold hours (double fields)
+HOUR_COLUMNS = [
+    "STD_HOURS", "PTO_HRS", "LOA_NO_HRS_PAID", "BASIC_SICK_HRS", "BRIDGEPORT_SICK_HRS",
+    "LM_PTO_HRS", "LM_SICK_HRS", "ATO_HRS", "EXEMPT_HRS",
+]
+
+OUTPUT_TYPES = dict(
+    {column: "double" for column in HOUR_COLUMNS},
+    SCENARIO_ID="int32",
+    ENTRY_DATE="datetime",
+    # An input flag, but scenarios also write numbers into it
+    CHECK_KRONOS="text",
+)
+
+ENTRY_DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+# Values of a column stored as bool
+FLAG_TEXTS = ["", "Y", "N"]
+
+
+class SchemaError(ValueError):
+    """Raised when a column's values do not fit its fixed type."""
+
+
+def column_kind(name):
+    """Kind of a column in the fixed schema: date, integer, number, flag, double, int32, datetime or text."""
+    name = name.strip()
+    source = next((s for s, target in COLUMN_MAPPINGS.items() if target == name), name)
+    if name in OUTPUT_TYPES:
+        return OUTPUT_TYPES[name]
+    kind = SCHEMA.get(source, "text")
+    if kind == "number" and source in INTEGER_TYPES:
+        return "integer"
+    return "text" if kind == "category" else kind
+
+
+def _integer_type(name):
+    name = name.strip()
+    source = next((s for s, target in COLUMN_MAPPINGS.items() if target == name), name)
+    return INTEGER_TYPES[source]
+
+
+def is_arrow_path(path):
+    return Path(path).suffix.lower() in ARROW_SUFFIXES
+
+
+# ----- Text -> Arrow ---------------------------------------------------------
+
+def _invalid(name, texts, bad):
+    examples = ", ".join(repr(v) for v in pd.unique(texts[bad])[:3])
+    raise SchemaError(f"Column {name}: {int(bad.sum())} value(s) do not fit its type, e.g. {examples}")
+
+
+def _decimals(text):
+    return len(text.partition(".")[2]) if "." in text else 0
+
+
+def _majority(counts):
+    return max(counts.items(), key=lambda item: item[1])[0] if counts else None
+
+
+def _check(name, texts, bad):
+    if bad.any():
+        _invalid(name, texts, bad)
+
+
+def _date_array(name, texts):
+    column = encode_column(texts, "date")
+    if column.kind == "date":
+        days = np.asarray(column.arrays["days"])
+        mask = ~column.present(len(texts))
+        return pa.array(np.where(mask, 0, days), pa.date32(), mask=mask), column.params["layout"], False
+
+    present = texts != ""
+    parsed = map_unique(texts, _parse_dates)
+    _check(name, texts, present & np.isnat(parsed))
+    days = parsed.astype("datetime64[D]")
+    _check(name, texts, present & (days.astype(parsed.dtype) != parsed))
+    shown, first = np.unique(texts[present], return_index=True)
+    shown_days = days[present][first].astype(np.int64)
+    counts = {layout: int((np.array(format_days(shown_days, layout), dtype=object) == shown).sum())
+              for layout in DATE_FORMATS}
+    layout = _majority(counts) or next(iter(DATE_FORMATS))
+    values = np.where(present, days.astype(np.int64), 0).astype(np.int32)
+    return pa.array(values, pa.date32(), mask=~present), layout, True
+
+
+def _number_array(name, texts, integer_type=None):
+    column = encode_column(texts, "number")
+    present = texts != ""
+    if column.kind == "number":
+        scale, normalized = column.params["scale"], False
+        values = column.numbers(len(texts))
+    else:
+        values = map_unique(texts, _parse_numbers)
+        _check(name, texts, present & np.isnan(values))
+        scales = pd.Series([_decimals(t) for t in texts[present]]).value_counts()
+        scale, normalized = (int(scales.idxmax()) if len(scales) else 0), True
+    if integer_type is not None:
+        _check(name, texts, present & (values != np.round(values)))
+        if scale:
+            _invalid(name, texts, present & np.array([_decimals(t) > 0 for t in texts]))
+        return pa.array(np.where(present, values, 0).astype(np.int64), mask=~present).cast(integer_type), 0, normalized
+    return pa.array(values, pa.float64(), mask=~present), scale, normalized
+
+
+def _flag_array(name, texts):
+    _check(name, texts, ~np.isin(texts, FLAG_TEXTS))
+    return pa.array(texts == "Y", pa.bool_(), mask=texts == "")
+
+
+def _parse_double(text):
+    """double.Parse of format_double's output (float() is correctly rounded, pd.to_numeric is not)."""
+    if text in ("∞", "-∞"):
+        return np.inf if text == "∞" else -np.inf
+    try:
+        return float(text) if text else np.nan
+    except ValueError:
+        return None
+
+
+def _double_array(name, texts):
+    present = texts != ""
+    values = map_unique(texts, lambda u: np.array([_parse_double(t) for t in u], dtype=object))
+    _check(name, texts, np.equal(values, None))
+    values = values.astype(np.float64)
+    normalized = bool((format_doubles(values[present]) != texts[present]).any())
+    return pa.array(values, pa.float64(), mask=~present), normalized
+
+
+def _datetime_array(name, texts):
+    present = texts != ""
+    parsed = pd.to_datetime(pd.Series(texts, dtype=object).where(present, None), format=ENTRY_DATE_FORMAT,
+                            errors="coerce").to_numpy(dtype="datetime64[s]")
+    _check(name, texts, present & np.isnat(parsed))
+    return pa.array(parsed, pa.timestamp("s"), mask=~present)
+
+
+def to_arrow(frame):
+    """
+    A frame of strings (load_input / score_frame) as an Arrow table with the
+    fixed schema.  Returns (table, warnings about columns whose text is not
+    kept exactly: mixed layouts, or hour columns holding literal text).
+    """
+    arrays, fields, warnings = [], [], []
+    for name in frame.columns:
+        texts = frame[name].fillna("").to_numpy(dtype=object)
+        kind = column_kind(name)
+        if kind != "text":
+            # Typed values are stored without the padding of the export
+            texts = map_unique(texts, lambda u: np.array([str(t).strip() for t in u], dtype=object))
+        if kind == "flag" and not np.isin(texts, FLAG_TEXTS).all():
+            # e.g. "y": the scorer compares flags case-insensitively, so keep the text as it is
+            warnings.append(f"Column {name} holds values other than Y/N; stored as text")
+            kind = "text"
+        if kind == "double":
+            try:
+                _double_array(name, texts)
+            except SchemaError as exc:
+                # The feeder writes literal text into hour columns for string fields
+                warnings.append(f"{exc}; stored as text")
+                kind = "text"
+        metadata = {FORMAT_KEY: kind.encode()}
+        changed = False
+        if kind == "date":
+            array, layout, changed = _date_array(name, texts)
+            metadata[FORMAT_KEY] = f"date:{layout}".encode()
+        elif kind in ("number", "integer"):
+            array, scale, changed = _number_array(name, texts, _integer_type(name) if kind == "integer" else None)
+            metadata[FORMAT_KEY] = f"{kind}:{scale}".encode()
+        elif kind == "flag":
+            array = _flag_array(name, texts)
+        elif kind == "double":
+            array, changed = _double_array(name, texts)
+        elif kind == "int32":
+            array, _, changed = _number_array(name, texts, pa.int32())
+        elif kind == "datetime":
+            array = _datetime_array(name, texts)
+        else:
+            array = pa.array(texts, pa.string())
+        if changed:
+            metadata[NORMALIZED_KEY] = b"1"
+            warnings.append(f"Column {name} mixes text layouts; stored in its most common layout")
+        arrays.append(array)
+        fields.append(pa.field(name, array.type, metadata=metadata))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields)), warnings
+
+
+# ----- Arrow -> text ---------------------------------------------------------
+
+def _texts(field, column):
+    """CSV strings for one Arrow column, in the layout recorded in its metadata."""
+    kind, _, param = (field.metadata or {}).get(FORMAT_KEY, b"text").decode().partition(":")
+    present = ~np.asarray(column.is_null().to_numpy(zero_copy_only=False), dtype=bool)
+    if kind == "date":
+        days = column.cast(pa.int32()).fill_null(0).to_numpy()
+        texts = map_unique(days, lambda u: np.array(format_days(u.astype(np.int64), param), dtype=object))
+    elif kind in ("number", "integer", "int32"):
+        scale = int(param or 0)
+        values = column.cast(pa.float64()).fill_null(0).to_numpy()
+        texts = map_unique(values, lambda u: np.array(
+            [format_fixed(int(round(v * 10 ** scale)), scale) for v in u], dtype=object))
+    elif kind == "flag":
+        texts = np.where(column.fill_null(False).to_numpy(zero_copy_only=False), "Y", "N").astype(object)
+    elif kind == "double":
+        texts = format_doubles(column.fill_null(0).to_numpy())
+    elif kind == "datetime":
+        moments = column.cast(pa.timestamp("s")).cast(pa.int64()).fill_null(0).to_numpy()
+        texts = map_unique(moments, lambda u: np.array(
+            [format_datetime(pd.Timestamp(int(v), unit="s")) for v in u], dtype=object))
+    else:
+        texts = np.asarray(column.fill_null("").to_numpy(zero_copy_only=False), dtype=object)
+    texts = np.asarray(texts, dtype=object)
+    texts[~present] = ""
+    return texts
+
+
+def from_arrow(table):
+    """An Arrow table written by to_arrow as a frame of strings (what load_input returns)."""
+    return pd.DataFrame({field.name: _texts(field, table.column(field.name).combine_chunks())
+                         for field in table.schema})
+
+
+# ----- Files -----------------------------------------------------------------
+
+def _format(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in PARQUET_SUFFIXES:
+        return "parquet"
+    if suffix in IPC_SUFFIXES:
+        return "ipc"
+    raise ValueError(f"Not a Parquet or Arrow file: {path}")
+
+
+def write_arrow(frame, path, row_group_rows=DEFAULT_ROW_GROUP_ROWS):
+    """Write a frame of strings as Parquet or Arrow IPC (by suffix); returns to_arrow's warnings."""
+    table, warnings = to_arrow(frame)
+    if _format(path) == "parquet":
+        pq.write_table(table, path, compression="zstd", row_group_size=row_group_rows)
+    else:
+        feather.write_feather(table, path, compression="zstd", chunksize=row_group_rows)
+    return warnings
+
+
+def reason_code_keys(texts):
+    """REASON_CODE as the scorer compares it: trimmed, normalized (clean_frame) and upper-cased."""
+    return map_unique(texts, lambda u: np.array(
+        [REASON_CODE_NORMALIZATION.get(t.strip(), t.strip()).upper() for t in u], dtype=object))
+
+
+def row_filter(process_levels=None, reason_codes=None):
+    """
+    Dataset filter on PROCESS_LEVEL / REASON_CODE (None when neither is
+    given).  REASON_CODE is stored as the input had it, so it is compared
+    trimmed and upper-cased, like the scorer does.
+    """
+    expression = None
+    if process_levels:
+        expression = ds.field("PROCESS_LEVEL").isin([int(level) for level in process_levels])
+    if reason_codes:
+        stored = pc.utf8_upper(pc.utf8_trim_whitespace(ds.field("REASON_CODE")))
+        reasons = stored.isin([code.strip().upper() for code in reason_codes])
+        expression = reasons if expression is None else expression & reasons
+    return expression
+
+
+def read_arrow(path, columns=None, process_levels=None, reason_codes=None):
+    """
+    Read a Parquet / Arrow IPC file, optionally only ``columns`` and only the
+    rows in the given process levels and reason codes.
+    """
+    dataset = ds.dataset(path, format=_format(path))
+    table = dataset.to_table(columns=list(columns) if columns else None,
+                             filter=row_filter(process_levels, reason_codes))
+    if reason_codes and "REASON_CODE" in table.column_names:
+        # The scorer's own comparison decides
+        texts = np.asarray(table.column("REASON_CODE").fill_null("").to_numpy(zero_copy_only=False), dtype=object)
+        table = table.filter(pa.array(np.isin(reason_code_keys(texts), [c.strip().upper() for c in reason_codes])))
+    # Projection keeps the field metadata of the file schema
+    schema = pa.schema([dataset.schema.field(name) for name in table.column_names])
+    return table.cast(schema) if table.schema != schema else table
+
+
+def read_frame(path, columns=None, process_levels=None, reason_codes=None):
+    """read_arrow as a frame of strings."""
+    return from_arrow(read_arrow(path, columns, process_levels, reason_codes))
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert leave input / processed files between CSV, Parquet and Arrow.")
+    ap.add_argument("-i", "--input", required=True, help="CSV, .parquet or .arrow file")
+    ap.add_argument("-o", "--output", required=True, help="CSV, .parquet or .arrow file to write")
+    ap.add_argument("--columns", help="Comma-separated columns to keep")
+    ap.add_argument("--process-level", action="append", help="Keep only this PROCESS_LEVEL (repeatable)")
+    ap.add_argument("--reason-code", action="append", help="Keep only this REASON_CODE (repeatable)")
+    args = ap.parse_args()
+
+    if not Path(args.input).is_file():
+        print(f"Error: input not found: {args.input}")
+        sys.exit(1)
+    columns = [c.strip() for c in args.columns.split(",")] if args.columns else None
+
+    if is_arrow_path(args.input):
+        frame = read_frame(args.input, columns, args.process_level, args.reason_code)
+    else:
+        from evaluate_scenarios import load_input
+        frame = load_input(args.input)
+        if args.process_level:
+            frame = frame[pd.to_numeric(frame["PROCESS_LEVEL"].str.strip(), errors="coerce")
+                          .isin([int(level) for level in args.process_level])]
+        if args.reason_code:
+            frame = frame[np.isin(reason_code_keys(frame["REASON_CODE"].to_numpy(dtype=object)),
+                                  [c.strip().upper() for c in args.reason_code])]
+        if columns:
+            frame = frame[columns]
+
+    try:
+        if is_arrow_path(args.output):
+            warnings = write_arrow(frame, args.output)
+        else:
+            frame.to_csv(args.output, index=False, lineterminator="\n")
+            warnings = []
+    except SchemaError as exc:
+        print(f"Error: {exc}")
+        sys.exit(1)
+
+    for warning in warnings:
+        print(f"warning: {warning}")
+    size = Path(args.output).stat().st_size
+    print(f"{len(frame)} rows, {len(frame.columns)} columns → {Path(args.output).resolve()} "
+          f"({size / 2 ** 20:.2f} MB, input {Path(args.input).stat().st_size / 2 ** 20:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Benchmarks for the scenario tooling.
+
+- generators  synthetic scenario matrices, workbook-style scenario JSON,
+              scenarios.json catalogs and leave-input CSVs
+- suites      the benchmark cases (setup + timed run per size)
+- runner      measurement (wall time, peak RSS, throughput), JSON history
+              and regression checks against a stored baseline
+
+Run from the scripts directory:
+
+    python -m benchmarks --preset quick
+"""
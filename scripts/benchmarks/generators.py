@@ -0,0 +1,341 @@
+"""
+Synthetic inputs shaped like the real files.
+
+- generate_matrix(n)            the scenario matrix sheet (as read by scenario_to_json.py)
+- generate_source_scenarios(n)  workbook-format scenarios (new_scenarios.json)
+- generate_flat_updates(n)      ESLScenarios.json style flat "updates" dicts
+- generate_catalog(n)           a scenarios.json document
+- generate_input_frame(rows)    a leave-input file (ESL_Test_*_Input.csv columns)
+- write_input_csv(path, rows)   the same, written in chunks so 10M rows fit in memory
+
+Everything is seeded, so the same size always produces the same data.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from append_scenarios import transform_scenario
+from scenario_to_json import FIELDS_MAP
+
+
+# ----- Configuration ---------------------------------------------------------
+
+CONDITION_IDS = [f"C{i}" for i in range(6, 23)]
+
+REASON_CODES = ["MEDICAL/SURGICAL", "PREGNANCY", "BONDING", "WORKERS COMPENSATION"]
+PROCESS_LEVELS = ["500, 900", "500", "900"]
+
+# Values seen per field in new_scenarios.json (first entry is the most common)
+FIELD_CHOICES = {
+    "STD_HRS": [0, "SCHED_HRS * 0.6", "(STD_OR_NOT / PAY_RATE)"],
+    "PTO_HRS": [0, "PTO_USE_HRS", "SCHED_HRS * 0.4", "PTO_USABLE", "PTO_BASIC_SICK_STD_CTPL"],
+    "LOA_NO_HRS_PAID": [0, "SCHED_HRS"],
+    "BASIC_SICK_HRS": [0, "BASIC_SICK_AVAIL_CALC", "PTO_SUPP_HRS", "SCHED_HRS * 0.4"],
+    "EXEC_NOTE": [None],
+    "PHYS_NOTE": [None],
+    "MANUAL_CHECK": [None],
+    "ENTRY_DATE": ["CURRENT_DATE"],
+    "AUTH_BY": ["ESL"],
+    "CHECK_KRONOS": ["Y"],
+}
+
+# Old (ESLScenarios.json) "updates" values, as create_updates_structure expects them
+FLAT_UPDATE_CHOICES = {
+    "STD_HRS": [0, {"base": "SCHED_HRS", "multiplier": 0.6}, "variables.StdOrNot / variables.PayRate"],
+    "PTO_HRS": [0, {"base": "SCHED_HRS", "multiplier": 0.4}, "variables.PtoUsable"],
+    "LOA_NO_HRS_PAID": [0, "SCHED_HRS"],
+    "BASIC_SICK_HRS": [0, "variables.BasicSickAvailCalc"],
+    "EXEC_NOTE": [None, "null"],
+    "ENTRY_DATE": ["CURRENT_DATE"],
+    "AUTH_BY": ["ESL"],
+    "CHECK_KRONOS": ["Y"],
+}
+
+INPUT_COLUMNS = [
+    "PAY_START_DATE", "PAY_END_DATE", "WEEK_OF_PP", "PROCESS_LEVEL", "JOB_TITLE", "CLAIM_ID",
+    "CHECK_SEQ", "EMPLOYEE", "SCHED_HRS", "PAY_RATE", "EMP_STATUS", "PTO_AVAIL", "BASIC_SICK_AVAIL",
+    "DISABLE_DATE", "BEGIN_DATE", "STD_APPROVED_THROUGH", "PAYMENTS_THROUGH", "CTPL_FORM",
+    "CTPL_START", "CTPL_END", "CTPL_APPROVED_IND", "CTPL_APPROVED_AMOUNT", "CTPL_DENIED_IND",
+    "EE_PTO_RTW", "EE_PTO_SUPP", "FMLA_APPR_DATE", "CHECK_KRONOS", "REASON_CODE", "LTD_APPROVED",
+    "RTW_FT", "RTW_PT", "START_DATE", "END_DATE", "PTO_HRS_LAST1WEEK", "PTO_HRS_LAST2WEEK",
+    "BASIC_SICK_HRS_LAST1WEEK", "BASIC_SICK_HRS_LAST2WEEK",
+]
+
+INPUT_CHUNK_ROWS = 250_000
+
+_EPOCH = np.datetime64("2024-01-07", "D")     # a Sunday; pay weeks start on Sundays
+_FIRST_DAY, _LAST_DAY = -800, 1200             # range of generated dates (days after _EPOCH)
+
+
+# ----- Scenario matrix -------------------------------------------------------
+
+def _pick(rng, choices, size, p=None):
+    """``size`` values drawn from ``choices`` as an object array (keeps None / ints intact)."""
+    pool = np.empty(len(choices), dtype=object)
+    pool[:] = choices
+    return pool[rng.choice(len(choices), size=size, p=p)]
+
+
+def _field_probabilities(choices):
+    """Half the scenarios take the most common value, the rest are spread evenly."""
+    if len(choices) == 1:
+        return None
+    rest = 0.5 / (len(choices) - 1)
+    return [0.5] + [rest] * (len(choices) - 1)
+
+
+def generate_matrix(n, seed=0):
+    """
+    A scenario matrix with ``n`` scenario columns, laid out like the workbook:
+
+        row 0-4   id / name / description / PROCESS_LEVEL / REASON_CODE
+        C6..C22   one row per condition (TRUE / FALSE / blank)
+        fields    one row per FIELDS_MAP label (label in column 1)
+
+    Columns 0-2 hold the labels, scenarios start at column 3.
+    """
+    rng = np.random.default_rng(seed)
+    labels = list(FIELDS_MAP)
+    n_rows = 5 + len(CONDITION_IDS) + 1 + len(labels)
+    block = np.empty((n_rows, n), dtype=object)
+
+    ids = np.arange(1, n + 1)
+    block[0] = ids
+    block[1] = np.char.add("Scenario ", ids.astype(str)).astype(object)
+    block[2] = "Synthetic scenario for benchmarking"
+    block[3] = _pick(rng, PROCESS_LEVELS, n, p=[0.8, 0.1, 0.1])
+    block[4] = _pick(rng, REASON_CODES, n)
+
+    # Each scenario fixes about half of the conditions, like the real matrix
+    cond = _pick(rng, [True, False, None], (len(CONDITION_IDS), n), p=[0.25, 0.25, 0.5])
+    block[5:5 + len(CONDITION_IDS)] = cond
+    block[5 + len(CONDITION_IDS)] = None
+
+    first_field = 6 + len(CONDITION_IDS)
+    for k, label in enumerate(labels):
+        choices = FIELD_CHOICES.get(label, [0])
+        block[first_field + k] = _pick(rng, choices, n, p=_field_probabilities(choices))
+
+    label_cols = np.empty((n_rows, 3), dtype=object)
+    label_cols[0] = ["Condition #", "Scenario #", None]
+    label_cols[1:5] = [[None, "Name", None], [None, "Description", None],
+                       [None, "PROCESS_LEVEL", None], [None, "REASON_CODE", None]]
+    for i, cid in enumerate(CONDITION_IDS):
+        label_cols[5 + i] = [cid, f"Logic for {cid}", f"Description of {cid}"]
+    label_cols[5 + len(CONDITION_IDS)] = None
+    for k, label in enumerate(labels):
+        label_cols[first_field + k] = [None, label, None]
+
+    return pd.DataFrame(np.hstack([label_cols, block]), dtype=object)
+
+
+def write_matrix(frame, path):
+    """Write a generated matrix as .xlsx, .csv or .parquet (no header row)."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".xlsx", ".xlsm"):
+        from openpyxl import Workbook
+
+        if frame.shape[1] > 16384:
+            raise ValueError(f"Excel sheets hold at most 16384 columns, matrix has {frame.shape[1]}")
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        for row in frame.itertuples(index=False):
+            ws.append(list(row))
+        wb.save(path)
+    elif suffix in (".parquet", ".pq"):
+        text = frame.map(lambda v: None if v is None else str(v).upper() if isinstance(v, bool) else str(v))
+        text.columns = [str(c) for c in text.columns]
+        text.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, header=False, index=False)
+    return path
+
+
+# ----- Scenario JSON ---------------------------------------------------------
+
+def generate_source_scenarios(n, seed=0):
+    """``n`` scenarios in the workbook format written by scenario_to_json.py."""
+    rng = np.random.default_rng(seed)
+    cond_states = rng.choice(3, size=(n, len(CONDITION_IDS)), p=[0.25, 0.25, 0.5])
+    reasons = _pick(rng, REASON_CODES, n)
+    level_sets = [[500, 900], [500], [900]]
+    levels = [level_sets[k] for k in rng.choice(3, size=n, p=[0.8, 0.1, 0.1])]
+    field_values = {}
+    for label in FIELDS_MAP:
+        choices = FIELD_CHOICES.get(label, [0])
+        field_values[label] = _pick(rng, choices, n, p=_field_probabilities(choices))
+
+    scenarios = []
+    for i in range(n):
+        states = cond_states[i]
+        scenarios.append({
+            "id": i + 1,
+            "name": f"{'/'.join(map(str, levels[i]))}: {reasons[i]} - synthetic {i + 1}",
+            "description": "Synthetic scenario for benchmarking",
+            "process_levels": list(levels[i]),
+            "reason_code": reasons[i],
+            "is_skip_scenario": False,
+            "conditions": {
+                "forbidden": [c for c, s in zip(CONDITION_IDS, states) if s == 1],
+                "required": [c for c, s in zip(CONDITION_IDS, states) if s == 0],
+            },
+            "fields": {label: values[i] for label, values in field_values.items()},
+        })
+    return scenarios
+
+
+def generate_flat_updates(n, seed=0):
+    """``n`` flat updates dicts (old ESLScenarios.json format)."""
+    rng = np.random.default_rng(seed)
+    columns = {field: _pick(rng, choices, n, p=_field_probabilities(choices))
+               for field, choices in FLAT_UPDATE_CHOICES.items()}
+    return [{field: values[i] for field, values in columns.items()} for i in range(n)]
+
+
+def generate_catalog(n, seed=0):
+    """A scenarios.json document with ``n`` regular scenarios (ids 1..n)."""
+    scenarios = [transform_scenario(s) for s in generate_source_scenarios(n, seed)]
+    return {
+        "schema_version": "1.0",
+        "metadata": {
+            "valid_process_levels": [500, 600, 700, 900],
+            "valid_reason_codes": REASON_CODES,
+            "default_values": {"AUTH_BY": "ESL", "CHECK_KRONOS": "Y", "ENTRY_DATE": "CURRENT_DATE"},
+        },
+        "scenarios": scenarios,
+    }
+
+
+def edited_sources(sources, fraction=0.1, seed=1):
+    """
+    Copies of ``sources`` with about ``fraction`` of them changed (a field
+    value and a condition), as a workbook re-export would after an edit.
+    """
+    rng = np.random.default_rng(seed)
+    edited = []
+    for scenario, change in zip(sources, rng.random(len(sources)) < fraction):
+        if change:
+            scenario = dict(scenario, fields=dict(scenario["fields"], STD_HRS="SCHED_HRS * 0.6"),
+                            conditions={"forbidden": scenario["conditions"]["forbidden"][1:],
+                                        "required": scenario["conditions"]["required"] + ["C21"]})
+        edited.append(scenario)
+    return edited
+
+
+# ----- Leave input -----------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def _day_strings(fmt):
+    """Every day from _FIRST_DAY to _LAST_DAY (days after _EPOCH) formatted once."""
+    stamps = pd.to_datetime(_EPOCH + np.arange(_FIRST_DAY, _LAST_DAY + 1).astype("timedelta64[D]"))
+    if fmt == "mdy":
+        # M/D/YYYY without zero padding, as in the input export
+        text = stamps.month.astype(str) + "/" + stamps.day.astype(str) + "/" + stamps.year.astype(str)
+        return np.asarray(text, dtype=object)
+    return np.asarray(stamps.strftime(fmt), dtype=object)
+
+
+def _dates(days, fmt="mdy"):
+    """Date strings for day offsets (looked up, not formatted per row)."""
+    return _day_strings(fmt)[np.clip(days, _FIRST_DAY, _LAST_DAY) - _FIRST_DAY]
+
+
+@lru_cache(maxsize=None)
+def _cent_strings(high):
+    return np.char.mod("%.2f", np.arange(high * 100 + 1) / 100).astype(object)
+
+
+def _amounts(rng, rows, high):
+    """Two-decimal strings in [0, high] ("12.51")."""
+    return _cent_strings(high)[rng.integers(0, high * 100 + 1, rows)]
+
+
+def _blank(rng, values, fraction):
+    """Blank out about ``fraction`` of ``values``."""
+    values = np.asarray(values, dtype=object)
+    values[rng.random(len(values)) < fraction] = ""
+    return values
+
+
+def _hours(rng, rows, high, zero_fraction=0.5):
+    hours = _amounts(rng, rows, high)
+    hours[rng.random(rows) < zero_fraction] = "0.00"
+    return hours
+
+
+def generate_input_frame(rows, seed=0, start_row=0):
+    """
+    ``rows`` leave-input rows with the columns, value formats and blank
+    patterns of ESL_Test_*_Input.csv.  All values are strings ("" = blank),
+    as load_input reads them.  ``start_row`` offsets CLAIM_ID / EMPLOYEE so
+    chunks of a large file stay distinct.
+    """
+    rng = np.random.default_rng(seed)
+    week = rng.integers(0, 70, rows) * 7                     # pay week start (days after _EPOCH)
+    disable = week - rng.integers(1, 150, rows)
+    begin = disable + 14
+    std_through = begin + rng.integers(-10, 150, rows)
+    ctpl_start = disable + rng.integers(0, 10, rows)
+    ctpl_end = ctpl_start + rng.integers(30, 200, rows)
+    has_ctpl = rng.random(rows) < 0.6
+    rtw = week + rng.integers(-10, 60, rows)
+
+    ids = np.arange(start_row, start_row + rows)
+    data = {
+        "PAY_START_DATE": _dates(week),
+        "PAY_END_DATE": _dates(week + 6),
+        "WEEK_OF_PP": rng.choice(["1", "2"], rows),
+        "PROCESS_LEVEL": rng.choice(["500", "900"], rows, p=[0.7, 0.3]),
+        "JOB_TITLE": rng.choice(["2_CN1", "5_GENCLER", "3_RN", "1_TECH"], rows),
+        "CLAIM_ID": (100000 + ids).astype(str),
+        "CHECK_SEQ": _blank(rng, (200000 + ids).astype(str), 0.5),
+        "EMPLOYEE": (140000 + ids % 50000).astype(str),
+        "SCHED_HRS": rng.choice(["40.00", "36.00", "24.00", "32.00"], rows, p=[0.5, 0.3, 0.1, 0.1]),
+        "PAY_RATE": _cent_strings(80)[rng.integers(1650, 8001, rows)],
+        "EMP_STATUS": rng.choice(["L1        ", "T1        ", "A1        "], rows, p=[0.6, 0.3, 0.1]),
+        "PTO_AVAIL": _blank(rng, _amounts(rng, rows, 200), 0.1),
+        "BASIC_SICK_AVAIL": _blank(rng, _amounts(rng, rows, 40), 0.6),
+        "DISABLE_DATE": _dates(disable),
+        "BEGIN_DATE": _dates(begin),
+        "STD_APPROVED_THROUGH": _blank(rng, _dates(std_through), 0.1),
+        "PAYMENTS_THROUGH": _dates(std_through + rng.integers(0, 30, rows)),
+        "CTPL_FORM": np.where(has_ctpl, "Y", ""),
+        "CTPL_START": np.where(has_ctpl, _dates(ctpl_start), ""),
+        "CTPL_END": np.where(has_ctpl, _dates(ctpl_end), ""),
+        "CTPL_APPROVED_IND": np.where(has_ctpl & (rng.random(rows) < 0.7), "Y", ""),
+        "CTPL_APPROVED_AMOUNT": np.where(has_ctpl & (rng.random(rows) < 0.7), "981.00", ""),
+        "CTPL_DENIED_IND": np.where(has_ctpl & (rng.random(rows) < 0.1), "Y", ""),
+        "EE_PTO_RTW": _blank(rng, rng.choice(["Y", "N"], rows), 0.7),
+        "EE_PTO_SUPP": _blank(rng, rng.choice(["Y", "N"], rows), 0.5),
+        "FMLA_APPR_DATE": _blank(rng, _dates(disable + rng.integers(60, 120, rows)), 0.2),
+        "CHECK_KRONOS": rng.choice(["Y", "N"], rows),
+        "REASON_CODE": rng.choice(REASON_CODES, rows, p=[0.6, 0.2, 0.1, 0.1]),
+        "LTD_APPROVED": rng.choice(["N", "Y"], rows, p=[0.95, 0.05]),
+        "RTW_FT": _blank(rng, _dates(rtw, "%m/%d/%Y 00:00:00"), 0.8),
+        "RTW_PT": _blank(rng, _dates(rtw + 14, "%m/%d/%Y 00:00:00"), 0.9),
+        "START_DATE": _blank(rng, _dates(week), 0.5),
+        "END_DATE": _blank(rng, _dates(week + 6), 0.5),
+        "PTO_HRS_LAST1WEEK": _hours(rng, rows, 40),
+        "PTO_HRS_LAST2WEEK": _hours(rng, rows, 40),
+        "BASIC_SICK_HRS_LAST1WEEK": _hours(rng, rows, 16, 0.8),
+        "BASIC_SICK_HRS_LAST2WEEK": _hours(rng, rows, 16, 0.8),
+    }
+    return pd.DataFrame({column: data[column] for column in INPUT_COLUMNS}, dtype=object)
+
+
+def write_input_csv(path, rows, seed=0, chunk_rows=INPUT_CHUNK_ROWS):
+    """Write a ``rows``-row leave-input CSV, generating at most ``chunk_rows`` rows at a time."""
+    path = Path(path)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(",".join(INPUT_COLUMNS) + "\n")
+        for chunk, start in enumerate(range(0, rows, chunk_rows)):
+            frame = generate_input_frame(min(chunk_rows, rows - start), seed + chunk, start_row=start)
+            # No generated value contains a comma or a quote, so rows are joined
+            # directly (several times faster than DataFrame.to_csv)
+            columns = [frame[column].tolist() for column in INPUT_COLUMNS]
+            f.write("\n".join(map(",".join, zip(*columns))) + "\n")
+    return path
@@ -0,0 +1,243 @@
+"""
+Run benchmark cases, record the results and compare them with a baseline.
+
+Every (benchmark, size) case runs in a fresh process so its peak RSS is its
+own.  Inputs are generated in the child (not timed), then the run function
+is timed ``repeat`` times; the best time is reported.  Results are appended
+to results/history.json (not tracked) and compared with baseline.json next
+to this file (tracked): a case regresses when its best time or its peak RSS
+exceeds the baseline by more than the threshold and by more than an absolute
+floor, so a few milliseconds of noise on a fast case are not flagged.
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.suites import BENCHMARKS, PRESETS, SCRIPTS_DIR, cases
+
+
+# ----- Configuration ---------------------------------------------------------
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+HISTORY_FILE = "history.json"
+# Outside results/ (which is git-ignored) so the baseline can be committed
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+DEFAULT_THRESHOLD = 0.15
+DEFAULT_REPEAT = 5
+
+# A regression must also exceed the baseline by these absolute amounts
+MIN_REGRESSION = {"wall_s": 0.05, "peak_rss_mb": 10.0}
+
+
+# ----- Measurement -----------------------------------------------------------
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if the platform cannot tell)."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def measure(name, size, repeat, workdir):
+    """Child process: set up one case, time it and report wall time / memory."""
+    bench = BENCHMARKS[name]
+    workdir = Path(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    state = bench.setup(size, workdir)
+    setup_rss = peak_rss_mb()
+
+    times, units = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        units = bench.run(state)
+        times.append(time.perf_counter() - start)
+    peak = peak_rss_mb()
+
+    best = min(times)
+    return {
+        "benchmark": name,
+        "size": size,
+        "unit": bench.unit,
+        "units": units,
+        "wall_s": round(best, 6),
+        "mean_s": round(sum(times) / len(times), 6),
+        "repeat": repeat,
+        "throughput": round(units / best, 2) if best > 0 else None,
+        "peak_rss_mb": round(peak, 2) if peak is not None else None,
+        # Growth of the peak during the timed runs (0 when setup used more)
+        "run_rss_mb": round(peak - setup_rss, 2) if peak is not None else None,
+    }
+
+
+def run_cases(selected, repeat=DEFAULT_REPEAT, isolate=True, progress=print):
+    """Measure every case; with ``isolate`` each one runs in its own spawned process."""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="esl_bench_") as tmp:
+        for bench, size in selected:
+            workdir = Path(tmp) / f"{bench.name}_{size}"
+            if isolate:
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(measure, bench.name, size, repeat, str(workdir)).result()
+            else:
+                result = measure(bench.name, size, repeat, workdir)
+            results.append(result)
+            progress(format_result(result))
+    return results
+
+
+def format_result(result):
+    rss = f"{result['peak_rss_mb']:9.1f} MB" if result["peak_rss_mb"] is not None else "        n/a"
+    return (f"{result['benchmark']:<26} {result['size']:>10,} {result['unit']:<9} "
+            f"{result['wall_s']:10.4f} s {rss} {result['throughput'] or 0:14,.0f} {result['unit']}/s")
+
+
+# ----- History / baseline ----------------------------------------------------
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR,
+                             capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_record(results, preset):
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "preset": preset,
+        "results": results,
+    }
+
+
+def _read_json(path, default):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return default
+
+
+def append_history(record, results_dir=RESULTS_DIR):
+    path = Path(results_dir) / HISTORY_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    history = _read_json(path, [])
+    history.append(record)
+    path.write_text(json.dumps(history, indent=2), encoding="utf-8")
+    return path
+
+
+def save_baseline(record, path=BASELINE_PATH):
+    """Store the run as the baseline; cases not in this run keep their old baseline."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = _read_json(path, {}).get("results", {})
+    baseline.update({case_key(r): r for r in record["results"]})
+    path.write_text(json.dumps(dict(record, results=baseline), indent=2), encoding="utf-8")
+    return path
+
+
+def load_baseline(path=BASELINE_PATH):
+    return _read_json(path, {}).get("results", {})
+
+
+def case_key(result):
+    return f"{result['benchmark']}@{result['size']}"
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Regressions against the baseline: one entry per metric that grew by more
+    than ``threshold`` (a fraction, 0.15 = 15%) and by more than its
+    MIN_REGRESSION floor.
+    """
+    regressions = []
+    for result in results:
+        base = baseline.get(case_key(result))
+        if not base:
+            continue
+        checks = [("wall_s", result["wall_s"], base.get("wall_s"))]
+        checks.append(("peak_rss_mb", result.get("peak_rss_mb"), base.get("peak_rss_mb")))
+        for metric, now, before in checks:
+            if now is None or not before:
+                continue
+            change = now / before - 1
+            if change > threshold and now - before > MIN_REGRESSION[metric]:
+                regressions.append({"case": case_key(result), "metric": metric,
+                                    "baseline": before, "current": now, "change": round(change, 4)})
+    return regressions
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def _size_list(value):
+    return [int(v.replace("_", "")) for v in value.split(",") if v.strip()]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the scenario tooling.")
+    ap.add_argument("-b", "--benchmark", action="append", help="Benchmark to run (repeatable; default: all)")
+    ap.add_argument("-p", "--preset", choices=sorted(PRESETS), default="quick", help="Size preset (default: quick)")
+    ap.add_argument("--scenarios", type=_size_list, help="Scenario counts, e.g. 10,1000,100000 (overrides the preset)")
+    ap.add_argument("--rows", type=_size_list, help="Input row counts, e.g. 1000,10000000 (overrides the preset)")
+    ap.add_argument("-r", "--repeat", type=int, default=DEFAULT_REPEAT,
+                    help=f"Timed runs per case; the best is kept (default: {DEFAULT_REPEAT})")
+    ap.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD,
+                    help="Regression threshold as a fraction (default: 0.15 = 15%%)")
+    ap.add_argument("--results-dir", default=str(RESULTS_DIR), help="Where history.json is kept")
+    ap.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline file to compare with and save to")
+    ap.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    ap.add_argument("--no-history", action="store_true", help="Do not append this run to history.json")
+    ap.add_argument("--in-process", action="store_true",
+                    help="Run every case in this process (faster, but peak RSS is cumulative)")
+    ap.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    args = ap.parse_args(argv)
+
+    if args.list:
+        for name, bench in BENCHMARKS.items():
+            print(f"{name:<26} {bench.unit:<9} {bench.description}")
+        return 0
+
+    try:
+        selected = cases(args.benchmark, args.preset, {"scenarios": args.scenarios, "rows": args.rows})
+    except ValueError as exc:
+        ap.error(str(exc))
+
+    print(f"{'benchmark':<26} {'size':>10} {'unit':<9} {'wall (best)':>12} {'peak RSS':>12} {'throughput':>14}")
+    results = run_cases(selected, repeat=max(1, args.repeat), isolate=not args.in_process)
+    record = run_record(results, args.preset)
+
+    if not args.no_history:
+        print(f"History → {append_history(record, args.results_dir)}")
+
+    regressions = compare(results, load_baseline(args.baseline), args.threshold)
+    for reg in regressions:
+        print(f"REGRESSION {reg['case']}: {reg['metric']} {reg['baseline']} → {reg['current']} "
+              f"(+{reg['change']:.0%})")
+    if args.save_baseline:
+        print(f"Baseline → {save_baseline(record, args.baseline)}")
+    elif regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        return 1
+    return 0
@@ -0,0 +1,197 @@
+"""
+Benchmark cases.
+
+Each Benchmark has a setup(size, workdir) that builds its inputs (not timed)
+and a run(state) that does the timed work and returns the number of units
+processed (scenarios or rows), from which throughput is computed.
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+from benchmarks import generators  # noqa: E402
+
+
+# ----- Configuration ---------------------------------------------------------
+
+# Sizes per preset: "scenarios" for the catalog tools, "rows" for the input file
+PRESETS = {
+    "quick": {"scenarios": [10, 100], "rows": [1_000]},
+    "standard": {"scenarios": [10, 100, 1_000, 10_000], "rows": [1_000, 100_000]},
+    "full": {"scenarios": [10, 100, 1_000, 10_000, 100_000], "rows": [1_000, 100_000, 1_000_000, 10_000_000]},
+}
+
+# Excel sheets hold at most 16384 columns (3 of them are labels)
+MAX_XLSX_SCENARIOS = 16_000
+
+
+class Benchmark(NamedTuple):
+    name: str
+    unit: str                               # "scenarios" or "rows"
+    setup: Callable[[int, Path], Any]
+    run: Callable[[Any], int]
+    max_size: int = 0                       # 0 = no limit
+    description: str = ""
+
+
+# ----- scenario_to_json.py ---------------------------------------------------
+
+def _setup_extract(size, workdir):
+    from scenario_to_json import extract_scenarios
+
+    return extract_scenarios, generators.generate_matrix(size)
+
+
+def _run_extract(state):
+    extract_scenarios, frame = state
+    return len(extract_scenarios(frame))
+
+
+def _setup_read_xlsx(size, workdir):
+    from scenario_to_json import extract_scenarios, read_matrix
+
+    path = generators.write_matrix(generators.generate_matrix(size), workdir / f"matrix_{size}.xlsx")
+    return read_matrix, extract_scenarios, path
+
+
+def _run_read_xlsx(state):
+    read_matrix, extract_scenarios, path = state
+    return len(extract_scenarios(read_matrix(path)))
+
+
+# ----- append_scenarios.py ---------------------------------------------------
+
+def _setup_transform(size, workdir):
+    from append_scenarios import transform_scenario
+
+    return transform_scenario, generators.generate_source_scenarios(size)
+
+
+def _run_transform(state):
+    transform_scenario, sources = state
+    for scenario in sources:
+        transform_scenario(scenario)
+    return len(sources)
+
+
+# ----- update_scenarios.py ---------------------------------------------------
+
+def _setup_create_updates(size, workdir):
+    from update_scenarios import create_updates_structure
+
+    return create_updates_structure, generators.generate_flat_updates(size)
+
+
+def _run_create_updates(state):
+    create_updates_structure, updates = state
+    for flat in updates:
+        create_updates_structure(flat)
+    return len(updates)
+
+
+def _scenario_map(size):
+    """Target catalog plus edited sources keyed by id, as update_scenarios.py builds them."""
+    from update_scenarios import prepare_source
+
+    sources = generators.generate_source_scenarios(size)
+    target = generators.generate_catalog(size)
+    scenario_map = {s["id"]: prepare_source(s) for s in generators.edited_sources(sources)}
+    return target, scenario_map
+
+
+def _setup_update_scenario(size, workdir):
+    from update_scenarios import update_scenario
+
+    target, scenario_map = _scenario_map(size)
+    pairs = [(s, scenario_map[s["id"]]) for s in target["scenarios"]]
+    return update_scenario, pairs
+
+
+def _run_update_scenario(state):
+    update_scenario, pairs = state
+    for current, new in pairs:
+        update_scenario(current, new)
+    return len(pairs)
+
+
+def _setup_save_changes(size, workdir):
+    from update_scenarios import save_changes_to_file
+
+    target, scenario_map = _scenario_map(size)
+    return save_changes_to_file, target, scenario_map, workdir / "review.txt", workdir / "changes.json"
+
+
+def _run_save_changes(state):
+    save_changes_to_file, target, scenario_map, review, report = state
+    save_changes_to_file(target, scenario_map, str(review), str(report))
+    return len(scenario_map)
+
+
+# ----- evaluate_scenarios.py -------------------------------------------------
+
+def _setup_score(size, workdir):
+    from evaluate_scenarios import DEFAULT_CONFIG, load_config, load_input
+
+    path = generators.write_input_csv(workdir / f"input_{size}.csv", size)
+    return load_input, load_config(DEFAULT_CONFIG), path
+
+
+def _run_score(state):
+    from evaluate_scenarios import score_frame
+
+    load_input, config, path = state
+    return len(score_frame(load_input(path), config))
+
+
+def _setup_write_input(size, workdir):
+    return workdir / f"generated_{size}.csv", size
+
+
+def _run_write_input(state):
+    path, size = state
+    generators.write_input_csv(path, size)
+    return size
+
+
+# ----- Registry --------------------------------------------------------------
+
+BENCHMARKS: Dict[str, Benchmark] = {b.name: b for b in [
+    Benchmark("extract_scenarios", "scenarios", _setup_extract, _run_extract,
+              description="scenario_to_json.extract_scenarios on an in-memory matrix"),
+    Benchmark("read_matrix_xlsx", "scenarios", _setup_read_xlsx, _run_read_xlsx, MAX_XLSX_SCENARIOS,
+              description="scenario_to_json: read an .xlsx matrix and extract the scenarios"),
+    Benchmark("transform_scenario", "scenarios", _setup_transform, _run_transform,
+              description="append_scenarios.transform_scenario per workbook scenario"),
+    Benchmark("create_updates_structure", "scenarios", _setup_create_updates, _run_create_updates,
+              description="update_scenarios.create_updates_structure per flat updates dict"),
+    Benchmark("update_scenario", "scenarios", _setup_update_scenario, _run_update_scenario,
+              description="update_scenarios.update_scenario per (current, source) pair"),
+    Benchmark("save_changes_to_file", "scenarios", _setup_save_changes, _run_save_changes,
+              description="update_scenarios.save_changes_to_file (text review + JSON report)"),
+    Benchmark("score_input", "rows", _setup_score, _run_score,
+              description="evaluate_scenarios: load and score a leave-input CSV"),
+    Benchmark("write_input_csv", "rows", _setup_write_input, _run_write_input,
+              description="generators.write_input_csv (the input generator itself)"),
+]}
+
+
+def cases(names, preset="quick", sizes=None):
+    """
+    (benchmark, size) pairs to run.  ``sizes`` ({"scenarios": [...], "rows": [...]})
+    overrides the preset's sizes per unit.
+    """
+    selected: List = []
+    for name in names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark {name!r} (known: {', '.join(BENCHMARKS)})")
+        bench = BENCHMARKS[name]
+        for size in (sizes or {}).get(bench.unit) or PRESETS[preset][bench.unit]:
+            if not bench.max_size or size <= bench.max_size:
+                selected.append((bench, size))
+    return selected
+
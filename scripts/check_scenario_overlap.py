@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+check_scenario_overlap.py
+-------------------------
+Check that the scenarios in a configuration are mutually exclusive.
+
+Each scenario's conditions.required / conditions.forbidden lists are encoded
+as a pair of bitmasks (a "cube" over the condition results), grouped by
+reason code and process level.  Two scenarios can both match a row when
+neither requires a condition the other forbids; since the feeder takes the
+first match, the later one then silently loses those rows.  The checker also
+subtracts every scenario's cube from the space of all condition combinations
+to list the combinations that no scenario covers (rows that would end up as
+"No matching scenario found").
+
+Skip scenarios are checked before every other scenario, so they are counted
+as covering combinations but are not reported as overlapping.  Combinations
+that cannot occur (e.g. C6 and C7 both true) are left out.
+
+Usage
+-----
+$ python check_scenario_overlap.py -c ../ESLFeeder/Config/scenarios.json
+$ python check_scenario_overlap.py -c ../ESLFeeder/Config/scenarios.json --new scenarios_to_load.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from evaluate_scenarios import CONDITIONS, DEFAULT_CONFIG, load_config, normalize_scenarios
+from scenario_catalog import expand_catalog, is_compact
+
+
+# ----- Configuration ---------------------------------------------------------
+
+# Conditions that can never be true together for a row that passes validation
+# (PAY_START_DATE <= PAY_END_DATE):
+#   C6/C7   STD active vs. STD not approved or expired before the pay week
+#   C16/C17 FMLA approved through the pay week vs. FMLA expired
+EXCLUSIVE_PAIRS = [
+    ("C6", "C7"),
+    ("C16", "C17"),
+]
+
+# Stop listing uncovered combinations for a key after this many
+MAX_UNCOVERED = 20
+
+# Cubes compared against all later cubes at once by find_overlaps
+OVERLAP_BLOCK = 512
+
+
+# ----- Encoding --------------------------------------------------------------
+
+def load_scenarios(config_path, new_path=None):
+    """
+    Scenarios from scenarios.json, plus a list of new ones (append_scenarios.py
+    output).  Returns (scenarios, ids of the new scenarios).
+    """
+    config = load_config(config_path)
+    if isinstance(config, list):
+        config = {"scenarios": config}
+    new = []
+    if new_path:
+        new = json.loads(Path(new_path).read_text(encoding="utf-8"))
+        if isinstance(new, dict):
+            new = new.get("scenarios", [])
+    return combine(config, new)
+
+
+def combine(config, new_scenarios):
+    """Normalized scenarios of ``config`` with ``new_scenarios`` appended (existing ids win)."""
+    if is_compact(config):
+        config = expand_catalog(config)
+    existing = {s.get("id") for s in config.get("scenarios", [])}
+    new = [s for s in new_scenarios if s.get("id") not in existing]
+    config = dict(config, scenarios=config.get("scenarios", []) + new)
+    return normalize_scenarios(config), {s.get("id") for s in new}
+
+
+def condition_bits(scenarios):
+    """Bit position for each condition name, in C-number order."""
+    names = {n for s in scenarios for n in s["required"] + s["forbidden"]}
+    return {name: i for i, name in enumerate(sorted(names, key=lambda n: (len(n), n)))}
+
+
+def encode(scenarios, bits, known=None):
+    """(required, forbidden) uint64 masks per scenario; unknown condition names are ignored."""
+    known = set(CONDITIONS if known is None else known)
+    required = np.zeros(len(scenarios), dtype=np.uint64)
+    forbidden = np.zeros(len(scenarios), dtype=np.uint64)
+    for i, scenario in enumerate(scenarios):
+        for name in scenario["required"]:
+            if name in known:
+                required[i] |= np.uint64(1 << bits[name])
+        for name in scenario["forbidden"]:
+            if name in known:
+                forbidden[i] |= np.uint64(1 << bits[name])
+    return required, forbidden
+
+
+def exclusive_masks(bits):
+    return [np.uint64((1 << bits[a]) | (1 << bits[b])) for a, b in EXCLUSIVE_PAIRS if a in bits and b in bits]
+
+
+def _possible(required, exclusive):
+    """False where a required mask asks for two conditions that cannot both hold."""
+    ok = np.ones(np.shape(required), dtype=bool)
+    for mask in exclusive:
+        ok &= (required & mask) != mask
+    return ok
+
+
+def describe(required, forbidden, names):
+    """Human readable cube, e.g. 'C6 & C11 & !C12'."""
+    parts = []
+    for bit, name in enumerate(names):
+        if int(required) >> bit & 1:
+            parts.append(name)
+        elif int(forbidden) >> bit & 1:
+            parts.append("!" + name)
+    return " & ".join(parts) or "(any)"
+
+
+# ----- Analysis --------------------------------------------------------------
+
+def scenario_groups(scenarios):
+    """{(reason_code, process_level): [regular scenarios]} plus the skip scenarios."""
+    groups = {}
+    for scenario in scenarios:
+        if scenario["is_skip_scenario"]:
+            continue
+        for level in sorted(scenario["process_levels"]):
+            groups.setdefault((scenario["reason_code"], level), []).append(scenario)
+    skips = [s for s in scenarios if s["is_skip_scenario"]]
+    return groups, skips
+
+
+def find_overlaps(required, forbidden, exclusive, block=OVERLAP_BLOCK):
+    """
+    Index pairs (i < j) of cubes that intersect, in (i, j) order.
+
+    Two cubes intersect when neither requires a bit the other forbids and the
+    combined requirements are possible.  Rows are compared ``block`` at a
+    time against the cubes after them, so memory stays O(block * n) and the
+    pairs are yielded as they are found.
+    """
+    for start in range(0, len(required), block):
+        stop = min(start + block, len(required))
+        req = required[start:stop, None] | required[None, start:]
+        forb = forbidden[start:stop, None] | forbidden[None, start:]
+        both = ((req & forb) == 0) & _possible(req, exclusive)
+        i, j = np.nonzero(np.triu(both, k=1))
+        yield from zip((i + start).tolist(), (j + start).tolist())
+
+
+def subtract(cube, other):
+    """Cube difference as a list of disjoint cubes (cube - other)."""
+    req, forb = cube
+    o_req, o_forb = other
+    if (req & o_forb) or (forb & o_req):
+        return [cube]
+    pieces = []
+    free_req = o_req & ~(req | forb)
+    free_forb = o_forb & ~(req | forb)
+    for bit in _bits(free_req):
+        pieces.append((req, forb | bit))
+        req |= bit
+    for bit in _bits(free_forb):
+        pieces.append((req | bit, forb))
+        forb |= bit
+    return pieces
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low
+        mask ^= low
+
+
+def uncovered(required, forbidden, exclusive_ints, limit=MAX_UNCOVERED):
+    """Condition combinations no cube covers, as disjoint (required, forbidden) cubes."""
+    remaining = [(0, 0)]
+    for req, forb in zip(required.tolist(), forbidden.tolist()):
+        remaining = [piece for cube in remaining for piece in subtract(cube, (req, forb))]
+        remaining = [c for c in remaining if all((c[0] & m) != m for m in exclusive_ints)]
+        if not remaining:
+            break
+    return remaining[:limit], len(remaining)
+
+
+def analyze(scenarios, known=None, new_ids=()):
+    """
+    Overlapping pairs, shadowed scenarios and coverage gaps per (reason, level).
+
+    Findings that involve a scenario in ``new_ids`` are marked ``"new": True``.
+    """
+    new_ids = set(new_ids)
+    bits = condition_bits(scenarios)
+    names = sorted(bits, key=bits.get)
+    exclusive = exclusive_masks(bits)
+    exclusive_ints = [int(m) for m in exclusive]
+    groups, skips = scenario_groups(scenarios)
+    skip_req, skip_forb = encode(skips, bits, known)
+
+    report = {"conditions": names, "keys": []}
+    for (reason, level), members in sorted(groups.items()):
+        required, forbidden = encode(members, bits, known)
+        entry = {"reason_code": reason, "process_level": level, "scenarios": [s["id"] for s in members],
+                 "overlaps": [], "shadowed": [], "uncovered": [], "uncovered_total": 0}
+
+        for i, j in find_overlaps(required, forbidden, exclusive):
+            a, b = members[i], members[j]
+            # j is checked later; it is shadowed if a's cube contains b's entirely
+            contains = ((required[i] & ~required[j]) == 0) and ((forbidden[i] & ~forbidden[j]) == 0)
+            entry["overlaps"].append({
+                "first": a["id"], "second": b["id"],
+                "when": describe(required[i] | required[j], forbidden[i] | forbidden[j], names),
+                "new": a["id"] in new_ids or b["id"] in new_ids,
+            })
+            if contains:
+                entry["shadowed"].append({"scenario": b["id"], "by": a["id"],
+                                          "new": a["id"] in new_ids or b["id"] in new_ids})
+
+        cubes, total = uncovered(np.concatenate([skip_req, required]),
+                                 np.concatenate([skip_forb, forbidden]), exclusive_ints)
+        entry["uncovered"] = [describe(r, f, names) for r, f in cubes]
+        entry["uncovered_total"] = total
+        report["keys"].append(entry)
+    return report
+
+
+def print_report(report, show_uncovered=True):
+    for entry in report["keys"]:
+        header = f"{entry['reason_code']} / {entry['process_level']} ({len(entry['scenarios'])} scenarios)"
+        lines = []
+        for item in entry["overlaps"]:
+            mark = " [new]" if item["new"] else ""
+            lines.append(f"  overlap   {item['first']:>4} & {item['second']:<4} when {item['when']}{mark}")
+        for item in entry["shadowed"]:
+            mark = " [new]" if item["new"] else ""
+            lines.append(f"  shadowed  {item['scenario']:>4} never matches (covered by {item['by']}){mark}")
+        if show_uncovered:
+            for cube in entry["uncovered"]:
+                lines.append(f"  uncovered {cube}")
+            hidden = entry["uncovered_total"] - len(entry["uncovered"])
+            if hidden > 0:
+                lines.append(f"  ... {hidden} more uncovered combinations")
+        print(header + (":" if lines else ": OK"))
+        for line in lines:
+            print(line)
+
+
+def summary(report, new_only=False):
+    def count(items):
+        return sum(1 for item in items if item["new"] or not new_only)
+
+    return {
+        "overlaps": sum(count(e["overlaps"]) for e in report["keys"]),
+        "shadowed": sum(count(e["shadowed"]) for e in report["keys"]),
+        "uncovered": sum(e["uncovered_total"] for e in report["keys"]),
+    }
+
+
+def gate(report, fail_on, new_only=False):
+    """
+    Exit status for the gate: 1 if any finding of the selected kinds exists.
+    With ``new_only`` only overlaps involving new scenarios count, so findings
+    already present in scenarios.json do not block an append.
+    """
+    counts = summary(report, new_only)
+    return 1 if any(counts[kind] for kind in fail_on) else 0
+
+
+def parse_fail_on(value):
+    kinds = [k.strip() for k in value.split(",") if k.strip()]
+    unknown = set(kinds) - {"overlaps", "shadowed", "uncovered"}
+    if unknown:
+        raise ValueError(f"Unknown finding kind(s): {', '.join(sorted(unknown))}")
+    return kinds
+
+
+def run_gate(config, new_scenarios, fail_on=("overlaps", "shadowed")):
+    """Gate step for append_scenarios.py: report and return the exit status."""
+    scenarios, new_ids = combine(config, new_scenarios)
+    report = analyze(scenarios, new_ids=new_ids)
+    print_report(report, show_uncovered=False)
+    counts = summary(report, new_only=True)
+    print(f"Overlap check: {counts['overlaps']} overlapping pairs and {counts['shadowed']} shadowed "
+          f"scenarios involve the new scenarios")
+    return gate(report, fail_on, new_only=True)
+
+
+def run_group_gate(groups, new_ids, fail_on=("overlaps", "shadowed"), known=None):
+    """
+    Gate step for append_scenarios.py --stream.
+
+    ``groups`` maps (reason, level) to (id, required, forbidden) tuples.
+    Only findings that involve a new scenario are printed and counted, as
+    they are found, so nothing grows with the number of overlapping pairs.
+    """
+    counts = {"overlaps": 0, "shadowed": 0}
+    for (reason, level), members in sorted(groups.items()):
+        if not any(member[0] in new_ids for member in members):
+            continue
+        members = sorted(set(members))
+        scenarios = [{"id": i, "required": list(req), "forbidden": list(forb)} for i, req, forb in members]
+        bits = condition_bits(scenarios)
+        names = sorted(bits, key=bits.get)
+        required, forbidden = encode(scenarios, bits, known)
+        header = f"{reason} / {level} ({len(members)} scenarios)"
+        found = False
+        # Python ints: per-pair numpy scalar arithmetic would dominate the run time
+        req, forb = required.tolist(), forbidden.tolist()
+        for i, j in find_overlaps(required, forbidden, exclusive_masks(bits)):
+            a, b = members[i][0], members[j][0]
+            if a not in new_ids and b not in new_ids:
+                continue
+            if not found:
+                print(header + ":")
+                found = True
+            when = describe(req[i] | req[j], forb[i] | forb[j], names)
+            print(f"  overlap   {a:>4} & {b:<4} when {when} [new]")
+            counts["overlaps"] += 1
+            if (req[i] & ~req[j]) == 0 and (forb[i] & ~forb[j]) == 0:
+                print(f"  shadowed  {b:>4} never matches (covered by {a}) [new]")
+                counts["shadowed"] += 1
+        if not found:
+            print(header + ": OK")
+    print(f"Overlap check: {counts['overlaps']} overlapping pairs and {counts['shadowed']} shadowed "
+          f"scenarios involve the new scenarios")
+    return 1 if any(counts.get(kind) for kind in fail_on) else 0
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Check scenarios for overlaps and coverage gaps.")
+    ap.add_argument("-c", "--config", default=str(DEFAULT_CONFIG), help="Path to scenarios.json")
+    ap.add_argument("-n", "--new", help="Scenarios about to be appended (append_scenarios.py output); "
+                                        "only findings involving them fail the check")
+    ap.add_argument("--json", help="Also write the report as JSON to this path")
+    ap.add_argument("--fail-on", default="overlaps,shadowed",
+                    help="Comma separated findings that fail the check: overlaps, shadowed, uncovered "
+                         "(default: overlaps,shadowed; use '' to only report)")
+    ap.add_argument("--no-uncovered", action="store_true", help="Do not list uncovered combinations")
+    args = ap.parse_args()
+
+    try:
+        fail_on = parse_fail_on(args.fail_on)
+    except ValueError as exc:
+        ap.error(str(exc))
+
+    scenarios, new_ids = load_scenarios(args.config, args.new)
+    report = analyze(scenarios, new_ids=new_ids)
+    print_report(report, show_uncovered=not args.no_uncovered)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+    counts = summary(report)
+    print(f"\n{counts['overlaps']} overlapping pairs, {counts['shadowed']} shadowed scenarios, "
+          f"{counts['uncovered']} uncovered combinations")
+    # With --new the check gates the append: only findings involving new scenarios fail it
+    sys.exit(gate(report, fail_on, new_only=bool(args.new)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+compile_conditions.py
+---------------------
+Compile the condition formulas in ConditionsCsv.csv, e.g.
+
+    OR(STD_APPROVED_THROUGH IS NULL, PAY_START_DATE > STD_APPROVED_THROUGH)
+
+into NumPy predicates over an evaluate_scenarios.ColumnTable, so a logic
+change in the CSV no longer needs a hand-edited C# condition class for
+offline evaluation.
+
+Each formula is parsed once and turned into Python source.  The generated
+module is cached on disk under a name derived from a hash of the CSV (and
+the compiler version), and imported like any other module, so later runs
+skip both parsing and byte-compilation.
+
+Formula language
+----------------
+- AND(a, b, ...), OR(a, b, ...), NOT(a)
+- comparisons  <  <=  >  >=  =  <>   and   X IS NULL / X IS NOT NULL
+- arithmetic   +  -  *  /  with parentheses, numbers and 'quoted' text
+- a bare column name is true when its value is "Y" (flags like EE_PTO_SUPP)
+
+Usage
+-----
+$ python compile_conditions.py -c ../ConditionsCsv.csv
+$ python compile_conditions.py -c ../ConditionsCsv.csv --print-source
+"""
+
+import argparse
+import csv
+import hashlib
+import importlib.util
+import re
+import types
+from pathlib import Path
+
+from append_scenarios import VARIABLE_NAME_MAP
+
+
+# ----- Configuration ---------------------------------------------------------
+
+DEFAULT_CONDITIONS_CSV = Path(__file__).resolve().parent.parent / "ConditionsCsv.csv"
+
+# Bump when the generated code changes shape so stale caches are ignored
+COMPILER_VERSION = "1"
+
+CACHE_DIR_NAME = ".esl_cache"
+
+# Formula names that refer to derived LeaveVariables rather than raw columns
+DERIVED_VARIABLES = dict(VARIABLE_NAME_MAP, **{
+    "PTO_USE_HOURS": "PtoUseHrs",
+    "WEEKLY_WAGE": "WeeklyWage",
+    "CTPL_CALC": "CtplCalc",
+    "CTPL_PAYMENT": "CtplPayment",
+    "PTO_RESERVE": "PtoReserve",
+    "PTO_AVAIL_CALC": "PtoAvailCalc",
+    "PTO_SUPP_DOLLARS": "PtoSuppDollars",
+    "BASIC_SICK_STD": "BasicSickStd",
+})
+
+# Column names used in the formulas that differ from the cleaned table
+COLUMN_ALIASES = {
+    "FLMA_APPR_DATE": "FMLA_APPR_DATE",
+    "CTPL_START": "CTPL_START_DATE",
+    "CTPL_END": "CTPL_END_DATE",
+}
+
+DATE_COLUMNS = {
+    "PAY_START_DATE", "PAY_END_DATE", "STD_APPROVED_THROUGH", "PAYMENTS_THROUGH",
+    "CTPL_START_DATE", "CTPL_END_DATE", "FMLA_APPR_DATE", "DISABLE_DATE",
+    "BEGIN_DATE", "RTW_FT", "RTW_PT", "START_DATE", "END_DATE",
+}
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>\d+(?:\.\d*)?|\.\d+)
+      | (?P<string>'[^']*'|"[^"]*")
+      | (?P<name>[A-Za-z_][A-Za-z0-9_.]*)
+      | (?P<op><=|>=|<>|!=|=|<|>|\+|-|\*|/)
+      | (?P<punct>[(),])
+    )""", re.VERBOSE)
+
+_COMPARISONS = {"<": "<", "<=": "<=", ">": ">", ">=": ">=", "=": "==", "<>": "!=", "!=": "!="}
+_FUNCTIONS = {"AND", "OR", "NOT"}
+
+
+class ConditionSyntaxError(ValueError):
+    """Raised when a condition formula cannot be parsed."""
+
+
+# ----- Parsing ---------------------------------------------------------------
+
+def tokenize(text):
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            raise ConditionSyntaxError(f"Unexpected character at {pos}: {text[pos:pos + 10]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser producing tuple ASTs:
+
+        ("num", 0.4)  ("str", "Y")  ("name", "PAY_RATE")
+        ("call", "AND", [args])  ("cmp", op, left, right)
+        ("arith", op, left, right)  ("neg", operand)  ("isnull", operand, negate)
+    """
+
+    def __init__(self, text, functions=_FUNCTIONS):
+        self.tokens = tokenize(text)
+        self.functions = functions
+        self.pos = 0
+        self.warnings = []
+
+    def peek(self, offset=0):
+        idx = self.pos + offset
+        return self.tokens[idx] if idx < len(self.tokens) else (None, None)
+
+    def take(self):
+        tok = self.peek()
+        self.pos += 1
+        return tok
+
+    def expect_close(self):
+        kind, value = self.peek()
+        if kind is None:
+            # The workbook formulas occasionally drop trailing parentheses (C17)
+            self.warnings.append("missing ')' at end of formula")
+            return
+        if value != ")":
+            raise ConditionSyntaxError(f"Expected ')' but found {value!r}")
+        self.take()
+
+    def parse(self):
+        node = self.comparison()
+        if self.peek()[0] is not None:
+            raise ConditionSyntaxError(f"Unexpected {self.peek()[1]!r} after end of expression")
+        return node
+
+    def comparison(self):
+        left = self.additive()
+        kind, value = self.peek()
+        if kind == "op" and value in _COMPARISONS:
+            self.take()
+            return ("cmp", _COMPARISONS[value], left, self.additive())
+        if kind == "name" and value.upper() == "IS":
+            self.take()
+            negate = False
+            if self.peek()[0] == "name" and self.peek()[1].upper() == "NOT":
+                self.take()
+                negate = True
+            if not (self.peek()[0] == "name" and self.peek()[1].upper() == "NULL"):
+                raise ConditionSyntaxError("Expected NULL after IS")
+            self.take()
+            return ("isnull", left, negate)
+        return left
+
+    def additive(self):
+        node = self.term()
+        while self.peek()[0] == "op" and self.peek()[1] in "+-":
+            op = self.take()[1]
+            node = ("arith", op, node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek()[0] == "op" and self.peek()[1] in "*/":
+            op = self.take()[1]
+            node = ("arith", op, node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() == ("op", "-"):
+            self.take()
+            return ("neg", self.unary())
+        return self.primary()
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == "number":
+            return ("num", float(value))
+        if kind == "string":
+            return ("str", value[1:-1])
+        if kind == "punct" and value == "(":
+            node = self.comparison()
+            self.expect_close()
+            return node
+        if kind == "name":
+            if value.upper() in self.functions and self.peek() == ("punct", "("):
+                self.take()
+                args = [self.comparison()]
+                while self.peek() == ("punct", ","):
+                    self.take()
+                    args.append(self.comparison())
+                self.expect_close()
+                return ("call", value.upper(), args)
+            return ("name", value.upper())
+        raise ConditionSyntaxError(f"Unexpected {value!r}" if kind else "Unexpected end of formula")
+
+
+def parse_logic(text, functions=_FUNCTIONS):
+    """Parse a formula; returns (ast, warnings).  ``functions`` are the callable names."""
+    parser = _Parser(text, functions)
+    return parser.parse(), parser.warnings
+
+
+# ----- Code generation -------------------------------------------------------
+
+def resolve_name(name):
+    """Map a formula identifier to ("var", Name) | ("date", COL) | ("col", COL)."""
+    if name in DERIVED_VARIABLES:
+        return ("var", DERIVED_VARIABLES[name])
+    column = COLUMN_ALIASES.get(name, name)
+    if column in DATE_COLUMNS:
+        return ("date", column)
+    return ("col", column)
+
+
+def _kind(node):
+    """Static type of an AST node: bool, number, date, text."""
+    tag = node[0]
+    if tag in ("call", "cmp", "isnull"):
+        return "bool"
+    if tag == "str":
+        return "text"
+    if tag == "name":
+        ref = resolve_name(node[1])
+        return {"var": "number", "date": "date", "col": "column"}[ref[0]]
+    return "number"
+
+
+def _as_number(node):
+    tag = node[0]
+    if tag == "num":
+        return repr(node[1])
+    if tag == "neg":
+        return f"(-{_as_number(node[1])})"
+    if tag == "arith":
+        return f"({_as_number(node[2])} {node[1]} {_as_number(node[3])})"
+    if tag == "name":
+        ref_kind, ref = resolve_name(node[1])
+        if ref_kind == "var":
+            return f"t.var({ref!r})"
+        if ref_kind == "col":
+            return f"t.numbers({ref!r})"
+    raise ConditionSyntaxError(f"Cannot use {node!r} as a number")
+
+
+def _as_date(node):
+    if node[0] == "name":
+        ref_kind, ref = resolve_name(node[1])
+        if ref_kind in ("date", "col"):
+            return f"t.dates({ref!r})"
+    if node[0] == "str":
+        return f"_date_literal({node[1]!r})"
+    raise ConditionSyntaxError(f"Cannot use {node!r} as a date")
+
+
+def _as_text(node):
+    if node[0] == "str":
+        return repr(node[1].upper())
+    if node[0] == "name":
+        ref_kind, ref = resolve_name(node[1])
+        if ref_kind != "var":
+            return f"_upper(t.text({ref!r}))"
+    raise ConditionSyntaxError(f"Cannot use {node!r} as text")
+
+
+def _as_bool(node):
+    tag = node[0]
+    if tag == "call":
+        name, args = node[1], node[2]
+        if name == "NOT":
+            if len(args) != 1:
+                raise ConditionSyntaxError("NOT takes exactly one argument")
+            return f"(~{_as_bool(args[0])})"
+        joiner = " & " if name == "AND" else " | "
+        return "(" + joiner.join(_as_bool(a) for a in args) + ")"
+    if tag == "isnull":
+        operand, negate = node[1], node[2]
+        if operand[0] != "name":
+            raise ConditionSyntaxError("IS NULL needs a column or variable name")
+        ref_kind, ref = resolve_name(operand[1])
+        test = f"np.isnan(t.var({ref!r}))" if ref_kind == "var" else f"t.is_empty({ref!r})"
+        return f"(~{test})" if negate else test
+    if tag == "cmp":
+        op, left, right = node[1], node[2], node[3]
+        kinds = {_kind(left), _kind(right)}
+        if "date" in kinds:
+            return f"({_as_date(left)} {op} {_as_date(right)})"
+        if "text" in kinds:
+            if op not in ("==", "!="):
+                raise ConditionSyntaxError("Text can only be compared with = or <>")
+            return f"({_as_text(left)} {op} {_as_text(right)})"
+        return f"({_as_number(left)} {op} {_as_number(right)})"
+    if tag == "name":
+        ref_kind, ref = resolve_name(node[1])
+        if ref_kind == "var":
+            return f"_truthy(t.var({ref!r}))"
+        return f"(_upper(t.text({ref!r})) == 'Y')"
+    return f"_truthy({_as_number(node)})"
+
+
+_MODULE_HEADER = '''\
+# Generated by compile_conditions.py from {source} (sha256 {digest}).
+# Do not edit: delete this file to force recompilation.
+import numpy as np
+
+CONDITION_LOGIC = {logic!r}
+CONDITION_DESCRIPTIONS = {descriptions!r}
+COMPILE_WARNINGS = {warnings!r}
+
+
+def _upper(values):
+    return np.array([v.upper() for v in values], dtype=object)
+
+
+def _truthy(values):
+    values = np.asarray(values, dtype=np.float64)
+    return ~np.isnan(values) & (values != 0)
+
+
+def _date_literal(text):
+    return np.datetime64(text, "ns")
+
+
+def _mask(result, n):
+    return np.broadcast_to(np.asarray(result, dtype=bool), (n,)).copy()
+'''
+
+_FUNCTION_TEMPLATE = '''
+
+def {name}(t):
+    """{description}"""
+    with np.errstate(all="ignore"):
+        return _mask({expression}, len(t))
+'''
+
+
+def read_conditions_csv(path):
+    """Return [(name, logic, description)] from ConditionsCsv.csv."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [(row["Name"].strip(), row["Logic"].strip(), (row.get("Description") or "").strip())
+                for row in csv.DictReader(f) if row.get("Name") and row.get("Logic")]
+
+
+def generate_module(rows, source="ConditionsCsv.csv", digest=""):
+    """Generate the Python source for a predicate module from CSV rows."""
+    logic, descriptions, warnings, functions = {}, {}, {}, []
+    for name, text, description in rows:
+        if not re.match(r"^C\d+$", name):
+            raise ConditionSyntaxError(f"Invalid condition name {name!r}")
+        try:
+            ast, notes = parse_logic(text)
+            expression = _as_bool(ast)
+        except ConditionSyntaxError as exc:
+            raise ConditionSyntaxError(f"{name}: {exc} in {text!r}") from exc
+        logic[name] = text
+        descriptions[name] = description
+        if notes:
+            warnings[name] = notes
+        safe_description = description.replace("\\", "\\\\").replace('"""', "'''")
+        functions.append(_FUNCTION_TEMPLATE.format(
+            name=name, description=safe_description, expression=expression))
+    header = _MODULE_HEADER.format(source=source, digest=digest, logic=logic,
+                                   descriptions=descriptions, warnings=warnings)
+    return header + "".join(functions)
+
+
+# ----- Caching & loading -----------------------------------------------------
+
+_loaded = {}
+
+
+def conditions_digest(path):
+    data = Path(path).read_bytes()
+    return hashlib.sha256(COMPILER_VERSION.encode() + b"\0" + data).hexdigest()
+
+
+def compiled_module_path(path, cache_dir=None):
+    path = Path(path)
+    cache_dir = Path(cache_dir) if cache_dir else path.resolve().parent / CACHE_DIR_NAME
+    return cache_dir / f"conditions_{conditions_digest(path)[:16]}.py"
+
+
+def load_module(path=DEFAULT_CONDITIONS_CSV, cache_dir=None):
+    """Compile (or reuse the cached compilation of) a conditions CSV and import it."""
+    path = Path(path)
+    digest = conditions_digest(path)
+    if digest in _loaded:
+        return _loaded[digest]
+
+    module_path = compiled_module_path(path, cache_dir)
+    if not module_path.exists():
+        module_path.parent.mkdir(parents=True, exist_ok=True)
+        source = generate_module(read_conditions_csv(path), source=path.name, digest=digest)
+        tmp_path = module_path.with_suffix(".tmp")
+        tmp_path.write_text(source, encoding="utf-8")
+        tmp_path.replace(module_path)
+
+    spec = importlib.util.spec_from_file_location(f"esl_conditions_{digest[:16]}", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _loaded[digest] = module
+    return module
+
+
+def import_source(source, digest):
+    """
+    Import generated module source under its CSV digest (used for the copy
+    kept in a scenario bundle); load_module then returns it for that CSV.
+    """
+    if digest in _loaded:
+        return _loaded[digest]
+    module = types.ModuleType(f"esl_conditions_{digest[:16]}")
+    exec(compile(source, f"<conditions {digest[:16]}>", "exec"), module.__dict__)
+    _loaded[digest] = module
+    return module
+
+
+def load_conditions(path=DEFAULT_CONDITIONS_CSV, cache_dir=None):
+    """Return {condition name: predicate(table) -> bool ndarray} for a conditions CSV."""
+    module = load_module(path, cache_dir)
+    return {name: getattr(module, name) for name in module.CONDITION_LOGIC}
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Compile ConditionsCsv.csv formulas into cached predicates.")
+    ap.add_argument("-c", "--conditions", default=str(DEFAULT_CONDITIONS_CSV), help="Path to ConditionsCsv.csv")
+    ap.add_argument("--cache-dir", help=f"Cache directory (default: {CACHE_DIR_NAME}/ next to the CSV)")
+    ap.add_argument("--print-source", action="store_true", help="Print the generated module")
+    args = ap.parse_args()
+
+    module = load_module(args.conditions, args.cache_dir)
+    if args.print_source:
+        print(Path(module.__file__).read_text(encoding="utf-8"))
+        return
+
+    for name, logic in module.CONDITION_LOGIC.items():
+        note = f"  (warning: {'; '.join(module.COMPILE_WARNINGS[name])})" if name in module.COMPILE_WARNINGS else ""
+        print(f"{name:>4}: {logic}{note}")
+    print(f"Compiled {len(module.CONDITION_LOGIC)} conditions → {module.__file__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+condition_bits.py
+-----------------
+Persist every row's condition results (C6..C28) as one packed bitmask per
+row, so a config edit re-matches without evaluating any condition.
+
+Most scenarios.json edits only change which combination of required /
+forbidden conditions maps to which scenario, not the condition logic.  The
+first run over an input file evaluates every registered condition and stores
+the results as a uint64 per row (one bit per condition) in a sidecar under
+.esl_cache/ next to the input, keyed by a hash of the file.  Later runs load
+the bits, and matching becomes integer mask tests: per (REASON_CODE,
+PROCESS_LEVEL) group, each distinct bitmask is resolved against the
+candidates' required / forbidden masks once (scenario_index.resolve_codes).
+
+Each condition's bit carries a fingerprint of its logic: the formula text
+for conditions compiled from ConditionsCsv.csv, the function source for the
+built-in ports.  Only conditions whose fingerprint changed (or that are new)
+are evaluated again and rewritten in the sidecar.  Bump BITS_VERSION when a
+helper shared by the built-in ports, or the variable calculation, changes.
+
+Usage
+-----
+$ python condition_bits.py -i ../ESL_Test_Hao_2025-04-25_Input.csv
+$ python condition_bits.py -i big_input.csv -c edited_scenarios.json -o out.csv
+$ python condition_bits.py -i big_input.csv --conditions-csv ../ConditionsCsv.csv --show
+$ python evaluate_scenarios.py -i big_input.csv --condition-bits
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from evaluate_scenarios import (CONDITIONS, DEFAULT_CONFIG, ColumnTable, candidate_scenarios, clean_frame,
+                                default_output_path, evaluate_conditions, load_config, load_input,
+                                normalize_scenarios, score_table, write_output)
+from row_store import file_digest
+from scenario_index import NO_MATCH, _rule_masks, resolve_codes
+
+
+# ----- Configuration ---------------------------------------------------------
+
+BITS_VERSION = "1"
+
+CACHE_DIR_NAME = ".esl_cache"
+
+# One uint64 per row
+MAX_CONDITIONS = 64
+
+
+# ----- Fingerprints ----------------------------------------------------------
+
+def condition_fingerprint(name, func):
+    """
+    Hash of a condition's logic: the ConditionsCsv.csv formula of a compiled
+    condition, the source of a built-in port.
+    """
+    logic = getattr(func, "__globals__", {}).get("CONDITION_LOGIC", {}).get(name)
+    if logic is not None:
+        from compile_conditions import COMPILER_VERSION
+        text = f"csv {COMPILER_VERSION}\0{logic}"
+    else:
+        try:
+            text = "python\0" + inspect.getsource(func)
+        except (OSError, TypeError):
+            text = f"python\0{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', name)}"
+    return hashlib.sha256(f"v{BITS_VERSION}\0{name}\0{text}".encode()).hexdigest()[:16]
+
+
+# ----- Sidecar ---------------------------------------------------------------
+
+class ConditionBits:
+    """
+    Packed condition results of one input file.  ``names[i]`` is the
+    condition stored in bit i, ``fingerprints[name]`` the logic its bit was
+    computed with.
+    """
+
+    def __init__(self, path, source_digest, rows):
+        self.path = Path(path)
+        self.source_digest = source_digest
+        self.rows = rows
+        self.bits = np.zeros(rows, dtype=np.uint64)
+        self.names = []
+        self.fingerprints = {}
+        self.refreshed = []
+
+    @classmethod
+    def for_input(cls, input_path, rows, cache_dir=None):
+        """The sidecar of an input file: loaded when it matches the file, otherwise empty."""
+        input_path = Path(input_path)
+        digest = file_digest(input_path)
+        cache_dir = Path(cache_dir) if cache_dir else input_path.resolve().parent / CACHE_DIR_NAME
+        sidecar = cls(cache_dir / f"bits_{digest[:16]}.npz", digest, rows)
+        sidecar.load()
+        return sidecar
+
+    def load(self):
+        """Read the saved bits; a missing, foreign or unreadable sidecar leaves this one empty."""
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                bits = data["bits"]
+        except (OSError, ValueError, KeyError):
+            return False
+        if (meta.get("version") != BITS_VERSION or meta.get("source") != self.source_digest
+                or len(bits) != self.rows):
+            return False
+        self.bits = bits.astype(np.uint64, copy=True)
+        self.names = list(meta["names"])
+        self.fingerprints = dict(meta["fingerprints"])
+        return True
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {"version": BITS_VERSION, "source": self.source_digest, "rows": self.rows,
+                "names": self.names, "fingerprints": self.fingerprints}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), bits=self.bits)
+        tmp_path.replace(self.path)
+
+    def stale(self, conditions):
+        """Registered conditions that are missing from the sidecar or whose logic changed."""
+        return [name for name, func in conditions.items()
+                if self.fingerprints.get(name) != condition_fingerprint(name, func)]
+
+    def refresh(self, table, conditions=None):
+        """
+        Evaluate the stale conditions over ``table`` (variables calculated) and
+        store their bits; saves the sidecar when anything changed.
+        """
+        conditions = CONDITIONS if conditions is None else conditions
+        stale = self.stale(conditions)
+        self.refreshed = stale
+        if not stale:
+            return stale
+        results = evaluate_conditions(table, stale, conditions)
+        for name in stale:
+            if name not in self.names:
+                if len(self.names) >= MAX_CONDITIONS:
+                    raise ValueError(f"More than {MAX_CONDITIONS} conditions do not fit in the sidecar")
+                self.names.append(name)
+            position = np.uint64(self.names.index(name))
+            self.bits = (self.bits & ~(np.uint64(1) << position)) | (results[name].astype(np.uint64) << position)
+            self.fingerprints[name] = condition_fingerprint(name, conditions[name])
+        self.save()
+        return stale
+
+    def values(self, name):
+        """Bool array of one stored condition."""
+        return ((self.bits >> np.uint64(self.names.index(name))) & np.uint64(1)).astype(bool)
+
+
+# ----- Matching --------------------------------------------------------------
+
+class BitMatcher:
+    """
+    Drop-in replacement for match_scenarios (passed as ``index`` to
+    score_table) that matches on the sidecar's bits; only stale conditions
+    are evaluated.
+    """
+
+    def __init__(self, config, sidecar, conditions=None):
+        self.scenarios = normalize_scenarios(config)
+        self.sidecar = sidecar
+        self.conditions = CONDITIONS if conditions is None else conditions
+
+    def condition_names(self):
+        # Everything comes from the sidecar
+        return []
+
+    def match(self, table, eligible, condition_results):
+        if len(table) != self.sidecar.rows:
+            raise ValueError(f"Sidecar has {self.sidecar.rows} rows, the input {len(table)}")
+        self.sidecar.refresh(table, self.conditions)
+        # Unregistered names are ignored, as in the C# registry
+        known = [name if name in self.conditions else None for name in self.sidecar.names]
+        bits = self.sidecar.bits
+        matched = np.full(len(table), NO_MATCH, dtype=np.int64)
+
+        keys = pd.DataFrame({
+            "reason": pd.Series(table.text("REASON_CODE")).str.upper(),
+            "level": table.numbers("PROCESS_LEVEL"),
+        })
+        for (reason, level), index in keys[eligible].groupby(["reason", "level"], dropna=True).groups.items():
+            if level != int(level):
+                continue
+            candidates = candidate_scenarios(self.scenarios, reason, int(level))
+            if not candidates:
+                continue
+            rows = np.asarray(index, dtype=np.int64)
+            required, forbidden, ids = _rule_masks(candidates, known)
+            codes, inverse = np.unique(bits[rows], return_inverse=True)
+            matched[rows] = resolve_codes(codes, required, forbidden, ids)[inverse.reshape(-1)]
+        return matched
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Score an input file on persisted per-row condition bits.")
+    ap.add_argument("-i", "--input", required=True, help="Path to the input CSV (or .parquet / .arrow)")
+    ap.add_argument("-c", "--config", default=str(DEFAULT_CONFIG), help="Path to scenarios.json")
+    ap.add_argument("-o", "--output", help="Output path (default: <input>_processed_<timestamp>.csv)")
+    ap.add_argument("--conditions-csv", help="Use the formulas in ConditionsCsv.csv instead of the built-in ports")
+    ap.add_argument("--cache-dir", help=f"Sidecar directory (default: {CACHE_DIR_NAME}/ next to the input)")
+    ap.add_argument("--show", action="store_true", help="Print the stored conditions and their true rates")
+    args = ap.parse_args()
+
+    if not Path(args.input).is_file():
+        print(f"Error: input not found: {args.input}")
+        sys.exit(1)
+
+    conditions = None
+    if args.conditions_csv:
+        from compile_conditions import load_conditions
+        conditions = dict(CONDITIONS, **load_conditions(args.conditions_csv))
+    config = load_config(args.config)
+    frame = load_input(args.input)
+
+    now = datetime.now()
+    start = time.perf_counter()
+    sidecar = ConditionBits.for_input(args.input, len(frame), args.cache_dir)
+    matcher = BitMatcher(config, sidecar, conditions)
+    processed = score_table(ColumnTable(clean_frame(frame)), config, conditions, now, index=matcher)
+    elapsed = time.perf_counter() - start
+
+    out_path = Path(args.output) if args.output else default_output_path(args.input, now)
+    write_output(processed, out_path)
+    if args.show:
+        for bit, name in enumerate(sidecar.names):
+            print(f"bit {bit:>2}  {name:<6} {sidecar.values(name).mean():>7.1%} true"
+                  + ("  (re-evaluated)" if name in sidecar.refreshed else ""))
+    matched = (processed["SCENARIO_ID"] != "-1").sum()
+    refreshed = f"{len(sidecar.refreshed)} condition(s) evaluated" if sidecar.refreshed else "no conditions evaluated"
+    print(f"Scored {len(processed)} rows ({matched} matched, {refreshed}) in {elapsed:.2f} s → {out_path.resolve()}")
+    print(f"Condition bits → {sidecar.path.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
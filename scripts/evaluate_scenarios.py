@@ -0,0 +1,1041 @@
+#!/usr/bin/env python3
+"""
+evaluate_scenarios.py
+---------------------
+Batch-evaluate a leave input file (like ESL_Test_Hao_2025-04-25_Input.csv)
+against ESLFeeder/Config/scenarios.json and write a *_processed_*.csv file in
+the same layout as the C# feeder.
+
+The C# pipeline (DataCleaningService -> VariableCalculator ->
+ScenarioProcessor.FindMatchingScenario -> ScenarioCalculator -> CsvProcessor)
+works one DataRow at a time.  Here every step runs over whole columns: each
+condition is evaluated once for the full table, and scenarios are assigned per
+(REASON_CODE, PROCESS_LEVEL) group with boolean masks, so run time grows with
+rows and columns instead of rows x scenarios x conditions.
+
+Usage
+-----
+$ python evaluate_scenarios.py -i ../ESL_Test_Hao_2025-04-25_Input.csv
+$ python evaluate_scenarios.py -i input.csv -c ../ESLFeeder/Config/scenarios.json -o out.csv
+$ python evaluate_scenarios.py -i input.csv --row-cache
+$ python evaluate_scenarios.py -i input.csv --condition-bits
+$ python evaluate_scenarios.py -i input.csv --profile run_profile.json
+"""
+
+import argparse
+import re
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# ----- Configuration ---------------------------------------------------------
+
+DEFAULT_CONFIG = Path(__file__).resolve().parent.parent / "ESLFeeder" / "Config" / "scenarios.json"
+
+# DataCleaningService._columnMappings: source column -> copied-to column
+COLUMN_MAPPINGS = {
+    "PROCESS_LEVEL": "GLCOMPANY",
+    "PTO_AVAIL": "PTO_AVAILABLE",
+    "BASIC_SICK_AVAIL": "BASICSICK_AVAILABLE",
+    "PTO_HRS_LAST1WEEK": "PTO_HRS_LASTWEEK",
+    "PTO_HRS_LAST2WEEK": "PTO_HRS_LAST_TWOWEEK",
+    "BASIC_SICK_HRS_LAST1WEEK": "BASICSICK_LAST1WEEK",
+    "BASIC_SICK_HRS_LAST2WEEK": "BASICSICK_LAST2WEEK",
+    "CTPL_START": "CTPL_START_DATE",
+    "CTPL_END": "CTPL_END_DATE",
+}
+
+# DataCleaningService._defaultColumns (only used when the column is missing)
+DEFAULT_COLUMNS = {
+    "BASICSICK_AVAILABLE": "0",
+    "BASICSICK_LAST1WEEK": "0",
+    "BASICSICK_LAST2WEEK": "0",
+}
+
+# DataCleaningService.CleanString reason code normalization
+REASON_CODE_NORMALIZATION = {
+    variant: code
+    for code in ("PREGNANCY", "WORKERS COMPENSATION", "MEDICAL/SURGICAL", "BONDING")
+    for variant in (code, code.lower(), code.title())
+}
+
+# CsvProcessor.ProcessRecords scenario output columns
+OUTPUT_COLUMNS = [
+    "STD_HOURS", "PTO_HRS", "LOA_NO_HRS_PAID", "BASIC_SICK_HRS",
+    "BRIDGEPORT_SICK_HRS", "LM_PTO_HRS", "LM_SICK_HRS", "ATO_HRS",
+    "EXEMPT_HRS", "EXEC_NOTE", "PHYS_NOTE", "MANUAL_CHECK",
+    "ENTRY_DATE", "AUTH_BY", "CHECK_KRONOS",
+]
+
+REQUIRED_FIELDS = ["CLAIM_ID", "PAY_START_DATE", "PAY_END_DATE", "REASON_CODE"]
+
+# ValidateLeaveRequest's checks in the order it runs them, and its messages
+VALIDATION_RULES = dict(
+    {f"required:{field}": f"Required field {field} is missing or empty" for field in REQUIRED_FIELDS},
+    date_format="Invalid date format in PAY_START_DATE or PAY_END_DATE",
+    date_order="PAY_START_DATE cannot be after PAY_END_DATE",
+    reason_code="Invalid reason code: {value}. Valid codes: {codes}",
+)
+
+MIN_WAGE = 16.35
+MAX_CTPL_PAY = 981
+
+# ScenarioCalculator.GetVariableValue: lower-cased name -> LeaveVariables property
+VARIABLE_LOOKUP = {
+    "scheduledhours": "ScheduledHours",
+    "pto_available": "PtoAvail",
+    "ptoavail": "PtoAvail",
+    "pto_last1week": "PtoHrsLast1Week",
+    "ptolast1week": "PtoHrsLast1Week",
+    "pto_last2week": "PtoHrsLast2Week",
+    "ptolast2week": "PtoHrsLast2Week",
+    "basicsick_available": "BasicSickAvail",
+    "basicsick_last1week": "BasicSickLast1Week",
+    "basicsick_last2week": "BasicSickLast2Week",
+    "pto_use_hrs": "PtoUseHrs",
+    "ptousehrs": "PtoUseHrs",
+    "employee_status": "EmployeeStatusCode",
+    "std_or_not": "StdOrNot",
+    "stdornot": "StdOrNot",
+    "pay_rate": "PayRate",
+    "payrate": "PayRate",
+    "basicsickstdctpl": "BasicSickStdCtpl",
+    "ptobasicsickstdctpl": "PtoBasicSickStdCtpl",
+    "ptosupphrs": "PtoSuppHrs",
+    "basicsickavailcalc": "BasicSickAvailCalc",
+    "ptobasicsickstd": "PtoBasicSickStd",
+}
+
+EMPLOYEE_STATUS_CODES = {"active": 1.0, "loa": 2.0, "terminated": 3.0}
+
+NO_SCENARIO_MESSAGE = "No matching scenario found for the given variables"
+INVALID_NUMBER_MESSAGE = "Input string was not in a correct format."
+
+# Parquet / Arrow IPC paths are read and written through arrow_io (needs pyarrow)
+ARROW_SUFFIXES = (".parquet", ".pq", ".arrow", ".feather", ".ipc")
+
+_DOUBLE_RE = re.compile(r"^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$")
+
+
+# ----- Column table ----------------------------------------------------------
+
+class ColumnTable:
+    """
+    Cleaned input columns plus derived variables.
+
+    Raw columns are kept as trimmed strings; text arrays and typed views
+    (dates, numbers) are built once on first use and cached, so conditions
+    that share a column never convert or parse it twice.  ``dates`` and
+    ``numbers`` may supply views that are already parsed (row_store.RowStore).
+    """
+
+    def __init__(self, frame, dates=None, numbers=None):
+        self.frame = frame
+        self.variables = {}
+        self._text = {}
+        self._dates = dict(dates or {})
+        self._numbers = dict(numbers or {})
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __contains__(self, column):
+        return column in self.frame.columns
+
+    def text(self, column):
+        """Trimmed string values (missing column -> KeyError, like DataRow)."""
+        if column not in self._text:
+            self._text[column] = self.frame[column].to_numpy(dtype=object)
+        return self._text[column]
+
+    def is_empty(self, column):
+        return self.text(column) == ""
+
+    def dates(self, column):
+        """datetime64 view of a column; empty or unparseable values are NaT."""
+        if column not in self._dates:
+            self._dates[column] = parse_dates(self.frame[column])
+        return self._dates[column]
+
+    def numbers(self, column):
+        """float64 view of a column; empty or unparseable values are NaN."""
+        if column not in self._numbers:
+            self._numbers[column] = parse_numbers(self.frame[column])
+        return self._numbers[column]
+
+    def var(self, name):
+        return self.variables[name]
+
+
+def map_unique(values, func):
+    """
+    Apply ``func`` (array of distinct values -> array) once per distinct value
+    and expand the result back to every row.  Input columns repeat the same
+    dates, rates and codes on many rows, so this parses far fewer strings.
+    """
+    if not isinstance(values, pd.Series):
+        values = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return np.asarray(func(np.asarray(uniques, dtype=object)))[codes]
+
+
+def _parse_dates(values):
+    series = pd.Series(values, dtype=object)
+    parsed = pd.to_datetime(series, format="%m/%d/%Y", errors="coerce")
+    retry = parsed.isna() & (series != "")
+    if retry.any():
+        # RTW_FT / RTW_PT are exported as 04/14/2025 00:00:00; anything else goes to dateutil
+        parsed[retry] = pd.to_datetime(series[retry], format="%m/%d/%Y %H:%M:%S", errors="coerce")
+        retry &= parsed.isna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(series[retry], format="mixed", errors="coerce")
+    return parsed.to_numpy(dtype="datetime64[ns]")
+
+
+def _parse_numbers(values):
+    series = pd.Series(values, dtype=object)
+    return pd.to_numeric(series.where(series != "", None), errors="coerce").to_numpy(dtype=np.float64)
+
+
+def parse_dates(series):
+    """Parse M/D/YYYY strings (falling back to any recognised format) to datetime64."""
+    return map_unique(series, _parse_dates)
+
+
+def parse_numbers(series):
+    return map_unique(series, _parse_numbers)
+
+
+# ----- Loading & cleaning ----------------------------------------------------
+
+def load_config(path):
+    """
+    scenarios.json in today's layout or as a compact catalog (scenario_catalog.py);
+    read from its precompiled bundle (scenario_bundle.py) while that is up to date.
+    """
+    from scenario_bundle import bundled_config
+    config = bundled_config(path)
+    if config is not None:
+        return config
+    from scenario_catalog import load_catalog
+    return load_catalog(path)
+
+
+def load_input(path):
+    """
+    Read the input CSV with every column as a string (no NA inference).
+    .parquet / .arrow inputs are read through arrow_io as the same strings.
+    """
+    if Path(path).suffix.lower() in ARROW_SUFFIXES:
+        from arrow_io import read_frame
+        return read_frame(path)
+    return pd.read_csv(path, dtype=str, keep_default_na=False, skipinitialspace=False)
+
+
+def clean_frame(frame):
+    """
+    Mirror CsvProcessor.LoadCsvFile + DataCleaningService.CleanData: trim every
+    value, normalize reason codes, append SCENARIO_ID/SCENARIO_NAME and the
+    mapped/default columns in the same order as the C# DataTable.
+    """
+    frame = frame.rename(columns=lambda c: c.strip())
+    cleaned = frame.apply(lambda col: col.fillna("").str.strip())
+    for column in cleaned.columns:
+        variants = cleaned[column].isin(REASON_CODE_NORMALIZATION.keys())
+        if variants.any():
+            cleaned.loc[variants, column] = cleaned.loc[variants, column].map(REASON_CODE_NORMALIZATION)
+
+    for column in ("SCENARIO_ID", "SCENARIO_NAME"):
+        if column not in cleaned.columns:
+            cleaned[column] = ""
+
+    for source, target in COLUMN_MAPPINGS.items():
+        if target not in cleaned.columns:
+            cleaned[target] = ""
+        if source in cleaned.columns:
+            cleaned[target] = cleaned[source]
+
+    for column, default in DEFAULT_COLUMNS.items():
+        if column not in cleaned.columns:
+            cleaned[column] = default
+
+    return cleaned
+
+
+def normalize_scenarios(config):
+    """Return active scenarios in a flat, predictable shape (ordered by id)."""
+    bundled = getattr(config, "normalized", None)
+    if bundled is not None:
+        return list(bundled)
+
+    scenarios = []
+    for raw in config.get("scenarios", []):
+        if not raw.get("is_active", True):
+            continue
+
+        levels = raw.get("process_levels")
+        if not levels and raw.get("process_level"):
+            levels = [raw["process_level"]]
+
+        conditions = raw.get("conditions") or {}
+        required = conditions.get("required")
+        forbidden = conditions.get("forbidden", conditions.get("excluded"))
+        updates = raw.get("updates") or {}
+
+        scenarios.append({
+            "id": int(raw["id"]),
+            "name": raw.get("name", ""),
+            "description": raw.get("description", ""),
+            "reason_code": (raw.get("reason_code") or "").strip().upper(),
+            "process_levels": {int(lv) for lv in (levels or [])},
+            "is_skip_scenario": bool(raw.get("is_skip_scenario", False)),
+            "required": [c for c in required if c] if isinstance(required, list) else [],
+            "forbidden": [c for c in forbidden if c] if isinstance(forbidden, list) else [],
+            "order": list(updates.get("order") or []),
+            "fields": dict(updates.get("fields") or {}),
+        })
+
+    scenarios.sort(key=lambda s: s["id"])
+    return scenarios
+
+
+def candidate_scenarios(scenarios, reason_code, process_level):
+    """ScenarioConfiguration.GetScenariosForReasonCode: skip scenarios first, then matches."""
+    if not reason_code or not process_level:
+        return []
+    reason_code = reason_code.strip().upper()
+    skip = [s for s in scenarios if s["is_skip_scenario"]]
+    regular = [s for s in scenarios
+               if not s["is_skip_scenario"]
+               and s["reason_code"] == reason_code
+               and process_level in s["process_levels"]]
+    return skip + regular
+
+
+# ----- Validation & variables ------------------------------------------------
+
+def validation_errors(table, valid_reason_codes, valid_process_levels=None):
+    """
+    Every failed ValidateLeaveRequest check as a frame of ROW (position in
+    ``table``), RULE (a VALIDATION_RULES key) and VALUE (the offending input),
+    ordered by row and then in the order the C# runs the checks.  Each check
+    is one column operation; reason codes are compared once per distinct
+    value.  With ``valid_process_levels``, numeric PROCESS_LEVEL values
+    outside the list are reported as "process_level" (the C# still scores
+    those rows, so validate() does not reject them).
+    """
+    n = len(table)
+    # (rule, failed mask, values or a function of the failed rows giving them)
+    checks = []
+
+    for field in REQUIRED_FIELDS:
+        if field not in table:
+            checks.append((f"required:{field}", np.ones(n, dtype=bool), np.full(n, "", dtype=object)))
+        else:
+            checks.append((f"required:{field}", table.is_empty(field), table.text(field)))
+
+    def column_dates(column):
+        return table.dates(column) if column in table else np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+
+    def column_text(column):
+        return table.text(column) if column in table else np.full(n, "", dtype=object)
+
+    start, end = column_dates("PAY_START_DATE"), column_dates("PAY_END_DATE")
+    start_text, end_text = column_text("PAY_START_DATE"), column_text("PAY_END_DATE")
+    checks.append(("date_format", np.isnat(start) | np.isnat(end),
+                   lambda rows: np.where(np.isnat(start[rows]), start_text[rows], end_text[rows])))
+    checks.append(("date_order", start > end, lambda rows: start_text[rows] + " > " + end_text[rows]))
+
+    reasons = column_text("REASON_CODE")
+    valid = {code.upper() for code in valid_reason_codes}
+    checks.append(("reason_code", map_unique(reasons, lambda codes: [c.upper() not in valid for c in codes]),
+                   reasons))
+
+    if valid_process_levels:
+        levels = table.numbers("PROCESS_LEVEL") if "PROCESS_LEVEL" in table else np.full(n, np.nan)
+        outside = ~np.isnan(levels) & ~np.isin(levels, np.asarray(valid_process_levels, dtype=np.float64))
+        checks.append(("process_level", outside, column_text("PROCESS_LEVEL")))
+
+    rows = [np.flatnonzero(mask) for _, mask, _ in checks]
+    failed = np.concatenate(rows)
+    order = np.lexsort((np.concatenate([np.full(len(r), i) for i, r in enumerate(rows)]), failed))
+    rules = np.concatenate([np.full(len(r), rule, dtype=object) for (rule, _, _), r in zip(checks, rows)])
+    found = np.concatenate([values(r) if callable(values) else values[r] for (_, _, values), r in zip(checks, rows)])
+    return pd.DataFrame({
+        "ROW": failed[order],
+        "RULE": pd.Series(rules[order], dtype=object),
+        "VALUE": pd.Series(found.astype(object)[order], dtype=object),
+    })
+
+
+def validate(table, valid_reason_codes):
+    """
+    ScenarioProcessor.ValidateLeaveRequest for every row; returns error
+    messages (None = ok): the message of each row's first failed check.
+    """
+    failures = validation_errors(table, valid_reason_codes)
+    errors = np.full(len(table), None, dtype=object)
+    first = failures[failures["RULE"].isin(VALIDATION_RULES)].drop_duplicates("ROW")
+    listed = ", ".join(c.upper() for c in valid_reason_codes)
+    for rule, group in first.groupby("RULE", sort=False):
+        rows = group["ROW"].to_numpy()
+        if rule == "reason_code":
+            errors[rows] = [VALIDATION_RULES[rule].format(value=v, codes=listed) for v in group["VALUE"]]
+        else:
+            errors[rows] = VALIDATION_RULES[rule]
+    return errors
+
+
+def _numeric_or_zero(table, column, failed):
+    """Convert.ToDouble semantics: empty -> 0, non-numeric -> calculation failure."""
+    values = table.numbers(column)
+    failed |= ~table.is_empty(column) & np.isnan(values)
+    return np.where(np.isnan(values), 0.0, values)
+
+
+def calculate_variables(table):
+    """
+    VariableCalculator.CalculateVariables(DataRow) over whole columns.
+
+    Stores the derived values in ``table.variables`` and returns a boolean mask
+    of rows where the C# calculation would throw (and the row is rejected with
+    "Failed to calculate required variables").
+    """
+    n = len(table)
+    failed = np.zeros(n, dtype=bool)
+    v = table.variables
+
+    sched = table.numbers("SCHED_HRS")
+    rate = table.numbers("PAY_RATE")
+    week = table.numbers("WEEK_OF_PP")
+    failed |= np.isnan(sched) | np.isnan(rate) | np.isnan(week) | (week != np.floor(week))
+    pay_start = table.dates("PAY_START_DATE")
+    pay_end = table.dates("PAY_END_DATE")
+    failed |= np.isnat(pay_start) | np.isnat(pay_end)
+
+    v["ScheduledHours"] = sched
+    v["PayRate"] = rate
+    v["WeekOfPP"] = week
+    v["PtoHrsLast1Week"] = _numeric_or_zero(table, "PTO_HRS_LASTWEEK", failed)
+    v["PtoHrsLast2Week"] = _numeric_or_zero(table, "PTO_HRS_LAST_TWOWEEK", failed)
+    v["PtoAvail"] = _numeric_or_zero(table, "PTO_AVAIL", failed)
+    v["BasicSickLast1Week"] = _numeric_or_zero(table, "BASICSICK_LAST1WEEK", failed)
+    v["BasicSickLast2Week"] = _numeric_or_zero(table, "BASICSICK_LAST2WEEK", failed)
+    v["BasicSickAvail"] = _numeric_or_zero(table, "BASICSICK_AVAILABLE", failed)
+    status = table.text("EMP_STATUS")
+    v["EmployeeStatusCode"] = map_unique(
+        status, lambda codes: np.array([EMPLOYEE_STATUS_CODES.get(s.lower(), 0.0) for s in codes]))
+
+    # Weekly wage and CT PL
+    weekly_wage = rate * sched
+    v["WeeklyWage"] = weekly_wage
+    v["MinWage40"] = np.full(n, MIN_WAGE * 40)
+    v["NinetyFiveCTMin40"] = v["MinWage40"] * 0.95
+    v["CtplCalcStar"] = (weekly_wage - v["MinWage40"]) * 0.6
+    v["CtplCalc"] = v["NinetyFiveCTMin40"] + v["CtplCalcStar"]
+
+    approved_amount = table.numbers("CTPL_APPROVED_AMOUNT")
+    has_amount = ~table.is_empty("CTPL_APPROVED_AMOUNT")
+    failed |= has_amount & np.isnan(approved_amount)
+    v["CtplPayment"] = np.where(
+        has_amount, approved_amount,
+        np.where(v["CtplCalc"] < MAX_CTPL_PAY, v["CtplCalc"], MAX_CTPL_PAY))
+
+    # STD
+    std_empty = table.is_empty("STD_APPROVED_THROUGH")
+    std_through = table.dates("STD_APPROVED_THROUGH")
+    failed |= ~std_empty & np.isnat(std_through)
+    std_amount = weekly_wage * 0.6
+    std_active = ~std_empty & ~(pay_end > std_through)
+    v["StdOrNot"] = np.where(
+        std_active & (std_amount > v["CtplPayment"]), std_amount - v["CtplPayment"], 0.0)
+
+    std_inactive = std_empty | (pay_start > std_through)
+    v["PtoSuppDollars"] = np.where(
+        std_inactive,
+        weekly_wage - v["CtplPayment"],
+        weekly_wage - v["CtplPayment"] - v["StdOrNot"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v["PtoSuppHrs"] = v["PtoSuppDollars"] / rate
+
+    # Basic sick
+    forty_pct = sched * 0.4
+    bs_calc = v["BasicSickAvail"] - v["BasicSickLast1Week"] - v["BasicSickLast2Week"]
+    v["BasicSickAvailCalc"] = bs_calc
+    v["BasicSickStd"] = np.where(bs_calc >= forty_pct, forty_pct, bs_calc)
+    v["BasicSickStdCtpl"] = np.where(
+        bs_calc >= v["PtoSuppHrs"], v["PtoSuppHrs"], np.where(bs_calc > 0, bs_calc, 0.0))
+
+    # PTO
+    rtw_no = map_unique(table.text("EE_PTO_RTW"),
+                        lambda flags: np.array([s.upper() == "N" for s in flags], dtype=bool))
+    v["PtoReserve"] = np.where(rtw_no, 0.0, sched * 2)
+    v["PtoAvailCalc"] = np.where(
+        week == 1,
+        v["PtoAvail"] - v["PtoHrsLast1Week"] - v["PtoHrsLast2Week"],
+        v["PtoAvail"] - v["PtoHrsLast1Week"])
+    headroom = v["PtoAvailCalc"] - v["PtoReserve"]
+    v["PtoUsable"] = np.where(headroom > 0, headroom, 0.0)
+    supp = v["PtoSuppHrs"]
+    v["PtoUseHrs"] = np.where(
+        (v["PtoUsable"] - supp) > 0, supp, np.where(supp > 0, v["PtoUsable"], 0.0))
+    v["PtoBasicSickStd"] = np.where(
+        v["PtoUsable"] >= forty_pct - v["BasicSickStd"], forty_pct - v["BasicSickStd"], v["PtoUsable"])
+    v["PtoBasicSickStdCtpl"] = np.where(
+        v["PtoUseHrs"] >= supp - v["BasicSickStdCtpl"], supp - v["BasicSickStdCtpl"], v["PtoUsable"])
+
+    return failed
+
+
+# ----- Conditions ------------------------------------------------------------
+# Column-wise ports of ESLFeeder/Models/Conditions/C6..C28 (DataRow overloads).
+# NaT/NaN comparisons are False, which matches the C# paths that throw or skip
+# on empty/unparseable values.
+
+def _upper_eq(table, column, value):
+    return map_unique(table.text(column), lambda texts: np.array([s.upper() == value for s in texts], dtype=bool))
+
+
+def _c6(t):
+    return ~t.is_empty("STD_APPROVED_THROUGH") & (t.dates("PAY_END_DATE") <= t.dates("STD_APPROVED_THROUGH"))
+
+
+def _c7(t):
+    return t.is_empty("STD_APPROVED_THROUGH") | (t.dates("PAY_START_DATE") > t.dates("STD_APPROVED_THROUGH"))
+
+
+def _c8(t):
+    rate = t.var("PayRate")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (rate > 0) & ((t.var("StdOrNot") / rate) > 0)
+
+
+def _ctpl_pending(t, date_column):
+    return (t.is_empty(date_column)
+            & _upper_eq(t, "CTPL_FORM", "Y")
+            & ~_upper_eq(t, "CTPL_DENIED_IND", "Y"))
+
+
+def _c9(t):
+    return (t.dates("PAY_START_DATE") >= t.dates("CTPL_START_DATE")) | _ctpl_pending(t, "CTPL_START_DATE")
+
+
+def _c10(t):
+    return (t.dates("PAY_END_DATE") <= t.dates("CTPL_END_DATE")) | _ctpl_pending(t, "CTPL_END_DATE")
+
+
+def _c11(t):
+    return (t.is_empty("CTPL_FORM")
+            | (t.dates("PAY_START_DATE") > t.dates("CTPL_END_DATE"))
+            | (_upper_eq(t, "CTPL_FORM", "Y")
+               & _upper_eq(t, "CTPL_DENIED_IND", "Y")
+               & t.is_empty("CTPL_APPROVED_AMOUNT")))
+
+
+def _c12(t):
+    if "EE_PTO_SUPP" not in t:
+        return np.zeros(len(t), dtype=bool)
+    return _upper_eq(t, "EE_PTO_SUPP", "Y")
+
+
+def _c13(t):
+    return t.var("ScheduledHours") * 0.4 <= t.var("PtoUsable")
+
+
+def _c14(t):
+    return t.var("PtoUseHrs") > 0
+
+
+def _c15(t):
+    return t.var("PtoUsable") > 0
+
+
+def _c16(t):
+    return ~t.is_empty("FMLA_APPR_DATE") & (t.dates("PAY_END_DATE") <= t.dates("FMLA_APPR_DATE"))
+
+
+def _c17(t):
+    pay_start = t.dates("PAY_START_DATE")
+    fmla_inactive = t.is_empty("FMLA_APPR_DATE") | (pay_start > t.dates("FMLA_APPR_DATE"))
+    ctpl_inactive = t.is_empty("CTPL_FORM") | (pay_start > t.dates("CTPL_END_DATE"))
+    return fmla_inactive & ctpl_inactive
+
+
+def _c18(t):
+    return (t.is_empty("CTPL_APPROVED_AMOUNT")
+            & t.is_empty("FMLA_APPR_DATE")
+            & t.is_empty("STD_APPROVED_THROUGH"))
+
+
+def _c19(t):
+    return t.var("PtoUsable") >= t.var("ScheduledHours")
+
+
+def _c20(t):
+    return t.var("BasicSickAvailCalc") > 0
+
+
+def _c21(t):
+    return t.var("BasicSickAvailCalc") >= t.var("ScheduledHours") * 0.4
+
+
+def _c22(t):
+    return t.var("BasicSickAvailCalc") >= t.var("PtoSuppHrs")
+
+
+def _c23(t):
+    pay_start = t.dates("PAY_START_DATE")
+    pay_end = t.dates("PAY_END_DATE")
+    std_inactive = t.is_empty("STD_APPROVED_THROUGH") | (pay_start >= t.dates("STD_APPROVED_THROUGH"))
+    ctpl_inactive = t.is_empty("CTPL_FORM") | (pay_start >= t.dates("CTPL_END_DATE"))
+    fmla = t.dates("FMLA_APPR_DATE")
+    fmla_inactive = t.is_empty("FMLA_APPR_DATE") | (pay_start >= fmla) | (fmla < pay_end)
+    return std_inactive & ctpl_inactive & fmla_inactive
+
+
+def _within_pay_week(t, column):
+    value = t.dates(column)
+    return (value >= t.dates("PAY_START_DATE")) & (value <= t.dates("PAY_END_DATE"))
+
+
+def _c24(t):
+    return (_within_pay_week(t, "STD_APPROVED_THROUGH")
+            | _within_pay_week(t, "CTPL_START_DATE")
+            | _within_pay_week(t, "CTPL_END_DATE"))
+
+
+def _c25(t):
+    if "CTPL_APPROVED_IND" not in t or "CTPL_DENIED_IND" not in t:
+        return np.zeros(len(t), dtype=bool)
+    return _upper_eq(t, "CTPL_APPROVED_IND", "Y") & _upper_eq(t, "CTPL_DENIED_IND", "Y")
+
+
+def _c26(t):
+    if "BEGIN_DATE" not in t:
+        return np.zeros(len(t), dtype=bool)
+    return t.dates("BEGIN_DATE") > t.dates("PAY_START_DATE")
+
+
+def _c27(t):
+    # C27 also requires PAY_START_DATE to parse even though it only compares PAY_END_DATE
+    return ~np.isnat(t.dates("PAY_START_DATE")) & (t.dates("RTW_FT") <= t.dates("PAY_END_DATE"))
+
+
+def _c28(t):
+    return t.numbers("SCHED_HRS") < 1
+
+
+CONDITIONS = {
+    "C6": _c6, "C7": _c7, "C8": _c8, "C9": _c9, "C10": _c10, "C11": _c11,
+    "C12": _c12, "C13": _c13, "C14": _c14, "C15": _c15, "C16": _c16,
+    "C17": _c17, "C18": _c18, "C19": _c19, "C20": _c20, "C21": _c21,
+    "C22": _c22, "C23": _c23, "C24": _c24, "C25": _c25, "C26": _c26,
+    "C27": _c27, "C28": _c28,
+}
+
+
+def evaluate_conditions(table, names, conditions=None, profile=None):
+    """
+    Evaluate each named condition once over the whole table.
+
+    Unknown names are left out (the C# registry skips them), and a condition
+    that cannot be evaluated (e.g. a missing column) is False for every row,
+    as it would be when the C# Evaluate throws.
+    """
+    conditions = CONDITIONS if conditions is None else conditions
+    results = {}
+    for name in names:
+        func = conditions.get(name)
+        if func is None:
+            continue
+        start = time.perf_counter()
+        failed = False
+        try:
+            results[name] = np.asarray(func(table), dtype=bool)
+        except KeyError:
+            results[name] = np.zeros(len(table), dtype=bool)
+            failed = True
+        if profile is not None:
+            profile.condition(name, results[name], time.perf_counter() - start, failed)
+    return results
+
+
+# ----- Matching --------------------------------------------------------------
+
+def scenario_mask(scenario, condition_results, rows):
+    """Rows (within ``rows``) where all required hold and no forbidden condition does."""
+    mask = rows.copy()
+    for name in scenario["required"]:
+        if name in condition_results:
+            mask &= condition_results[name]
+    for name in scenario["forbidden"]:
+        if name in condition_results:
+            mask &= ~condition_results[name]
+    return mask
+
+
+def match_scenarios(table, scenarios, eligible, condition_results, profile=None):
+    """
+    First-match scenario assignment per (REASON_CODE, PROCESS_LEVEL) group.
+
+    Returns an int array of scenario ids (-1 = no scenario found).  With a
+    ``profile``, the search time of each group and the rows each scenario is
+    tested against and matches are recorded.
+    """
+    n = len(table)
+    matched = np.full(n, -1, dtype=np.int64)
+    keys = pd.DataFrame({
+        "reason": pd.Series(table.text("REASON_CODE")).str.upper(),
+        "level": table.numbers("PROCESS_LEVEL"),
+    })
+    for (reason, level), index in keys[eligible].groupby(["reason", "level"], dropna=True).groups.items():
+        if level != int(level):
+            continue
+        group_start = time.perf_counter()
+        remaining = np.zeros(n, dtype=bool)
+        remaining[np.asarray(index)] = True
+        tried = 0
+        for scenario in candidate_scenarios(scenarios, reason, int(level)):
+            start = time.perf_counter()
+            hit = scenario_mask(scenario, condition_results, remaining)
+            matched[hit] = scenario["id"]
+            if profile is not None:
+                profile.scenario(scenario, f"{reason} {int(level)}", int(remaining.sum()), int(hit.sum()),
+                                 time.perf_counter() - start)
+            tried += 1
+            remaining &= ~hit
+            if not remaining.any():
+                break
+        if profile is not None:
+            profile.search(f"{reason} {int(level)}", len(index), len(index) - int(remaining.sum()), tried,
+                           time.perf_counter() - group_start)
+    return matched
+
+
+# ----- Field calculation -----------------------------------------------------
+
+def variable_value(table, name):
+    """ScenarioCalculator.GetVariableValue (unknown names evaluate to 0)."""
+    key = VARIABLE_LOOKUP.get((name or "").lower())
+    if key is None:
+        return np.zeros(len(table))
+    return table.var(key)
+
+
+def _operand_value(table, operand):
+    if operand.get("constant") is not None:
+        return np.full(len(table), float(operand["constant"]))
+    if operand.get("variable"):
+        return variable_value(table, operand["variable"])
+    return np.zeros(len(table))
+
+
+def calculate_value(table, calculation):
+    """ScenarioCalculator.CalculateValue over whole columns."""
+    n = len(table)
+    operation = (calculation.get("operation") or "").lower()
+    operands = [_operand_value(table, op) for op in calculation.get("operands") or []]
+    if operation == "direct" and operands:
+        return operands[0]
+    if operation == "multiply" and operands:
+        return np.prod(operands, axis=0)
+    if operation == "divide" and len(operands) == 2:
+        dividend, divisor = operands
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(np.abs(divisor) < 0.0001, 0.0, dividend / divisor)
+    if operation == "add" and operands:
+        return np.sum(operands, axis=0)
+    if operation == "subtract" and len(operands) == 2:
+        return operands[0] - operands[1]
+    return np.zeros(n)
+
+
+def field_value(table, field, now_text):
+    """
+    Value of one updates.fields entry for every row of ``table``.
+
+    Returns a float array, a scalar string/None, or the sentinel ``SKIP`` when
+    the C# calculator leaves the column untouched.
+    """
+    kind = field.get("type")
+    source = field.get("source")
+    if kind == "double":
+        if field.get("calculation") is not None:
+            return calculate_value(table, field["calculation"])
+        if isinstance(source, str) and _DOUBLE_RE.match(source):
+            return np.full(len(table), float(source))
+        if isinstance(source, str) and source.startswith("variables."):
+            return variable_value(table, source[len("variables."):])
+        return variable_value(table, source)
+    if kind == "string":
+        upper = source.upper() if isinstance(source, str) else None
+        if upper == "PTO_USABLE":
+            return table.var("PtoUsable")
+        if upper == "NULL":
+            return None
+        return source
+    if kind == "date" and isinstance(source, str) and source.upper() == "CURRENT_DATE":
+        return now_text
+    return SKIP
+
+
+SKIP = object()
+
+
+def format_double(value):
+    """Render a double the way .NET's double.ToString() does (shortest round-trip)."""
+    if np.isnan(value):
+        return "NaN"
+    if np.isinf(value):
+        return "∞" if value > 0 else "-∞"
+    text = repr(float(value))
+    if text.endswith(".0"):
+        text = text[:-2]
+    return text.replace("e", "E")
+
+
+def format_datetime(moment):
+    """en-US DateTime.ToString(): 6/12/2025 1:24:59 PM."""
+    hour = moment.hour % 12 or 12
+    suffix = "AM" if moment.hour < 12 else "PM"
+    return f"{moment.month}/{moment.day}/{moment.year} {hour}:{moment:%M:%S} {suffix}"
+
+
+def format_doubles(values):
+    """format_double over an array, formatting each distinct value once."""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.int64)
+    unique, inverse = np.unique(bits, return_inverse=True)
+    texts = np.array([format_double(x) for x in unique.view(np.float64)], dtype=object)
+    return texts[inverse.reshape(-1)]
+
+
+def apply_updates(table, scenarios_by_id, matched, outputs, now_text):
+    """
+    Write each matched scenario's updates into the ``outputs`` column arrays.
+
+    Field sources are compiled once (field_expressions.py) and every distinct
+    expression is evaluated once over the whole table; each scenario then
+    takes its own rows.
+    """
+    from field_expressions import compile_scenario
+
+    evaluated = {}
+    for scenario_id in np.unique(matched[matched >= 0]):
+        scenario = scenarios_by_id[int(scenario_id)]
+        rows = np.flatnonzero(matched == scenario_id)
+        for field in compile_scenario(scenario):
+            if field.column not in outputs or field.kind == "skip":
+                continue
+            if field.kind == "number":
+                if field.code not in evaluated:
+                    evaluated[field.code] = field.evaluate(table)
+                outputs[field.column][rows] = format_doubles(evaluated[field.code][rows])
+            elif field.kind == "now":
+                outputs[field.column][rows] = now_text
+            else:
+                outputs[field.column][rows] = "" if field.value is None else field.value
+
+
+def subset(table, rows):
+    """A ColumnTable restricted to ``rows`` (variables and parsed views included)."""
+    sub = ColumnTable(table.frame.iloc[rows])
+    sub.variables = {k: v[rows] for k, v in table.variables.items()}
+    sub._text = {k: v[rows] for k, v in table._text.items()}
+    sub._dates = {k: v[rows] for k, v in table._dates.items()}
+    sub._numbers = {k: v[rows] for k, v in table._numbers.items()}
+    return sub
+
+
+# ----- Pipeline --------------------------------------------------------------
+
+def score_frame(frame, config, conditions=None, now=None, index=None, profile=None):
+    """
+    Run the full pipeline on a raw input frame and return the processed frame
+    (same columns and values as CsvProcessor.ProcessRecords would produce).
+
+    ``index`` is an optional matcher built from the same config
+    (scenario_index.ScenarioIndex, selective_matching.SelectiveMatcher); when
+    given, only its condition_names() are evaluated up front and scenarios
+    are matched with its match().
+    ``profile`` is an optional scenario_profile.RunProfile that collects
+    stage, condition and scenario timings.
+    """
+    if profile is None:
+        return score_table(ColumnTable(clean_frame(frame)), config, conditions, now, index)
+    with profile.stage("clean"):
+        table = ColumnTable(clean_frame(frame))
+    return score_table(table, config, conditions, now, index, profile)
+
+
+def score_table(table, config, conditions=None, now=None, index=None, profile=None):
+    """score_frame for an already cleaned ColumnTable (e.g. RowStore.table())."""
+    stage = profile.stage if profile is not None else _untimed
+    if profile is not None:
+        profile.run(len(table))
+    now_text = format_datetime(now or datetime.now())
+    scenarios = normalize_scenarios(config)
+    scenarios_by_id = {s["id"]: s for s in scenarios}
+    metadata = config.get("metadata") or {}
+
+    with stage("validate"):
+        errors = validate(table, metadata.get("valid_reason_codes") or [])
+    with stage("variables"):
+        failed = calculate_variables(table)
+    errors = unmatchable_rows(table, errors, failed)
+
+    eligible = errors == None  # noqa: E711
+    names = sorted({c for s in scenarios for c in s["required"] + s["forbidden"]})
+    if index is not None:
+        names = index.condition_names()
+    with stage("conditions"):
+        condition_results = evaluate_conditions(table, names, conditions, profile)
+    with stage("match"):
+        if index is not None:
+            matched = index.match(table, eligible, condition_results)
+        else:
+            matched = match_scenarios(table, scenarios, eligible, condition_results, profile)
+    errors[eligible & (matched < 0)] = NO_SCENARIO_MESSAGE
+
+    with stage("output"):
+        return build_output(table, scenarios_by_id, matched, errors, now_text)
+
+
+def unmatchable_rows(table, errors, failed):
+    """
+    Add the variable-calculation and PROCESS_LEVEL errors to validate()'s
+    ``errors``; rows still None are matched against the scenarios.
+    """
+    errors = errors.copy()
+    errors[(errors == None) & failed] = "Failed to calculate required variables"  # noqa: E711
+
+    level = table.numbers("PROCESS_LEVEL")
+    bad_level = np.isnan(level) | (level != np.floor(level))
+    errors[(errors == None) & bad_level] = INVALID_NUMBER_MESSAGE  # noqa: E711
+    return errors
+
+
+def _untimed(name):
+    return nullcontext()
+
+
+def build_output(table, scenarios_by_id, matched, errors, now_text):
+    """Assemble SCENARIO_ID/SCENARIO_NAME and the scenario output columns."""
+    out = table.frame.copy()
+    for column in OUTPUT_COLUMNS:
+        if column not in out.columns:
+            out[column] = ""
+    outputs = {column: out[column].to_numpy(dtype=object).copy() for column in OUTPUT_COLUMNS}
+    apply_updates(table, scenarios_by_id, matched, outputs, now_text)
+    for column, values in outputs.items():
+        out[column] = values
+
+    out["SCENARIO_ID"], out["SCENARIO_NAME"] = scenario_labels(scenarios_by_id, matched, errors)
+    return out
+
+
+def scenario_labels(scenarios_by_id, matched, errors):
+    """SCENARIO_ID and SCENARIO_NAME values: the scenario, or -1 and "Error: <message>"."""
+    ok = matched >= 0
+    ids = np.where(ok, matched, -1).astype(str)
+    names = np.array([scenarios_by_id[int(i)]["name"] if i >= 0 else "" for i in matched], dtype=object)
+    names[~ok] = ["Error: " + (e or "") for e in errors[~ok]]
+    return ids, names
+
+
+def write_output(frame, path):
+    """
+    CsvProcessor.SaveToCsv: comma separated, quoted only when needed.  A
+    .parquet / .arrow path is written with arrow_io's fixed schema instead.
+    """
+    if Path(path).suffix.lower() in ARROW_SUFFIXES:
+        from arrow_io import write_arrow
+        write_arrow(frame, path)
+        return
+    frame.to_csv(path, index=False, lineterminator="\n")
+
+
+def default_output_path(input_path, now=None):
+    stamp = (now or datetime.now()).strftime("%Y%m%d_%H%M%S")
+    input_path = Path(input_path)
+    return input_path.with_name(f"{input_path.stem}_processed_{stamp}.csv")
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Vectorized scenario evaluation of an ESL input CSV.")
+    ap.add_argument("-i", "--input", required=True, help="Path to the input CSV")
+    ap.add_argument("-c", "--config", default=str(DEFAULT_CONFIG), help="Path to scenarios.json")
+    ap.add_argument("-o", "--output", help="Output path (default: <input>_processed_<timestamp>.csv)")
+    ap.add_argument("--conditions-csv", help="Use the formulas in ConditionsCsv.csv (compiled and cached) "
+                                             "instead of the built-in C6..C18 ports")
+    ap.add_argument("--index", action="store_true",
+                    help="Match through the precomputed scenario index (rebuilt if scenarios.json changed)")
+    ap.add_argument("--selective", action="store_true",
+                    help="Evaluate conditions lazily, cheapest and most selective first (selective_matching.py)")
+    ap.add_argument("--condition-bits", action="store_true",
+                    help="Match on the per-row condition bits cached in .esl_cache/ (condition_bits.py)")
+    ap.add_argument("--row-cache", action="store_true",
+                    help="Read the input through the typed row store cached in .esl_cache/ (built on first use)")
+    ap.add_argument("--errors", metavar="PATH",
+                    help="Write every failed validation check (ROW, RULE, VALUE) to this CSV")
+    ap.add_argument("--profile", metavar="PATH",
+                    help="Save stage/condition/scenario timings as JSON (and a .folded flame-graph file)")
+    args = ap.parse_args()
+
+    conditions = None
+    if args.conditions_csv:
+        from compile_conditions import load_conditions
+        # CSV formulas take precedence; conditions the CSV does not define keep the built-ins
+        conditions = dict(CONDITIONS, **load_conditions(args.conditions_csv))
+
+    now = datetime.now()
+    config = load_config(args.config)
+    if args.index + args.selective + args.condition_bits > 1:
+        ap.error("--index, --selective and --condition-bits are alternative matchers")
+    index = None
+    if args.index:
+        from scenario_index import load_index
+        index = load_index(args.config, known_conditions=conditions or CONDITIONS)
+    profile = None
+    if args.profile:
+        from scenario_profile import RunProfile
+        profile = RunProfile()
+    if args.selective:
+        from selective_matching import SelectiveMatcher
+        index = SelectiveMatcher(config, conditions, profile=profile)
+    with (profile.stage if profile is not None else _untimed)("clean"):
+        if args.row_cache:
+            from row_store import load_rows
+            table = load_rows(args.input).table()
+        else:
+            table = ColumnTable(clean_frame(load_input(args.input)))
+    if args.errors:
+        metadata = config.get("metadata") or {}
+        failures = validation_errors(table, metadata.get("valid_reason_codes") or [],
+                                     metadata.get("valid_process_levels"))
+        failures.assign(ROW=failures["ROW"] + 1).to_csv(args.errors, index=False, lineterminator="\n")
+        print(f"{failures['ROW'].nunique()} rows failed validation ({len(failures)} checks) → "
+              f"{Path(args.errors).resolve()}")
+    if args.condition_bits:
+        from condition_bits import BitMatcher, ConditionBits
+        index = BitMatcher(config, ConditionBits.for_input(args.input, len(table)), conditions)
+    processed = score_table(table, config, conditions=conditions, now=now, index=index, profile=profile)
+
+    out_path = Path(args.output) if args.output else default_output_path(args.input, now)
+    write_output(processed, out_path)
+
+    matched = (processed["SCENARIO_ID"] != "-1").sum()
+    print(f"Scored {len(processed)} rows ({matched} matched) → {out_path.resolve()}")
+    if profile is not None:
+        json_path, folded_path = profile.save(args.profile)
+        print(f"Profile → {json_path.resolve()} (flame graph stacks: {folded_path.name})")
+
+
+if __name__ == "__main__":
+    main()
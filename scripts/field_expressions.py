@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+field_expressions.py
+--------------------
+Compile the updates.fields sources of scenarios.json, e.g.
+
+    variables.ScheduledHours * 0.6
+    MIN(SCHED_HRS * 0.4, variables.BasicSickAvailCalc)
+    IF(variables.PtoUsable > 0, PTO_USE_HRS, 0)
+
+into vectorized functions over an evaluate_scenarios.ColumnTable.  Each
+expression is parsed once and turned into a small NumPy function; scenarios
+that share an expression share the compiled function, and the compiled
+fields of a scenario are cached, so scoring an input file evaluates every
+distinct expression once over whole columns instead of interpreting the
+source strings per row.
+
+Expression language
+-------------------
+- arithmetic   +  -  *  /  with parentheses and numbers (x / y is 0 when |y| < 0.0001,
+               like ScenarioCalculator)
+- MIN(a, b, ...), MAX(a, b, ...), IF(condition, then, else)
+- conditions   <  <=  >  >=  =  <>,  X IS [NOT] NULL,  AND(...), OR(...), NOT(...)
+- variables    variables.ScheduledHours, ScheduledHours, or the raw names of
+               VARIABLE_NAME_MAP (SCHED_HRS, PTO_USE_HRS, ...); unknown names
+               evaluate to 0, as in ScenarioCalculator.GetVariableValue
+- a double source that is not an expression at all (e.g. "HR Connect")
+  also evaluates to 0; the listing shows it as a warning
+
+Fields with a "calculation" object are compiled from the calculation (that is
+what the feeder evaluates); "string" and "date" fields keep their literal
+meaning.
+
+Usage
+-----
+$ python field_expressions.py                          # list the compiled fields of scenarios.json
+$ python field_expressions.py -e "MIN(SCHED_HRS * 0.4, BASIC_SICK_AVAIL_CALC)"
+"""
+
+import argparse
+import json
+import sys
+from functools import lru_cache, reduce
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from append_scenarios import VARIABLE_NAME_MAP
+from compile_conditions import ConditionSyntaxError, parse_logic
+from evaluate_scenarios import _DOUBLE_RE, DEFAULT_CONFIG, VARIABLE_LOOKUP, load_config, normalize_scenarios
+
+
+# ----- Configuration ---------------------------------------------------------
+
+FUNCTIONS = {"MIN", "MAX", "IF", "AND", "OR", "NOT"}
+
+# LeaveVariables properties an expression may name directly (variables.PtoUsable)
+VARIABLE_PROPERTIES = {name.lower(): name for name in set(VARIABLE_LOOKUP.values()) | set(VARIABLE_NAME_MAP.values())}
+
+# ScenarioCalculator.CalculateValue treats smaller divisors as zero
+DIVIDE_EPSILON = 0.0001
+
+
+class FieldExpressionError(ValueError):
+    """Raised when a field source cannot be compiled."""
+
+
+# ----- Name resolution -------------------------------------------------------
+
+def resolve_variable(name):
+    """
+    LeaveVariables property for an expression name, or None if unknown.
+
+    The calculator's own lookup (VARIABLE_LOOKUP) wins, so every source it
+    understands keeps its value; raw workbook names (SCHED_HRS) and plain
+    property names are accepted on top of it.
+    """
+    lowered = name.lower()
+    if lowered.startswith("variables."):
+        lowered = lowered[len("variables."):]
+    if lowered in VARIABLE_LOOKUP:
+        return VARIABLE_LOOKUP[lowered]
+    if lowered.upper() in VARIABLE_NAME_MAP:
+        return VARIABLE_NAME_MAP[lowered.upper()]
+    return VARIABLE_PROPERTIES.get(lowered)
+
+
+# ----- Code generation -------------------------------------------------------
+
+def _number(node, warnings):
+    """Python expression (over the ColumnTable ``t``) for a numeric AST node."""
+    tag = node[0]
+    if tag == "num":
+        return repr(node[1])
+    if tag == "name":
+        key = resolve_variable(node[1])
+        if key is None:
+            warnings.append(f"unknown variable {node[1]} (evaluates to 0)")
+            return "0.0"
+        return f"t.var({key!r})"
+    if tag == "neg":
+        return f"(-{_number(node[1], warnings)})"
+    if tag == "arith":
+        left, right = _number(node[2], warnings), _number(node[3], warnings)
+        if node[1] == "/":
+            return f"_div({left}, {right})"
+        return f"({left} {node[1]} {right})"
+    if tag == "call" and node[1] in ("MIN", "MAX"):
+        if not node[2]:
+            raise FieldExpressionError(f"{node[1]} needs at least one argument")
+        return f"_{node[1].lower()}({', '.join(_number(a, warnings) for a in node[2])})"
+    if tag == "call" and node[1] == "IF":
+        if len(node[2]) != 3:
+            raise FieldExpressionError("IF takes exactly three arguments: IF(condition, then, else)")
+        condition, then, otherwise = node[2]
+        return (f"np.where({_condition(condition, warnings)}, "
+                f"{_number(then, warnings)}, {_number(otherwise, warnings)})")
+    if tag in ("call", "cmp", "isnull"):
+        return f"({_condition(node, warnings)} * 1.0)"
+    if tag == "str":
+        raise FieldExpressionError(f"Text {node[1]!r} cannot be used in a numeric field")
+    raise FieldExpressionError(f"Cannot use {node!r} as a number")
+
+
+def _condition(node, warnings):
+    """Python expression for a boolean AST node."""
+    tag = node[0]
+    if tag == "call" and node[1] in ("AND", "OR", "NOT"):
+        args = [_condition(a, warnings) for a in node[2]]
+        if node[1] == "NOT":
+            if len(args) != 1:
+                raise FieldExpressionError("NOT takes exactly one argument")
+            return f"(~{args[0]})"
+        return "(" + (" & " if node[1] == "AND" else " | ").join(args) + ")"
+    if tag == "cmp":
+        return f"({_number(node[2], warnings)} {node[1]} {_number(node[3], warnings)})"
+    if tag == "isnull":
+        test = f"np.isnan({_number(node[1], warnings)})"
+        return f"(~{test})" if node[2] else test
+    return f"_truthy({_number(node, warnings)})"
+
+
+def expression_code(text):
+    """Compile a field source to (python expression, warnings)."""
+    if _DOUBLE_RE.match(text):
+        return repr(float(text)), []
+    try:
+        ast, notes = parse_logic(text, FUNCTIONS)
+    except ConditionSyntaxError as exc:
+        raise FieldExpressionError(f"{exc} in {text!r}") from exc
+    warnings = list(notes)
+    return _number(ast, warnings), warnings
+
+
+def calculation_code(calculation):
+    """Python expression for a calculation object (ScenarioCalculator.CalculateValue)."""
+    warnings = []
+    operands = []
+    for operand in calculation.get("operands") or []:
+        if operand.get("constant") is not None:
+            operands.append(repr(float(operand["constant"])))
+        elif operand.get("variable"):
+            # The calculator resolves calculation variables through its lookup only
+            key = VARIABLE_LOOKUP.get(operand["variable"].lower())
+            if key is None:
+                warnings.append(f"unknown variable {operand['variable']} (evaluates to 0)")
+            operands.append(f"t.var({key!r})" if key else "0.0")
+        else:
+            operands.append("0.0")
+    operation = (calculation.get("operation") or "").lower()
+    if operation == "direct" and operands:
+        return operands[0], warnings
+    if operation == "multiply" and operands:
+        return "(" + " * ".join(operands) + ")", warnings
+    if operation == "divide" and len(operands) == 2:
+        return f"_div({operands[0]}, {operands[1]})", warnings
+    if operation == "add" and operands:
+        return "(" + " + ".join(operands) + ")", warnings
+    if operation == "subtract" and len(operands) == 2:
+        return f"({operands[0]} - {operands[1]})", warnings
+    warnings.append(f"unsupported calculation {operation!r} (evaluates to 0)")
+    return "0.0", warnings
+
+
+# ----- Compilation -----------------------------------------------------------
+
+def _div(dividend, divisor):
+    return np.where(np.abs(divisor) < DIVIDE_EPSILON, 0.0, dividend / divisor)
+
+
+def _min(*values):
+    return reduce(np.minimum, values)
+
+
+def _max(*values):
+    return reduce(np.maximum, values)
+
+
+def _truthy(values):
+    values = np.asarray(values, dtype=np.float64)
+    return ~np.isnan(values) & (values != 0)
+
+
+def _column(result, n):
+    return np.broadcast_to(np.asarray(result, dtype=np.float64), (n,)).copy()
+
+
+_HELPERS = {"np": np, "_div": _div, "_min": _min, "_max": _max, "_truthy": _truthy, "_column": _column}
+
+_FUNCTION_TEMPLATE = '''
+def _field(t):
+    with np.errstate(all="ignore"):
+        return _column({code}, len(t))
+'''
+
+
+@lru_cache(maxsize=None)
+def compile_code(code):
+    """Turn a generated expression into a function ColumnTable -> float64 array."""
+    namespace = dict(_HELPERS)
+    exec(compile(_FUNCTION_TEMPLATE.format(code=code), f"<field: {code}>", "exec"), namespace)
+    return namespace["_field"]
+
+
+class CompiledField(NamedTuple):
+    """
+    One updates.fields entry, ready to apply.
+
+    kind: "number" (``evaluate(table)`` gives a float array), "value" (write
+    ``value``; None = empty), "now" (the run timestamp) or "skip" (leave the
+    column untouched, as ScenarioCalculator does).
+    """
+    column: str
+    kind: str
+    code: Optional[str] = None
+    evaluate: Optional[Callable[[Any], np.ndarray]] = None
+    value: Any = None
+    warnings: Tuple[str, ...] = ()
+
+
+def compile_field(column, field):
+    """Compile one field definition (same cases as evaluate_scenarios.field_value)."""
+    kind = field.get("type")
+    source = field.get("source")
+    if kind == "double":
+        try:
+            if field.get("calculation") is not None:
+                code, warnings = calculation_code(field["calculation"])
+            elif isinstance(source, str):
+                code, warnings = expression_code(source)
+            else:
+                code, warnings = "0.0", ["no source (evaluates to 0)"]
+        except FieldExpressionError as exc:
+            # GetVariableValue returns 0 for a source it cannot read; one bad field must not stop scoring
+            code, warnings = "0.0", [f"{exc} (evaluates to 0)"]
+        return CompiledField(column, "number", code, compile_code(code), warnings=tuple(warnings))
+    if kind == "string":
+        upper = source.upper() if isinstance(source, str) else None
+        if upper == "PTO_USABLE":
+            code = "t.var('PtoUsable')"
+            return CompiledField(column, "number", code, compile_code(code))
+        return CompiledField(column, "value", value=None if upper == "NULL" else source)
+    if kind == "date" and isinstance(source, str) and source.upper() == "CURRENT_DATE":
+        return CompiledField(column, "now")
+    return CompiledField(column, "skip")
+
+
+_scenario_cache: Dict[Tuple, List[CompiledField]] = {}
+
+
+def compile_scenario(scenario):
+    """
+    Compiled fields of a normalized scenario, in updates.order.  Cached per
+    scenario id and field definitions, so an edited scenario is recompiled.
+    """
+    fields = scenario["fields"]
+    key = (scenario.get("id"), json.dumps([scenario["order"], fields], sort_keys=True, default=str))
+    compiled = _scenario_cache.get(key)
+    if compiled is None:
+        compiled = []
+        for column in scenario["order"]:
+            field = fields.get(column)
+            if field is None:
+                continue
+            try:
+                compiled.append(compile_field(column, field))
+            except FieldExpressionError as exc:
+                raise FieldExpressionError(f"Scenario {scenario.get('id')}, {column}: {exc}") from exc
+        _scenario_cache[key] = compiled
+    return compiled
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Compile the updates.fields sources of scenarios.json.")
+    ap.add_argument("-c", "--config", default=str(DEFAULT_CONFIG), help="Path to scenarios.json")
+    ap.add_argument("-e", "--expression", help="Compile a single expression and print its code")
+    args = ap.parse_args()
+
+    if args.expression:
+        try:
+            code, warnings = expression_code(args.expression)
+        except FieldExpressionError as exc:
+            print(f"Error: {exc}")
+            sys.exit(1)
+        print(code)
+        for warning in warnings:
+            print(f"warning: {warning}")
+        return
+
+    distinct, count = {}, 0
+    for scenario in normalize_scenarios(load_config(args.config)):
+        for field in compile_scenario(scenario):
+            count += 1
+            if field.kind == "number":
+                entry = distinct.setdefault(field.code, {"scenarios": set(), "warnings": {}})
+                entry["scenarios"].add(scenario["id"])
+                for warning in field.warnings:
+                    entry["warnings"].setdefault(f"{field.column}: {warning}", set()).add(scenario["id"])
+    for code, entry in sorted(distinct.items()):
+        print(f"{code}  ({len(entry['scenarios'])} scenarios)")
+        for warning, ids in sorted(entry["warnings"].items()):
+            print(f"    warning: {warning} in scenarios {', '.join(map(str, sorted(ids)))}")
+    print(f"Compiled {count} fields; {len(distinct)} distinct numeric expressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+json_stream.py
+--------------
+Incremental JSON reading and writing for scenario files that are too large
+to load in one piece.
+
+- iter_array(f)         yields the elements of a top-level JSON array
+- iter_json_lines(f)    yields one value per non-empty line (JSON Lines)
+- iter_scenarios(path)  either of the above, picked from the first line
+- iter_object_array(f, key)  elements of the array under a top-level key,
+                        e.g. the "scenarios" of scenarios.json
+- ArrayWriter           writes a JSON array one element at a time, byte for
+                        byte the same as json.dumps(list, indent=2)
+
+Only one element (plus a read buffer) is held in memory at a time.
+
+Usage
+-----
+$ python json_stream.py --count ../ESLFeeder/Config/scenarios.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+# ----- Configuration ---------------------------------------------------------
+
+CHUNK_SIZE = 1 << 16
+# Longest first line read to tell JSON Lines from a single-line object
+PROBE_SIZE = 1 << 20
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+# ----- Reading ---------------------------------------------------------------
+
+class _Buffer:
+    """A sliding window over a text file, refilled on demand."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, at_least=0):
+        """Read more text; drops what has already been consumed."""
+        if self.eof:
+            return False
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        data = self.f.read(max(self.chunk_size, at_least))
+        if not data:
+            self.eof = True
+            return False
+        self.text += data
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ('' at end of file)."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if char == "" or char not in chars:
+            found = repr(char) if char else "end of file"
+            raise ValueError(f"Expected one of {chars!r} but found {found}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value: read more (growing with the value so
+                # large elements are not re-parsed once per chunk)
+                if not self.fill(len(self.text) - self.pos):
+                    raise
+                continue
+            # A number cut off by the end of the buffer may continue in the next chunk
+            if (not self.eof and isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and (end == len(self.text) or self.text[end] in _NUMBER_CHARS)):
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_elements(buf):
+    """Elements of the array whose '[' has just been consumed."""
+    if buf.peek() == "]":
+        buf.pos += 1
+        return
+    while True:
+        yield buf.value()
+        if buf.expect(",]") == "]":
+            return
+
+
+def iter_array(f, chunk_size=CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array from a text file object."""
+    buf = _Buffer(f, chunk_size)
+    buf.expect("[")
+    yield from _iter_elements(buf)
+
+
+def iter_object_array(f, key, chunk_size=CHUNK_SIZE):
+    """
+    Yield the elements of the array stored under ``key`` in a top-level JSON
+    object.  Other members are decoded one at a time and discarded.
+    """
+    buf = _Buffer(f, chunk_size)
+    buf.expect("{")
+    if buf.peek() == "}":
+        return
+    while True:
+        name = buf.value()
+        buf.expect(":")
+        if name == key and buf.peek() == "[":
+            buf.pos += 1
+            yield from _iter_elements(buf)
+        else:
+            buf.value()
+        if buf.expect(",}") == "}":
+            return
+
+
+def iter_json_lines(f):
+    """Yield one JSON value per non-empty line."""
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Line {number}: {exc}") from exc
+
+
+def _is_json_lines(first_line):
+    """True if a line starting with '{' is a whole scenario rather than the start of an object."""
+    try:
+        value, end = _decoder.raw_decode(first_line)
+    except json.JSONDecodeError:
+        return False
+    return first_line[end:].strip() == "" and not isinstance(value.get("scenarios"), list)
+
+
+def iter_scenarios(path, chunk_size=CHUNK_SIZE):
+    """
+    Yield scenarios from a JSON array, a JSON Lines file, or a scenarios.json
+    style object with a "scenarios" array.
+
+    The format is taken from the content, not the suffix: a file whose first
+    non-blank line is a complete object (other than a {"scenarios": [...]}
+    wrapper) is JSON Lines.
+    """
+    with open(path, encoding="utf-8-sig") as f:
+        first_line = ""
+        while not first_line:
+            line = f.readline(PROBE_SIZE)
+            if not line:
+                break
+            first_line = line.strip()
+        f.seek(0)
+        first = first_line[:1]
+        if first == "[":
+            yield from iter_array(f, chunk_size)
+        elif first == "{" and Path(path).suffix.lower() in (".jsonl", ".ndjson"):
+            yield from iter_json_lines(f)
+        elif first == "{" and _is_json_lines(first_line):
+            yield from iter_json_lines(f)
+        elif first == "{":
+            yield from iter_object_array(f, "scenarios", chunk_size)
+        elif first:
+            raise ValueError(f"{path}: expected a JSON array, JSON Lines or a scenarios object, "
+                             f"found {first!r}")
+
+
+# ----- Writing ---------------------------------------------------------------
+
+class ArrayWriter:
+    """
+    Write a JSON array element by element.
+
+    The output is identical to ``json.dumps(items, indent=2)``: "[]" when no
+    element was written, otherwise one indented element per block.
+    """
+
+    def __init__(self, f, indent=2):
+        self.f = f
+        self.indent = indent
+        self.count = 0
+
+    def write(self, item):
+        text = json.dumps(item, indent=self.indent)
+        pad = " " * self.indent
+        self.f.write(("[\n" if self.count == 0 else ",\n") + pad + text.replace("\n", "\n" + pad))
+        self.count += 1
+
+    def close(self):
+        self.f.write("[]" if self.count == 0 else "\n]")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        return False
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Stream the scenarios in a JSON / JSON Lines file.")
+    ap.add_argument("path", help="JSON array, JSON Lines or scenarios.json file")
+    ap.add_argument("--count", action="store_true", help="Only print the number of scenarios")
+    args = ap.parse_args()
+
+    count = 0
+    for scenario in iter_scenarios(args.path):
+        count += 1
+        if not args.count:
+            print(f"{scenario.get('id')}: {scenario.get('name', '')}")
+    print(f"{count} scenarios")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+leave_variables.py
+------------------
+Derived-variable stage of the Python pipeline: the column-wise counterpart of
+Services/VariableCalculator.CalculateVariables.
+
+The whole input table is cleaned once, every date column is parsed once into
+datetime64 and every numeric column once into float64 (each distinct string
+only once), and WeeklyWage, CtplCalc, CtplPayment, StdOrNot, PtoUsable, ...
+are computed as NumPy expressions over whole columns.  The resulting
+variable table is what condition and field evaluation read
+(evaluate_scenarios.ColumnTable.variables); this script can also write it
+out for inspection or for downstream tools.
+
+Several input files (e.g. a year of weekly exports) are processed as one
+table.
+
+Usage
+-----
+$ python leave_variables.py -i ../ESL_Test_Hao_2025-04-25_Input.csv -o variables.csv
+$ python leave_variables.py -i "history/*_Input.csv" -o variables.parquet --timing
+$ python leave_variables.py -i "history/*_Input.csv" --row-cache --timing
+"""
+
+import argparse
+import glob
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from evaluate_scenarios import ColumnTable, calculate_variables, clean_frame, load_input
+
+
+# ----- Configuration ---------------------------------------------------------
+
+# LeaveVariables properties, in the order VariableCalculator assigns them
+VARIABLE_NAMES = [
+    "ScheduledHours", "PayRate", "WeekOfPP", "PtoHrsLast1Week", "PtoHrsLast2Week", "PtoAvail",
+    "BasicSickLast1Week", "BasicSickLast2Week", "BasicSickAvail", "EmployeeStatusCode",
+    "WeeklyWage", "MinWage40", "NinetyFiveCTMin40", "CtplCalcStar", "CtplCalc", "CtplPayment",
+    "StdOrNot", "PtoSuppDollars", "PtoSuppHrs", "BasicSickAvailCalc", "BasicSickStd",
+    "BasicSickStdCtpl", "PtoReserve", "PtoAvailCalc", "PtoUsable", "PtoUseHrs",
+    "PtoBasicSickStd", "PtoBasicSickStdCtpl",
+]
+
+# Input columns copied into the variable table to identify each row
+KEY_COLUMNS = ["CLAIM_ID", "EMPLOYEE", "PAY_START_DATE", "PAY_END_DATE"]
+
+FAILED_COLUMN = "CALC_FAILED"
+
+
+# ----- Stage -----------------------------------------------------------------
+
+def derive_variables(frame):
+    """
+    Clean a raw input frame and compute its derived variables.
+
+    Returns (table, failed): the ColumnTable with ``table.variables`` filled
+    in, and a mask of rows where VariableCalculator would throw.
+    """
+    table = ColumnTable(clean_frame(frame))
+    failed = calculate_variables(table)
+    return table, failed
+
+
+def variable_frame(table, failed, keys=KEY_COLUMNS):
+    """The variable table as a DataFrame: key columns, one float64 column per variable, CALC_FAILED."""
+    columns = {key: table.text(key) for key in keys if key in table}
+    columns.update({name: table.var(name) for name in VARIABLE_NAMES if name in table.variables})
+    columns[FAILED_COLUMN] = np.asarray(failed, dtype=bool)
+    return pd.DataFrame(columns)
+
+
+def resolve_paths(patterns):
+    """Files named by paths or glob patterns, in a stable order."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if any(c in pattern for c in "*?[") else [pattern]
+        paths.extend(Path(p) for p in matches)
+    return paths
+
+
+def load_inputs(paths):
+    """Read and concatenate input files; returns (frame, source file per row)."""
+    frames = [load_input(path) for path in paths]
+    sources = np.repeat(np.array([str(p) for p in paths], dtype=object), [len(f) for f in frames])
+    frame = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return frame, sources
+
+
+def write_table(frame, path):
+    path = Path(path)
+    if path.suffix.lower() in (".parquet", ".pq"):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Compute the derived leave variables for input CSVs.")
+    ap.add_argument("-i", "--input", action="append", required=True,
+                    help="Input CSV or glob pattern (repeatable)")
+    ap.add_argument("-o", "--output", help="Write the variable table (.csv or .parquet)")
+    ap.add_argument("--row-cache", action="store_true",
+                    help="Read inputs through the typed row store cached in .esl_cache/ (built on first use)")
+    ap.add_argument("--timing", action="store_true", help="Print the time spent in each step")
+    args = ap.parse_args()
+
+    paths = resolve_paths(args.input)
+    missing = [str(p) for p in paths if not p.is_file()]
+    if not paths or missing:
+        print(f"Error: input not found: {', '.join(missing) or ', '.join(args.input)}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    if args.row_cache:
+        from row_store import concat_stores, load_rows
+        stores = [load_rows(path) for path in paths]
+        sources = np.repeat(np.array([str(p) for p in paths], dtype=object), [len(s) for s in stores])
+        store = stores[0] if len(stores) == 1 else concat_stores(stores)
+        read_done = time.perf_counter()
+        table = store.table()
+        failed = calculate_variables(table)
+    else:
+        frame, sources = load_inputs(paths)
+        read_done = time.perf_counter()
+        table, failed = derive_variables(frame)
+    derive_done = time.perf_counter()
+
+    result = variable_frame(table, failed)
+    if len(paths) > 1:
+        result.insert(0, "SOURCE_FILE", sources)
+    if args.output:
+        write_table(result, args.output)
+    end = time.perf_counter()
+
+    rows = len(result)
+    print(f"{rows} rows from {len(paths)} file(s); {int(failed.sum())} rows fail the variable calculation")
+    if args.timing:
+        derive_time = derive_done - read_done
+        print(f"  read      {read_done - start:8.3f} s")
+        print(f"  derive    {derive_time:8.3f} s  ({rows / derive_time if derive_time else 0:,.0f} rows/s)")
+        print(f"  write     {end - derive_done:8.3f} s")
+    if args.output:
+        print(f"Variable table → {Path(args.output).resolve()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+output_cache.py
+---------------
+Score an input file, reusing the results of rows already scored in earlier
+runs.
+
+Most claims come back week after week with the same values in every column
+the pipeline looks at.  Each row is keyed by a 128-bit hash of exactly those
+columns (the ones validation, the variable calculation, the conditions and
+the update fields read, recorded by running the pipeline on one row) and
+looked up in a SQLite cache under .esl_cache/ next to the input.  A hit gives
+the row's scenario id and name and the computed update fields directly;
+ENTRY_DATE-style "now" fields are filled with this run's timestamp and
+skipped fields keep the input value, so only rows that really changed are
+scored.  The output is identical to an uncached evaluate_scenarios.py run.
+
+The cache records a hash of scenarios.json (and of the --conditions-csv file)
+and is emptied when it changes.  Entries are evicted least recently used
+first once the cache grows past --max-mb.
+
+Usage
+-----
+$ python output_cache.py -i ../ESL_Test_Hao_2025-04-25_Input.csv
+$ python output_cache.py -i weekly_input.csv -o weekly_processed.csv --max-mb 500
+$ python output_cache.py -i weekly_input.csv --stats
+$ python output_cache.py -i weekly_input.csv --clear
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from itertools import compress
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from evaluate_scenarios import (CONDITIONS, DEFAULT_CONFIG, OUTPUT_COLUMNS, ColumnTable, clean_frame,
+                                default_output_path, format_datetime, load_config, load_input,
+                                normalize_scenarios, score_table, subset, write_output)
+
+
+# ----- Configuration ---------------------------------------------------------
+
+CACHE_DIR_NAME = ".esl_cache"
+CACHE_NAME = "output_cache.sqlite"
+
+# Bumped when the cached entry layout or the scoring it stands for changes
+CACHE_VERSION = "1"
+
+DEFAULT_MAX_MB = 256
+
+# Bytes counted against --max-mb per cached row (key, result id, counter, page overhead)
+ENTRY_BYTES = 48
+
+KEY_BYTES = 16
+
+# Values bound per SQL statement (SQLite's default limit is 999)
+SQL_BATCH = 900
+
+_MIX = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+
+
+# ----- Row keys --------------------------------------------------------------
+
+class RecordingTable(ColumnTable):
+    """
+    ColumnTable that records the input columns the pipeline reads, and
+    separately those it only tests for emptiness.
+    """
+
+    def __init__(self, frame):
+        super().__init__(frame)
+        self.read = set()
+        self.tested = set()
+
+    def text(self, column):
+        self.read.add(column)
+        return super().text(column)
+
+    def is_empty(self, column):
+        self.tested.add(column)
+        return ColumnTable.text(self, column) == ""
+
+    def dates(self, column):
+        self.read.add(column)
+        return super().dates(column)
+
+    def numbers(self, column):
+        self.read.add(column)
+        return super().numbers(column)
+
+
+def dependency_columns(cleaned, config, conditions=None):
+    """
+    Cleaned columns that can change a row's result, as (columns whose values
+    matter, columns where only being empty matters): those read by
+    validation, the variable calculation, any scenario's conditions or any
+    number field.  Every step reads whole columns regardless of the values,
+    so one row shows them all.
+    """
+    from field_expressions import compile_scenario
+
+    probe = RecordingTable(cleaned.iloc[:1])
+    score_table(probe, config, conditions=conditions)
+    for scenario in normalize_scenarios(config):
+        for field in compile_scenario(scenario):
+            if field.kind == "number":
+                field.evaluate(probe)
+    present = set(cleaned.columns)
+    return sorted(probe.read & present), sorted((probe.tested - probe.read) & present)
+
+
+def row_keys(cleaned, columns, tested=()):
+    """
+    16-byte key per row: two 64-bit hashes of the ``columns`` values and of
+    whether each ``tested`` column is empty, each distinct value of a column
+    hashed once.  Both are seeded with the column layout, so a file without a
+    column the pipeline checks for never shares keys with one that has it.
+    """
+    layout = json.dumps([sorted(cleaned.columns), list(columns), list(tested)]).encode("utf-8")
+    seed = hashlib.sha256(layout).hexdigest()
+    first = np.zeros(len(cleaned), dtype=np.uint64)
+    second = np.zeros(len(cleaned), dtype=np.uint64)
+    parts = [cleaned[column] for column in columns] + [cleaned[column] == "" for column in tested]
+    for values in parts:
+        codes, uniques = pd.factorize(values)
+        uniques = np.asarray(uniques, dtype=object)
+        first = first * _MIX[0] + pd.util.hash_array(uniques, hash_key=seed[:16], categorize=False)[codes]
+        second = second * _MIX[1] + pd.util.hash_array(uniques, hash_key=seed[16:32], categorize=False)[codes]
+    buffer = np.column_stack([first, second]).astype("<u8").tobytes()
+    return [buffer[i:i + KEY_BYTES] for i in range(0, len(buffer), KEY_BYTES)]
+
+
+def config_digest(config_path, conditions_csv=None):
+    digest = hashlib.sha256(CACHE_VERSION.encode("utf-8"))
+    digest.update(Path(config_path).read_bytes())
+    if conditions_csv:
+        digest.update(Path(conditions_csv).read_bytes())
+    return digest.hexdigest()
+
+
+# ----- Cache -----------------------------------------------------------------
+
+class OutputCache:
+    """
+    SQLite cache of scoring results.
+
+    ``entries`` maps each row key to a result; ``results`` holds each distinct
+    (scenario id, scenario name, update fields) once, since many rows share
+    them.  ``last_used`` is a run counter, so eviction order does not depend
+    on the clock.  A lookup records the keys it hit as one blob in
+    ``touched`` instead of updating every entry; the batches are folded into
+    ``last_used`` when the cache has to evict.
+    """
+
+    def __init__(self, path, digest, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY, digest BLOB UNIQUE, scenario_id INTEGER,
+                scenario_name TEXT, fields TEXT, size INTEGER);
+            CREATE TABLE IF NOT EXISTS entries (
+                key BLOB PRIMARY KEY, result INTEGER, last_used INTEGER) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS touched (clock INTEGER PRIMARY KEY, keys BLOB);
+        """)
+        self.invalidated = self._meta("config") not in (None, digest)
+        if self.invalidated:
+            self._empty()
+        self._set_meta("config", digest)
+        self.clock = int(self._meta("clock") or 0) + 1
+        self._set_meta("clock", str(self.clock))
+        self.db.commit()
+
+    def _meta(self, name):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def _empty(self):
+        self.db.execute("DELETE FROM entries")
+        self.db.execute("DELETE FROM results")
+        self.db.execute("DELETE FROM touched")
+
+    def lookup(self, keys):
+        """
+        Returns (result id per key, -1 when not cached; {result id:
+        (scenario_id, scenario_name, fields)}) for ``keys`` and marks the hits used.
+
+        The entries are read in one query and matched in memory.
+        """
+        entries = dict(self.db.execute("SELECT key, result FROM entries").fetchall())
+        found = np.array([entries.get(key, -1) for key in keys], dtype=np.int64)
+        del entries
+        hit = found >= 0
+
+        used = np.unique(found[hit])
+        results = {}
+        for start in range(0, len(used), SQL_BATCH):
+            batch = used[start:start + SQL_BATCH].tolist()
+            query = ("SELECT id, scenario_id, scenario_name, fields FROM results WHERE id IN "
+                     f"({','.join('?' * len(batch))})")
+            rows = self.db.execute(query, batch).fetchall()
+            # one json.loads for the whole batch instead of one per result
+            fields = json.loads("[" + ",".join(row[3] for row in rows) + "]")
+            results.update((rid, (scenario_id, name, values))
+                           for (rid, scenario_id, name, _), values in zip(rows, fields))
+        if hit.any():
+            self.db.execute("INSERT OR REPLACE INTO touched (clock, keys) VALUES (?, ?)",
+                            (self.clock, b"".join(dict.fromkeys(compress(keys, hit)))))
+        self.db.commit()
+        return found, results
+
+    def _fold_touched(self):
+        """Apply the recorded hit batches to ``last_used`` (oldest first) and drop them."""
+        for clock, blob in self.db.execute("SELECT clock, keys FROM touched ORDER BY clock").fetchall():
+            keys = (blob[i:i + KEY_BYTES] for i in range(0, len(blob), KEY_BYTES))
+            self.db.executemany("UPDATE entries SET last_used = ? WHERE key = ? AND last_used < ?",
+                                ((clock, key, clock) for key in keys))
+        self.db.execute("DELETE FROM touched")
+
+    def store(self, groups):
+        """
+        Add ``groups`` of ((scenario_id, scenario_name, fields), keys), then
+        evict down to the size bound.  Returns the number of entries evicted.
+        """
+        results, keys = [], []
+        for (scenario_id, name, fields), group_keys in groups:
+            fields = json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+            digest = hashlib.sha256(json.dumps([scenario_id, name, fields]).encode("utf-8")).digest()[:16]
+            size = len(name.encode("utf-8")) + len(fields.encode("utf-8"))
+            results.append((digest, scenario_id, name, fields, size))
+            keys.append(group_keys)
+        self.db.executemany("INSERT OR IGNORE INTO results (digest, scenario_id, scenario_name, fields, size) "
+                            "VALUES (?, ?, ?, ?, ?)", results)
+        ids = dict(self.db.execute("SELECT digest, id FROM results"))
+        # Inserting in key order keeps the B-tree writes sequential
+        self.db.executemany("INSERT OR REPLACE INTO entries (key, result, last_used) VALUES (?, ?, ?)",
+                            sorted((key, ids[result[0]], self.clock)
+                                   for result, group_keys in zip(results, keys) for key in group_keys))
+        evicted = self.evict()
+        self.db.commit()
+        return evicted
+
+    def size(self):
+        entries = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        result_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        touched_bytes = self.db.execute("SELECT COALESCE(SUM(LENGTH(keys)), 0) FROM touched").fetchone()[0]
+        return entries * ENTRY_BYTES + result_bytes + touched_bytes
+
+    def evict(self):
+        """
+        Drop the least recently used entries, and the results no entry uses
+        any more, until the cache fits in ``max_bytes``.
+        """
+        if self.size() <= self.max_bytes:
+            return 0
+        self._fold_touched()
+        if self.size() <= self.max_bytes:
+            return 0
+        sizes = dict(self.db.execute("SELECT id, size FROM results"))
+        kept, total, doomed = set(), 0, []
+        for key, rid in self.db.execute("SELECT key, result FROM entries ORDER BY last_used DESC, key"):
+            cost = ENTRY_BYTES + (0 if rid in kept else sizes[rid])
+            if doomed or total + cost > self.max_bytes:
+                doomed.append((key,))
+                continue
+            kept.add(rid)
+            total += cost
+        self.db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        self.db.execute("DELETE FROM results WHERE id NOT IN (SELECT result FROM entries)")
+        return len(doomed)
+
+    def stats(self):
+        entries = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        results = self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {"entries": entries, "results": results, "bytes": self.size(), "max_bytes": self.max_bytes}
+
+    def clear(self):
+        self._empty()
+        self.db.commit()
+        self.db.execute("VACUUM")
+
+    def close(self):
+        self.db.close()
+
+
+def default_cache_path(input_path):
+    return Path(input_path).resolve().parent / CACHE_DIR_NAME / CACHE_NAME
+
+
+# ----- Scoring ---------------------------------------------------------------
+
+def field_plan(scenario):
+    """
+    (cached columns, now columns) of a scenario: the output columns it writes,
+    by the kind of the last field writing each (as apply_updates applies them).
+    """
+    from field_expressions import compile_scenario
+
+    last = {}
+    for field in compile_scenario(scenario):
+        if field.column in OUTPUT_COLUMNS and field.kind != "skip":
+            last[field.column] = field.kind
+    return ([column for column, kind in last.items() if kind != "now"],
+            [column for column, kind in last.items() if kind == "now"])
+
+
+def result_groups(scored, keys, plans):
+    """The distinct results of a scored frame, each with the keys of its rows."""
+    ids = scored["SCENARIO_ID"].to_numpy().astype(np.int64)
+    names = scored["SCENARIO_NAME"].to_numpy(dtype=object)
+    columns = {column: scored[column].to_numpy(dtype=object) for column in OUTPUT_COLUMNS}
+    groups = {}
+    for scenario_id in np.unique(ids):
+        rows = np.flatnonzero(ids == scenario_id)
+        cached = plans[int(scenario_id)][0] if scenario_id >= 0 else []
+        results = zip(names[rows], *(columns[column][rows] for column in cached))
+        for row, result in zip(rows, results):
+            groups.setdefault((int(scenario_id),) + result, []).append(keys[row])
+    for result, group_keys in groups.items():
+        yield (result[0], result[1], list(result[2:])), group_keys
+
+
+def replay(table, rows, result_ids, results, plans, now_text):
+    """
+    build_output for ``rows`` from their cached results.  Every row with the
+    same result gets the same values, so each column is built once per
+    distinct result and spread to the rows with one take.
+    """
+    out = table.frame.iloc[rows].copy()
+    distinct, inverse = np.unique(np.asarray(result_ids, dtype=np.int64), return_inverse=True)
+    values = {column: [None] * len(distinct) for column in OUTPUT_COLUMNS}
+    for position, rid in enumerate(distinct.tolist()):
+        scenario_id, _, fields = results[rid]
+        if scenario_id < 0:
+            continue
+        cached, now = plans[scenario_id]
+        for column, value in zip(cached, fields):
+            values[column][position] = value
+        for column in now:
+            values[column][position] = now_text
+
+    for column in OUTPUT_COLUMNS:
+        # None: the row keeps its input value ("" when the column is new)
+        keep = np.array([value is None for value in values[column]])
+        column_values = np.array(["" if value is None else value for value in values[column]], dtype=object)
+        if column in out.columns and keep.any():
+            column_values = column_values[inverse]
+            kept = keep[inverse]
+            column_values[kept] = out[column].to_numpy(dtype=object)[kept]
+            out[column] = column_values
+        else:
+            out[column] = pd.array(column_values, dtype="str").take(inverse)
+
+    labels = [results[rid] for rid in distinct.tolist()]
+    out["SCENARIO_ID"] = pd.array([str(label[0]) for label in labels], dtype="str").take(inverse)
+    out["SCENARIO_NAME"] = pd.array([label[1] for label in labels], dtype="str").take(inverse)
+    return out
+
+
+def score_cached(frame, config, cache, conditions=None, now=None, index=None):
+    """
+    score_frame through ``cache``: rows whose key is cached are filled from
+    it, the others are scored and added.  Returns (processed, counts).
+    """
+    now = now or datetime.now()
+    table = ColumnTable(clean_frame(frame))
+    counts = {"rows": len(table), "hits": 0, "scored": 0, "evicted": 0}
+    if len(table) == 0:
+        return score_table(table, config, conditions, now, index), counts
+
+    keys = row_keys(table.frame, *dependency_columns(table.frame, config, conditions))
+    found, results = cache.lookup(keys)
+    hit = found >= 0
+    plans = {s["id"]: field_plan(s) for s in normalize_scenarios(config)}
+
+    parts = []
+    misses = np.flatnonzero(~hit)
+    if len(misses):
+        scored = score_table(subset(table, misses), config, conditions, now, index)
+        counts["evicted"] = cache.store(result_groups(scored, [keys[i] for i in misses], plans))
+        parts.append(scored)
+    hits = np.flatnonzero(hit)
+    if len(hits):
+        parts.append(replay(table, hits, found[hits], results, plans, format_datetime(now)))
+
+    counts["hits"], counts["scored"] = len(hits), len(misses)
+    processed = parts[0] if len(parts) == 1 else pd.concat(parts).sort_index()
+    return processed, counts
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Score an ESL input CSV, reusing cached results of unchanged rows.")
+    ap.add_argument("-i", "--input", required=True, help="Path to the input CSV (or .parquet / .arrow)")
+    ap.add_argument("-c", "--config", default=str(DEFAULT_CONFIG), help="Path to scenarios.json")
+    ap.add_argument("-o", "--output", help="Output path (default: <input>_processed_<timestamp>.csv)")
+    ap.add_argument("--cache", help=f"Cache file (default: {CACHE_DIR_NAME}/{CACHE_NAME} next to the input)")
+    ap.add_argument("--max-mb", type=float, default=DEFAULT_MAX_MB,
+                    help=f"Cache size bound in MB (default: {DEFAULT_MAX_MB})")
+    ap.add_argument("--conditions-csv", help="Use the formulas in ConditionsCsv.csv instead of the built-in ports")
+    ap.add_argument("--index", action="store_true", help="Match through the precomputed scenario index")
+    ap.add_argument("--stats", action="store_true", help="Show the cache size and exit")
+    ap.add_argument("--clear", action="store_true", help="Empty the cache and exit")
+    args = ap.parse_args()
+
+    if args.max_mb <= 0:
+        ap.error("--max-mb must be positive")
+    if not Path(args.input).is_file():
+        print(f"Error: input not found: {args.input}")
+        sys.exit(1)
+
+    cache_path = Path(args.cache) if args.cache else default_cache_path(args.input)
+    cache = OutputCache(cache_path, config_digest(args.config, args.conditions_csv),
+                        max_bytes=int(args.max_mb * 1024 * 1024))
+    try:
+        if args.clear:
+            cache.clear()
+            print(f"Cleared {cache_path}")
+            return
+        if args.stats:
+            stats = cache.stats()
+            print(f"{cache_path}: {stats['entries']:,} rows, {stats['results']:,} distinct results, {stats['bytes'] / 1024 / 1024:.1f} MB "
+                  f"of {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+            return
+
+        conditions = None
+        if args.conditions_csv:
+            from compile_conditions import load_conditions
+            conditions = dict(CONDITIONS, **load_conditions(args.conditions_csv))
+        index = None
+        if args.index:
+            from scenario_index import load_index
+            index = load_index(args.config, known_conditions=conditions or CONDITIONS)
+
+        if cache.invalidated:
+            print("scenarios.json changed; cache emptied")
+        now = datetime.now()
+        start = time.perf_counter()
+        processed, counts = score_cached(load_input(args.input), load_config(args.config), cache,
+                                         conditions=conditions, now=now, index=index)
+        elapsed = time.perf_counter() - start
+    finally:
+        cache.close()
+
+    out_path = Path(args.output) if args.output else default_output_path(args.input, now)
+    write_output(processed, out_path)
+    print(f"Scored {counts['rows']} rows in {elapsed:.1f} s: {counts['hits']} from the cache, "
+          f"{counts['scored']} computed ({counts['evicted']} cache entries evicted) "
+          f"→ {out_path.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+partition_scoring.py
+--------------------
+Score an input file in parallel, one (REASON_CODE, PROCESS_LEVEL) partition
+at a time.
+
+Scenario selection starts from the row's reason code and process level
+(ScenarioConfiguration.GetScenariosForReasonCode), so rows of different
+partitions never compete for the same scenarios.  The rows are split by that
+key; each partition is sent to a worker process with a config holding only
+its candidate scenarios (the skip scenarios plus those for its reason code
+and level), so the worker evaluates only the conditions those scenarios use.
+Large partitions are split into row chunks so every worker has work.  The
+processed rows are put back in input order, and the result is identical to
+evaluate_scenarios.score_frame on the whole file.
+
+Usage
+-----
+$ python partition_scoring.py -i ../ESL_Test_Hao_2025-04-25_Input.csv --plan
+$ python partition_scoring.py -i big_input.csv -o big_processed.csv --workers 32
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from evaluate_scenarios import (CONDITIONS, DEFAULT_CONFIG, REASON_CODE_NORMALIZATION, candidate_scenarios,
+                                default_output_path, load_config, load_input, normalize_scenarios,
+                                parse_numbers, score_frame, write_output)
+
+
+# ----- Configuration ---------------------------------------------------------
+
+# Chunks per worker when splitting large partitions (keeps workers busy at the end)
+CHUNKS_PER_WORKER = 4
+
+# Partitions smaller than this are never split
+MIN_CHUNK_ROWS = 5_000
+
+# Tasks sliced and queued ahead of the results being collected, per worker
+TASKS_IN_FLIGHT = 2
+
+
+# ----- Partitioning ----------------------------------------------------------
+
+def partition_keys(frame):
+    """
+    (reason code, process level) per row, computed like match_scenarios does
+    after cleaning; level is NaN when it is not a whole number.
+    """
+    columns = {c.strip(): c for c in frame.columns}
+    if "REASON_CODE" not in columns or "PROCESS_LEVEL" not in columns:
+        return None
+    reasons = (frame[columns["REASON_CODE"]].fillna("").str.strip()
+               .replace(REASON_CODE_NORMALIZATION).str.upper().to_numpy(dtype=object))
+    levels = parse_numbers(frame[columns["PROCESS_LEVEL"]].fillna("").str.strip())
+    whole = ~np.isnan(levels) & (levels == np.floor(levels))
+    return reasons, np.where(whole, levels, np.nan)
+
+
+def partition_config(config, scenarios, reason, level):
+    """The config with only the scenarios a (reason, level) partition can match."""
+    ids = set()
+    if reason and level is not None:
+        ids = {s["id"] for s in candidate_scenarios(scenarios, reason, level)}
+    return dict(config, scenarios=[raw for raw in config.get("scenarios", []) if int(raw.get("id", -1)) in ids])
+
+
+def plan_partitions(frame, config, workers, chunk_rows=None):
+    """
+    Tasks as (label, row positions, partition config), largest first.
+    ``chunk_rows`` (default: rows / (workers * CHUNKS_PER_WORKER)) caps the
+    rows of a task.
+    """
+    keys = partition_keys(frame)
+    if keys is None:
+        return [("all rows", np.arange(len(frame)), config)]
+    if chunk_rows is None:
+        chunk_rows = max(MIN_CHUNK_ROWS, math.ceil(len(frame) / (max(1, workers) * CHUNKS_PER_WORKER)))
+
+    scenarios = normalize_scenarios(config)
+    groups = pd.DataFrame({"reason": keys[0], "level": keys[1]}).groupby(
+        ["reason", "level"], dropna=False, sort=True).indices
+    tasks = []
+    for (reason, level), positions in groups.items():
+        level = None if pd.isna(level) else int(level)
+        sub_config = partition_config(config, scenarios, reason, level)
+        label = f"{reason or '(no reason)'} / {level if level is not None else '(invalid level)'}"
+        pieces = max(1, math.ceil(len(positions) / chunk_rows))
+        for piece in np.array_split(positions, pieces):
+            tasks.append((label, piece, sub_config))
+    tasks.sort(key=lambda task: -len(task[1]))
+    return tasks
+
+
+# ----- Scoring ---------------------------------------------------------------
+
+_worker_conditions = {}
+
+
+def _conditions(conditions_csv):
+    if not conditions_csv:
+        return None
+    if conditions_csv not in _worker_conditions:
+        from compile_conditions import load_conditions
+        _worker_conditions[conditions_csv] = dict(CONDITIONS, **load_conditions(conditions_csv))
+    return _worker_conditions[conditions_csv]
+
+
+def score_part(rows, config, now, conditions_csv=None):
+    """Worker: score one partition chunk (the rows themselves, so each task carries only its own data)."""
+    return score_frame(rows, config, conditions=_conditions(conditions_csv), now=now)
+
+
+def score_partitioned(frame, config, now=None, workers=None, chunk_rows=None, conditions_csv=None,
+                      progress=None):
+    """
+    score_frame, run per partition chunk on ``workers`` processes (1 = in this
+    process) and merged back into input order.
+
+    Each task is sent only its own rows; at most ``workers * TASKS_IN_FLIGHT``
+    chunks are sliced and queued at a time.
+    """
+    now = now or datetime.now()
+    workers = workers or os.cpu_count() or 1
+    frame = frame.reset_index(drop=True)
+    tasks = plan_partitions(frame, config, workers, chunk_rows)
+
+    parts = []
+
+    def collect(label, positions, result):
+        parts.append(result)
+        if progress:
+            progress(f"{label:<40} {len(positions):>10,} rows")
+
+    if workers == 1:
+        for label, positions, sub_config in tasks:
+            collect(label, positions, score_part(frame.iloc[positions], sub_config, now, conditions_csv))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for label, positions, sub_config in tasks:
+                future = pool.submit(score_part, frame.iloc[positions], sub_config, now, conditions_csv)
+                pending.append((label, positions, future))
+                if len(pending) >= workers * TASKS_IN_FLIGHT:
+                    label, positions, future = pending.popleft()
+                    collect(label, positions, future.result())
+            while pending:
+                label, positions, future = pending.popleft()
+                collect(label, positions, future.result())
+
+    if not parts:
+        return score_frame(frame, config, conditions=_conditions(conditions_csv), now=now)
+    # Each processed chunk keeps the input's row labels, which are the row positions
+    return pd.concat(parts).sort_index()
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Score an ESL input file in parallel by (REASON_CODE, PROCESS_LEVEL).")
+    ap.add_argument("-i", "--input", required=True, help="Path to the input CSV (or .parquet / .arrow)")
+    ap.add_argument("-c", "--config", default=str(DEFAULT_CONFIG), help="Path to scenarios.json")
+    ap.add_argument("-o", "--output", help="Output path (default: <input>_processed_<timestamp>.csv)")
+    ap.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                    help="Worker processes (default: number of CPUs)")
+    ap.add_argument("--chunk-size", type=int, help="Maximum rows per task (default: rows / (workers x 4))")
+    ap.add_argument("--conditions-csv", help="Use the formulas in ConditionsCsv.csv instead of the built-in ports")
+    ap.add_argument("--plan", action="store_true", help="Show the partitions and their scenarios, then exit")
+    args = ap.parse_args()
+
+    if args.workers < 1:
+        ap.error("--workers must be at least 1")
+    if not Path(args.input).is_file():
+        print(f"Error: input not found: {args.input}")
+        sys.exit(1)
+
+    config = load_config(args.config)
+    frame = load_input(args.input)
+
+    if args.plan:
+        for label, positions, sub_config in plan_partitions(frame, config, args.workers, args.chunk_size):
+            print(f"{label:<40} {len(positions):>10,} rows  {len(sub_config['scenarios']):>4} scenarios")
+        return
+
+    now = datetime.now()
+    start = time.perf_counter()
+    processed = score_partitioned(frame, config, now=now, workers=args.workers, chunk_rows=args.chunk_size,
+                                  conditions_csv=args.conditions_csv, progress=print)
+    elapsed = time.perf_counter() - start
+
+    out_path = Path(args.output) if args.output else default_output_path(args.input, now)
+    write_output(processed, out_path)
+    matched = (processed["SCENARIO_ID"] != "-1").sum()
+    print(f"Scored {len(processed)} rows ({matched} matched) in {elapsed:.1f} s "
+          f"with {args.workers} worker(s) → {out_path.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
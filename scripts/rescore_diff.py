@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+rescore_diff.py
+---------------
+Re-score historical input files under an old and a new scenarios.json and
+report the rows whose output would change.
+
+Both configs are scored in one pass over the same parsed input.  Files with
+the same columns are concatenated and cleaned once; the derived variables
+are calculated once, and the union of the conditions the two configs use is
+evaluated once (a condition both versions use is never evaluated twice).
+Only the first-match search runs per config.  Update fields are then
+calculated only for the rows that can differ: rows matched to a different
+scenario, rows with a different error, and rows of a scenario whose name or
+updates changed.  Rows matched to the same, unchanged scenario produce the
+same output under both configs and are not recalculated.
+
+The report groups the changed rows by (old scenario -> new scenario) and
+counts the fields that changed; ``-o`` writes one line per changed row.
+
+Usage
+-----
+$ python rescore_diff.py old_scenarios.json ../ESLFeeder/Config/scenarios.json ../history
+$ python rescore_diff.py old.json new.json ../history -o changes.csv --pattern "*_Input.csv"
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from evaluate_scenarios import (CONDITIONS, NO_SCENARIO_MESSAGE, OUTPUT_COLUMNS, ColumnTable, apply_updates,
+                                calculate_variables, clean_frame, evaluate_conditions, format_datetime,
+                                load_config, load_input, match_scenarios, normalize_scenarios, scenario_labels,
+                                subset, unmatchable_rows, validate)
+
+
+# ----- Configuration ---------------------------------------------------------
+
+DEFAULT_PATTERN = "*.csv"
+
+# Output columns compared between the two configs
+COMPARED_COLUMNS = ["SCENARIO_ID", "SCENARIO_NAME"] + OUTPUT_COLUMNS
+
+# Changed fields listed per (old -> new) group in the report
+REPORT_FIELDS = 6
+
+
+# ----- Loading ---------------------------------------------------------------
+
+def load_batches(paths, progress=None):
+    """
+    The input files grouped by column layout, as (files, frame): ``files`` is
+    [(path, rows)] in the order their rows appear in ``frame``.  Files with
+    the same columns are cleaned and scored as one table.
+    """
+    layouts = {}
+    for path in paths:
+        frame = load_input(path)
+        layouts.setdefault(tuple(frame.columns), []).append((path, frame))
+        if progress:
+            progress(f"{Path(path).name:<50} {len(frame):>10,} rows")
+    for files in layouts.values():
+        yield [(path, len(frame)) for path, frame in files], pd.concat([f for _, f in files], ignore_index=True)
+
+
+# ----- Scoring ---------------------------------------------------------------
+
+def _output_definition(scenario):
+    # What a scenario writes into a row it matches
+    return scenario["name"], scenario["order"], scenario["fields"]
+
+
+def _side_outputs(table, rows, scenarios_by_id, matched, errors, now_text):
+    """The compared output columns of ``rows`` under one config."""
+    sub = subset(table, rows)
+    outputs = {column: (sub.text(column).copy() if column in sub else np.full(len(rows), "", dtype=object))
+               for column in OUTPUT_COLUMNS}
+    apply_updates(sub, scenarios_by_id, matched[rows], outputs, now_text)
+    outputs["SCENARIO_ID"], outputs["SCENARIO_NAME"] = scenario_labels(scenarios_by_id, matched[rows], errors[rows])
+    return outputs
+
+
+def rescore_pair(table, old_config, new_config, conditions=None, now=None):
+    """
+    Score a cleaned ColumnTable under both configs, sharing variables,
+    validation and conditions.  Returns the changed rows as a frame: ROW
+    (position in ``table``), OLD_SCENARIO_ID, NEW_SCENARIO_ID and CHANGES
+    ({column: (old value, new value)} for every compared column that differs).
+    """
+    now_text = format_datetime(now or datetime.now())
+    configs = (old_config, new_config)
+    sides = [normalize_scenarios(config) for config in configs]
+
+    failed = calculate_variables(table)
+    names = sorted({c for scenarios in sides for s in scenarios for c in s["required"] + s["forbidden"]})
+    condition_results = evaluate_conditions(table, names, conditions)
+
+    validated = {}
+    matched, errors = [], []
+    for config, scenarios in zip(configs, sides):
+        codes = tuple((config.get("metadata") or {}).get("valid_reason_codes") or [])
+        if codes not in validated:
+            validated[codes] = unmatchable_rows(table, validate(table, list(codes)), failed)
+        side_errors = validated[codes].copy()
+        eligible = side_errors == None  # noqa: E711
+        side_matched = match_scenarios(table, scenarios, eligible, condition_results)
+        side_errors[eligible & (side_matched < 0)] = NO_SCENARIO_MESSAGE
+        matched.append(side_matched)
+        errors.append(side_errors)
+
+    old_by_id, new_by_id = ({s["id"]: s for s in scenarios} for scenarios in sides)
+    edited = [sid for sid in old_by_id
+              if sid in new_by_id and _output_definition(old_by_id[sid]) != _output_definition(new_by_id[sid])]
+    rows = np.flatnonzero((matched[0] != matched[1]) | (errors[0] != errors[1]) | np.isin(matched[0], edited))
+
+    old = _side_outputs(table, rows, old_by_id, matched[0], errors[0], now_text)
+    new = _side_outputs(table, rows, new_by_id, matched[1], errors[1], now_text)
+    differs = {column: old[column] != new[column] for column in COMPARED_COLUMNS}
+    changed = np.logical_or.reduce(list(differs.values())) if len(rows) else np.zeros(0, dtype=bool)
+
+    changes = [{} for _ in range(int(changed.sum()))]
+    for column in COMPARED_COLUMNS:
+        old_values, new_values = old[column][changed], new[column][changed]
+        for k in np.flatnonzero(differs[column][changed]):
+            changes[k][column] = (str(old_values[k]), str(new_values[k]))
+    return pd.DataFrame({
+        "ROW": rows[changed],
+        "OLD_SCENARIO_ID": matched[0][rows[changed]],
+        "NEW_SCENARIO_ID": matched[1][rows[changed]],
+        "CHANGES": changes,
+    })
+
+
+def rescore_files(paths, old_config, new_config, conditions=None, now=None, progress=None):
+    """
+    rescore_pair over input files; returns the changed rows with FILE, ROW
+    (1-based data row in that file) and CLAIM_ID, plus the rows scored.
+    """
+    now = now or datetime.now()
+    parts, total = [], 0
+    for files, frame in load_batches(paths, progress):
+        table = ColumnTable(clean_frame(frame))
+        diff = rescore_pair(table, old_config, new_config, conditions, now)
+        total += len(frame)
+
+        starts = np.cumsum([0] + [rows for _, rows in files])
+        which = np.searchsorted(starts, diff["ROW"].to_numpy(), side="right") - 1
+        claim = table.text("CLAIM_ID")[diff["ROW"].to_numpy()] if "CLAIM_ID" in table else ""
+        parts.append(diff.assign(
+            FILE=[str(files[i][0]) for i in which],
+            ROW=diff["ROW"].to_numpy() - starts[which] + 1,
+            CLAIM_ID=claim,
+        ))
+    columns = ["FILE", "ROW", "CLAIM_ID", "OLD_SCENARIO_ID", "NEW_SCENARIO_ID", "CHANGES"]
+    if not parts:
+        return pd.DataFrame(columns=columns), total
+    return pd.concat(parts, ignore_index=True)[columns], total
+
+
+# ----- Report ----------------------------------------------------------------
+
+def _scenario_label(sid, scenarios_by_id):
+    if sid < 0:
+        return "(no scenario)"
+    scenario = scenarios_by_id.get(int(sid))
+    return f"{sid} {scenario['name']}" if scenario else str(sid)
+
+
+def report(changes, old_config, new_config, total_rows):
+    """Text report of the changed rows, grouped by (old scenario -> new scenario)."""
+    old_by_id = {s["id"]: s for s in normalize_scenarios(old_config)}
+    new_by_id = {s["id"]: s for s in normalize_scenarios(new_config)}
+    lines = [f"{len(changes):,} of {total_rows:,} rows change"]
+    if changes.empty:
+        return "\n".join(lines)
+
+    groups = changes.groupby(["OLD_SCENARIO_ID", "NEW_SCENARIO_ID"], sort=False)["CHANGES"]
+    for (old_id, new_id), group in sorted(groups, key=lambda item: -len(item[1])):
+        old_label = _scenario_label(old_id, old_by_id)
+        title = old_label if old_id == new_id else f"{old_label} -> {_scenario_label(new_id, new_by_id)}"
+        lines += ["", f"{len(group):>10,}  {title}"]
+        # The title already names the scenarios; a rename shows as SCENARIO_NAME
+        hidden = {"SCENARIO_ID"} if old_id == new_id else {"SCENARIO_ID", "SCENARIO_NAME"}
+        counts = pd.Series([column for row in group for column in row if column not in hidden],
+                           dtype=object).value_counts()
+        for column, count in counts.head(REPORT_FIELDS).items():
+            examples = [row[column] for row in group if column in row]
+            old_value, new_value = examples[0]
+            lines.append(f"{count:>10,}    {column}: {old_value!r} -> {new_value!r}"
+                         + (" ..." if any(e != examples[0] for e in examples) else ""))
+    return "\n".join(lines)
+
+
+def write_changes(changes, path):
+    """One line per changed row; CHANGES as "COLUMN: old -> new; ..."."""
+    out = changes.copy()
+    out["CHANGES"] = ["; ".join(f"{column}: {old} -> {new}" for column, (old, new) in row.items())
+                      for row in changes["CHANGES"]]
+    out.to_csv(path, index=False, lineterminator="\n")
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Report the historical rows whose output a new scenarios.json changes.")
+    ap.add_argument("old_config", help="Current scenarios.json")
+    ap.add_argument("new_config", help="Proposed scenarios.json")
+    ap.add_argument("inputs", help="Directory of historical input files (or a single file)")
+    ap.add_argument("--pattern", default=DEFAULT_PATTERN,
+                    help=f"Input files in the directory, searched recursively (default: {DEFAULT_PATTERN})")
+    ap.add_argument("-o", "--output", help="Write one line per changed row to this CSV")
+    ap.add_argument("--conditions-csv", help="Use the formulas in ConditionsCsv.csv instead of the built-in ports")
+    args = ap.parse_args()
+
+    inputs = Path(args.inputs)
+    paths = sorted(inputs.rglob(args.pattern)) if inputs.is_dir() else [inputs]
+    paths = [path for path in paths if path.is_file()]
+    if not paths:
+        print(f"Error: no input files matching {args.pattern} in {args.inputs}")
+        sys.exit(1)
+    for path in (args.old_config, args.new_config):
+        if not Path(path).is_file():
+            print(f"Error: config not found: {path}")
+            sys.exit(1)
+
+    conditions = None
+    if args.conditions_csv:
+        from compile_conditions import load_conditions
+        conditions = dict(CONDITIONS, **load_conditions(args.conditions_csv))
+    old_config = load_config(args.old_config)
+    new_config = load_config(args.new_config)
+
+    start = time.perf_counter()
+    changes, total = rescore_files(paths, old_config, new_config, conditions, progress=print)
+    elapsed = time.perf_counter() - start
+
+    print()
+    print(report(changes, old_config, new_config, total))
+    print(f"\nRe-scored {len(paths)} file(s) under both configs in {elapsed:.1f} s")
+    if args.output:
+        write_changes(changes, args.output)
+        print(f"Changed rows → {Path(args.output).resolve()}")
+
+
+if __name__ == "__main__":
+    main()
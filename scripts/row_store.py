@@ -0,0 +1,547 @@
+#!/usr/bin/env python3
+"""
+row_store.py
+------------
+Memory-compact, typed storage for leave input files.
+
+load_input keeps every cell as a Python string, which costs 50-80 bytes per
+value.  A RowStore keeps each column of the input schema in a compact
+encoding instead:
+
+- dates (PAY_START_DATE, CTPL_END, RTW_FT, ...)   date32: int32 days since 1970
+- amounts and hours (PAY_RATE, PTO_AVAIL, ...)    fixed point: int8..int64 in
+                                                  units of the column's last decimal
+- ids and small ints (CLAIM_ID, WEEK_OF_PP, ...)  the same with scale 0 (int8..int64)
+- Y/N flags (CTPL_FORM, EE_PTO_SUPP, ...)         two bit-packed masks (set, yes)
+- everything else (REASON_CODE, EMP_STATUS, ...)  categorical: codes + distinct values
+
+Amounts are stored as fixed point rather than float32: the size is the same,
+but the values are exact, so variables computed from a store are identical
+to those computed from the CSV.  A column is only encoded when every value
+round-trips to the same text (e.g. every PAY_RATE has two decimals, every
+date is written M/D/YYYY); otherwise it falls back to categorical, so
+nothing is ever lost.
+
+Stores are saved as a directory of .npy files plus store.json and opened
+memory-mapped.  load_rows caches the store of a CSV under .esl_cache/ next
+to it, keyed by a hash of the file, so repeat runs skip CSV parsing, and
+RowStore.table() hands the pipeline a ColumnTable whose date and number
+views are already parsed.
+
+Usage
+-----
+$ python row_store.py -i ../ESL_Test_Hao_2025-04-25_Input.csv
+$ python row_store.py -i "history/*_Input.csv" --save history_store
+"""
+
+import argparse
+import hashlib
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from evaluate_scenarios import (COLUMN_MAPPINGS, REASON_CODE_NORMALIZATION, ColumnTable, _parse_dates,
+                                _parse_numbers, clean_frame, load_input)
+
+
+# ----- Configuration ---------------------------------------------------------
+
+# Bump when the on-disk layout changes so stale caches are rebuilt
+STORE_VERSION = "1"
+
+CACHE_DIR_NAME = ".esl_cache"
+MANIFEST_NAME = "store.json"
+
+# Declared encoding of each input column; unlisted columns are categorical
+SCHEMA = {
+    "PAY_START_DATE": "date",
+    "PAY_END_DATE": "date",
+    "WEEK_OF_PP": "number",
+    "PROCESS_LEVEL": "number",
+    "JOB_TITLE": "category",
+    "CLAIM_ID": "number",
+    "CHECK_SEQ": "number",
+    "EMPLOYEE": "number",
+    "SCHED_HRS": "number",
+    "PAY_RATE": "number",
+    "EMP_STATUS": "category",
+    "PTO_AVAIL": "number",
+    "BASIC_SICK_AVAIL": "number",
+    "DISABLE_DATE": "date",
+    "BEGIN_DATE": "date",
+    "STD_APPROVED_THROUGH": "date",
+    "PAYMENTS_THROUGH": "date",
+    "CTPL_FORM": "flag",
+    "CTPL_START": "date",
+    "CTPL_END": "date",
+    "CTPL_APPROVED_IND": "flag",
+    "CTPL_APPROVED_AMOUNT": "number",
+    "CTPL_DENIED_IND": "flag",
+    "EE_PTO_RTW": "flag",
+    "EE_PTO_SUPP": "flag",
+    "FMLA_APPR_DATE": "date",
+    "CHECK_KRONOS": "flag",
+    "REASON_CODE": "category",
+    "LTD_APPROVED": "flag",
+    "RTW_FT": "date",
+    "RTW_PT": "date",
+    "START_DATE": "date",
+    "END_DATE": "date",
+    "PTO_HRS_LAST1WEEK": "number",
+    "PTO_HRS_LAST2WEEK": "number",
+    "BASIC_SICK_HRS_LAST1WEEK": "number",
+    "BASIC_SICK_HRS_LAST2WEEK": "number",
+}
+
+# Text layouts a date column may use (the feeder's exports use the first two)
+DATE_FORMATS = {
+    "m/d/yyyy": lambda y, m, d: f"{m}/{d}/{y}",
+    "mm/dd/yyyy 00:00:00": lambda y, m, d: f"{m:02d}/{d:02d}/{y} 00:00:00",
+    "mm/dd/yyyy": lambda y, m, d: f"{m:02d}/{d:02d}/{y}",
+    "yyyy-mm-dd": lambda y, m, d: f"{y}-{m:02d}-{d:02d}",
+}
+
+FLAG_VALUES = {"", "Y", "N"}
+
+_INT_TYPES = (np.int8, np.int16, np.int32, np.int64)
+_MISSING_DAY = np.iinfo(np.int32).min
+
+
+class StoreError(ValueError):
+    """Raised when a store cannot be read or combined."""
+
+
+# ----- Encoding --------------------------------------------------------------
+
+def _int_type(low, high):
+    """Smallest signed type holding [low, high] with its minimum left free for 'empty'."""
+    for dtype in _INT_TYPES:
+        info = np.iinfo(dtype)
+        if low > info.min and high <= info.max:
+            return dtype
+    return None
+
+
+def _pack_ints(values, present):
+    """Row values (int64) as the smallest type; empty rows hold the type's minimum."""
+    shown = values[present]
+    dtype = _int_type(int(shown.min()), int(shown.max())) if shown.size else np.int8
+    if dtype is None:
+        return None
+    return np.where(present, values, np.iinfo(dtype).min).astype(dtype)
+
+
+def _code_type(count):
+    return next(dtype for dtype in _INT_TYPES if count <= np.iinfo(dtype).max)
+
+
+def format_fixed(value, scale):
+    """Text of a fixed-point integer: format_fixed(14189, 2) -> "141.89"."""
+    if scale == 0:
+        return str(value)
+    digits = str(abs(value)).rjust(scale + 1, "0")
+    return f"{'-' if value < 0 else ''}{digits[:-scale]}.{digits[-scale:]}"
+
+
+def format_days(days, layout):
+    """Texts of day numbers (days since 1970) in one of DATE_FORMATS."""
+    stamps = pd.DatetimeIndex(np.asarray(days, dtype=np.int64).astype("datetime64[D]"))
+    fmt = DATE_FORMATS[layout]
+    return [fmt(y, m, d) for y, m, d in zip(stamps.year, stamps.month, stamps.day)]
+
+
+class Column:
+    """
+    One encoded column: ``kind`` (date, number, flag, category), its arrays
+    and the parameters needed to turn them back into text.
+    """
+
+    def __init__(self, kind, arrays, params=None):
+        self.kind = kind
+        self.arrays = arrays
+        self.params = params or {}
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays.values())
+
+    def describe(self):
+        if self.kind == "number":
+            return f"number ({self.arrays['values'].dtype}, scale {self.params['scale']})"
+        if self.kind == "date":
+            return f"date32 ({self.params['layout']})"
+        if self.kind == "flag":
+            return "flag (2 bits)"
+        return f"category ({len(self.arrays['categories'])} values, {self.arrays['codes'].dtype})"
+
+    # -- typed views (what ColumnTable.dates / numbers would parse) --
+
+    def present(self, rows):
+        if self.kind == "flag":
+            return np.unpackbits(self.arrays["set"], count=rows).astype(bool)
+        if self.kind == "date":
+            return self.arrays["days"] != _MISSING_DAY
+        if self.kind == "number":
+            values = self.arrays["values"]
+            return values != np.iinfo(values.dtype).min
+        return self.arrays["categories"][self.arrays["codes"]] != ""
+
+    def dates(self):
+        days = np.asarray(self.arrays["days"]).astype("datetime64[D]").astype("datetime64[ns]")
+        days[np.asarray(self.arrays["days"]) == _MISSING_DAY] = np.datetime64("NaT")
+        return days
+
+    def numbers(self, rows):
+        values = np.asarray(self.arrays["values"])
+        result = values.astype(np.float64) / 10.0 ** self.params["scale"]
+        result[~self.present(rows)] = np.nan
+        return result
+
+    # -- text --
+
+    def distinct(self, rows):
+        """(code per row, object array of the distinct texts); text() is texts[codes]."""
+        if self.kind == "category":
+            return self.arrays["codes"], np.asarray(self.arrays["categories"], dtype=object)
+        if self.kind == "flag":
+            yes = np.unpackbits(self.arrays["yes"], count=rows).astype(bool)
+            return self.present(rows) * (1 + yes), np.array(["", "N", "Y"], dtype=object)
+        key = "days" if self.kind == "date" else "values"
+        codes, uniques = pd.factorize(np.asarray(self.arrays[key]), sort=False)
+        missing = _MISSING_DAY if self.kind == "date" else np.iinfo(self.arrays[key].dtype).min
+        if self.kind == "date":
+            texts = format_days(np.where(uniques == missing, 0, uniques), self.params["layout"])
+        else:
+            texts = [format_fixed(int(v), self.params["scale"]) for v in uniques]
+        texts = np.array(texts, dtype=object)
+        texts[uniques == missing] = ""
+        return codes, texts
+
+    def text(self, rows):
+        """Row values as an object array of strings (as load_input would read them, trimmed)."""
+        codes, texts = self.distinct(rows)
+        return texts[codes]
+
+    def series(self, rows):
+        """The column as a pandas string array, built from the distinct texts only."""
+        codes, texts = self.distinct(rows)
+        return pd.array(texts, dtype="str").take(np.asarray(codes, dtype=np.intp))
+
+    def take(self, rows, start, stop):
+        """The rows start:stop of this column."""
+        if self.kind == "flag":
+            arrays = {key: np.packbits(np.unpackbits(value, count=rows)[start:stop])
+                      for key, value in self.arrays.items()}
+        elif self.kind == "category":
+            arrays = {"codes": np.asarray(self.arrays["codes"][start:stop]),
+                      "categories": self.arrays["categories"]}
+        else:
+            arrays = {key: np.asarray(value[start:stop]) for key, value in self.arrays.items()}
+        return Column(self.kind, arrays, dict(self.params))
+
+
+def encode_category(texts):
+    codes, uniques = pd.factorize(np.asarray(texts, dtype=object), use_na_sentinel=False)
+    return Column("category", {"codes": codes.astype(_code_type(len(uniques))),
+                               "categories": np.array(list(uniques), dtype=str)})
+
+
+def _encode_number(codes, uniques):
+    present = uniques != ""
+    parsed = _parse_numbers(uniques)
+    if np.isnan(parsed[present]).any():
+        return None
+    scales = {len(text.partition(".")[2]) if "." in text else 0 for text in uniques[present]}
+    if len(scales) > 1:
+        return None
+    scale = scales.pop() if scales else 0
+    with np.errstate(invalid="ignore", over="ignore"):
+        scaled = np.where(present, np.round(parsed * 10.0 ** scale), 0)
+    if np.abs(scaled).max(initial=0) >= 2 ** 53:
+        return None
+    scaled = scaled.astype(np.int64)
+    exact = scaled[present] / 10.0 ** scale == parsed[present]
+    if not exact.all() or any(format_fixed(int(v), scale) != t for v, t in zip(scaled[present], uniques[present])):
+        return None
+    values = _pack_ints(scaled[codes], present[codes])
+    if values is None:
+        return None
+    return Column("number", {"values": values}, {"scale": scale})
+
+
+def _encode_date(codes, uniques):
+    present = uniques != ""
+    parsed = _parse_dates(uniques)
+    if np.isnat(parsed[present]).any():
+        return None
+    days = parsed.astype("datetime64[D]")
+    if (days.astype("datetime64[ns]")[present] != parsed[present]).any():
+        return None
+    days = np.where(present, days.astype(np.int64), 0)
+    if (days < np.iinfo(np.int32).min + 1).any() or (days > np.iinfo(np.int32).max).any():
+        return None
+    shown = [t for t in uniques[present]]
+    for layout in DATE_FORMATS:
+        if format_days(days[present], layout) == shown:
+            row_days = np.where(present[codes], days[codes], _MISSING_DAY).astype(np.int32)
+            return Column("date", {"days": row_days}, {"layout": layout})
+    return None
+
+
+def _encode_flag(codes, uniques):
+    if not set(uniques) <= FLAG_VALUES:
+        return None
+    texts = uniques[codes]
+    return Column("flag", {"set": np.packbits(texts != ""), "yes": np.packbits(texts == "Y")})
+
+
+_ENCODERS = {"number": _encode_number, "date": _encode_date, "flag": _encode_flag}
+
+
+def encode_column(texts, kind="category"):
+    """
+    Encode trimmed string values as ``kind``; falls back to categorical when
+    a value would not come back as the same text.
+    """
+    texts = np.asarray(texts, dtype=object)
+    encoder = _ENCODERS.get(kind)
+    if encoder is not None:
+        codes, uniques = pd.factorize(texts, use_na_sentinel=False)
+        column = encoder(codes, np.asarray(uniques, dtype=object))
+        if column is not None:
+            return column
+    return encode_category(texts)
+
+
+# ----- Store -----------------------------------------------------------------
+
+class RowStore:
+    """
+    Input rows as encoded columns (see the module docstring).  Columns keep
+    the CSV's order; values are stored trimmed, as DataCleaningService leaves
+    them.
+    """
+
+    def __init__(self, columns, rows, source=None):
+        self.columns = columns
+        self.rows = rows
+        self.source = source
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    @classmethod
+    def from_frame(cls, frame, schema=SCHEMA, source=None):
+        """Encode a frame of strings (as returned by load_input)."""
+        columns = {}
+        for name in frame.columns:
+            texts = frame[name].fillna("").str.strip().to_numpy(dtype=object)
+            columns[name] = encode_column(texts, schema.get(name.strip(), "category"))
+        return cls(columns, len(frame), source)
+
+    def frame(self):
+        """The rows as a frame of strings, interchangeable with load_input's."""
+        return pd.DataFrame({name: column.series(self.rows) for name, column in self.columns.items()})
+
+    def table(self):
+        """
+        A cleaned ColumnTable for the pipeline, with the date and number
+        views of every typed column (and of the columns DataCleaningService
+        copies them to) filled in from the store, so nothing is parsed again.
+        Text views are built per column from the encoded arrays when first
+        read (see StoreTable).
+        """
+        dates, numbers, sources = {}, {}, {}
+        for name, column in self.columns.items():
+            name = name.strip()
+            targets = [name] + ([COLUMN_MAPPINGS[name]] if name in COLUMN_MAPPINGS else [])
+            for target in targets:
+                sources[target] = column
+                if column.kind == "date":
+                    dates[target] = column.dates()
+                elif column.kind == "number":
+                    numbers[target] = column.numbers(self.rows)
+        return StoreTable(clean_frame(self.frame()), sources, self.rows, dates=dates, numbers=numbers)
+
+    def slice(self, start, stop):
+        """Rows start:stop as a new (in-memory) store."""
+        start, stop, _ = slice(start, stop).indices(self.rows)
+        stop = max(start, stop)
+        columns = {name: column.take(self.rows, start, stop) for name, column in self.columns.items()}
+        return RowStore(columns, stop - start, self.source)
+
+    def describe(self):
+        """(column, encoding, bytes) per column."""
+        return [(name, column.describe(), column.nbytes) for name, column in self.columns.items()]
+
+    # -- persistence --
+
+    def save(self, directory):
+        """Write the store as .npy files plus store.json (replacing any existing store)."""
+        directory = Path(directory)
+        tmp = directory.with_name(directory.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        manifest = {"version": STORE_VERSION, "rows": self.rows, "source": self.source, "columns": []}
+        for index, (name, column) in enumerate(self.columns.items()):
+            files = {}
+            for key, array in column.arrays.items():
+                files[key] = f"{index:03d}_{key}.npy"
+                np.save(tmp / files[key], np.ascontiguousarray(array), allow_pickle=False)
+            manifest["columns"].append({"name": name, "kind": column.kind, "params": column.params,
+                                        "files": files})
+        (tmp / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        shutil.rmtree(directory, ignore_errors=True)
+        tmp.replace(directory)
+        return directory
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Open a saved store; with ``mmap`` the arrays are memory-mapped, not read."""
+        directory = Path(directory)
+        try:
+            manifest = json.loads((directory / MANIFEST_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            raise StoreError(f"Cannot read row store {directory}: {exc}") from exc
+        if manifest.get("version") != STORE_VERSION:
+            raise StoreError(f"Row store {directory} has version {manifest.get('version')}, "
+                             f"expected {STORE_VERSION}")
+        columns = {}
+        for entry in manifest["columns"]:
+            arrays = {key: np.load(directory / file, mmap_mode="r" if mmap else None, allow_pickle=False)
+                      for key, file in entry["files"].items()}
+            columns[entry["name"]] = Column(entry["kind"], arrays, entry["params"])
+        return cls(columns, manifest["rows"], manifest.get("source"))
+
+
+class StoreTable(ColumnTable):
+    """
+    ColumnTable of a RowStore.  text() of a stored column indexes the
+    column's distinct texts with its codes, so every row shares one string
+    object per distinct value instead of getting its own copy from the
+    frame; the frame itself is only read for output.
+    """
+
+    def __init__(self, frame, sources, rows, dates=None, numbers=None):
+        super().__init__(frame, dates=dates, numbers=numbers)
+        self._sources = sources
+        self._rows = rows
+
+    def text(self, column):
+        if column not in self._text and column in self._sources:
+            codes, texts = self._sources[column].distinct(self._rows)
+            texts = np.array([REASON_CODE_NORMALIZATION.get(t, t) for t in texts], dtype=object)
+            self._text[column] = texts[codes]
+        return super().text(column)
+
+
+def concat_stores(stores):
+    """
+    One store holding the rows of several (e.g. a year of weekly files).
+    Columns with the same encoding are joined directly; the others are
+    re-encoded from their text.
+    """
+    stores = list(stores)
+    if not stores:
+        raise StoreError("No stores to combine")
+    names = list(stores[0].columns)
+    for store in stores[1:]:
+        if list(store.columns) != names:
+            raise StoreError(f"{store.source or 'store'} has different columns from {stores[0].source or 'the first'}")
+
+    columns = {}
+    for name in names:
+        parts = [(store.columns[name], store.rows) for store in stores]
+        kinds = {(column.kind, json.dumps(column.params, sort_keys=True)) for column, _ in parts}
+        kind = parts[0][0].kind
+        if len(kinds) == 1 and kind == "number":
+            present = np.concatenate([column.present(rows) for column, rows in parts])
+            values = np.concatenate([np.asarray(column.arrays["values"], dtype=np.int64) for column, _ in parts])
+            columns[name] = Column("number", {"values": _pack_ints(values, present)}, parts[0][0].params)
+        elif len(kinds) == 1 and kind == "date":
+            columns[name] = Column("date", {"days": np.concatenate([c.arrays["days"] for c, _ in parts])},
+                                   parts[0][0].params)
+        elif len(kinds) == 1 and kind == "flag":
+            columns[name] = Column("flag", {
+                key: np.packbits(np.concatenate([np.unpackbits(c.arrays[key], count=rows) for c, rows in parts]))
+                for key in ("set", "yes")})
+        else:
+            texts = np.concatenate([column.text(rows) for column, rows in parts])
+            columns[name] = encode_column(texts, SCHEMA.get(name.strip(), "category"))
+    return RowStore(columns, sum(store.rows for store in stores))
+
+
+# ----- Cache -----------------------------------------------------------------
+
+def file_digest(path):
+    digest = hashlib.sha256(STORE_VERSION.encode() + b"\0")
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(path, cache_dir=None):
+    path = Path(path)
+    cache_dir = Path(cache_dir) if cache_dir else path.resolve().parent / CACHE_DIR_NAME
+    return cache_dir / f"rows_{file_digest(path)[:16]}"
+
+
+def load_rows(path, cache_dir=None):
+    """
+    The RowStore of an input CSV: opened memory-mapped from the cache when the
+    file has not changed, otherwise parsed, encoded and cached.
+    """
+    directory = cache_path(path, cache_dir)
+    try:
+        return RowStore.load(directory)
+    except StoreError:
+        pass
+    store = RowStore.from_frame(load_input(path), source=str(path))
+    store.save(directory)
+    return RowStore.load(directory)
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Build (or open) the typed row store of input CSVs.")
+    ap.add_argument("-i", "--input", action="append", required=True,
+                    help="Input CSV or glob pattern (repeatable)")
+    ap.add_argument("--cache-dir", help=f"Cache directory (default: {CACHE_DIR_NAME}/ next to each CSV)")
+    ap.add_argument("--save", help="Also save the combined store to this directory")
+    ap.add_argument("--columns", action="store_true", help="Show the encoding and size of each column")
+    args = ap.parse_args()
+
+    from leave_variables import resolve_paths
+
+    paths = resolve_paths(args.input)
+    missing = [str(p) for p in paths if not p.is_file()]
+    if not paths or missing:
+        print(f"Error: input not found: {', '.join(missing) or ', '.join(args.input)}")
+        sys.exit(1)
+
+    stores = [load_rows(path, args.cache_dir) for path in paths]
+    store = stores[0] if len(stores) == 1 else concat_stores(stores)
+    text_bytes = sum(pd.Series(store.columns[name].text(store.rows)).memory_usage(deep=True, index=False)
+                     for name in store.columns)
+
+    if args.columns:
+        for name, encoding, size in store.describe():
+            print(f"{name:<26} {encoding:<40} {size:>12,} bytes")
+    print(f"{len(store)} rows from {len(paths)} file(s): {store.nbytes / 2 ** 20:.2f} MB typed, "
+          f"{text_bytes / 2 ** 20:.2f} MB as strings")
+    if args.save:
+        print(f"Row store → {store.save(args.save).resolve()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+scenario_bundle.py
+------------------
+Precompile scenarios.json into one binary bundle that the scoring tools load
+at start-up instead of parsing and preparing the JSON.
+
+Every tool that scores rows starts by parsing scenarios.json, normalizing the
+scenarios, reading (or rebuilding) the scenario index and, with
+--conditions-csv, compiling the condition formulas.  The bundle holds the
+result of all of those steps in one msgpack file under .esl_cache/ next to
+the config:
+
+    ESLBNDL\\0 | header length | header | payload
+
+- header: bundle / index / compiler versions, the built-in condition names,
+  each source file (config and conditions CSV) with its size, mtime and
+  SHA-256, and a content hash over all of them
+- payload: the catalog in its compact form (scenario_catalog.py, one line
+  per scenario, parsed on first access), the normalized scenarios (one list
+  per key, field definitions interned), the scenario_index
+  structure (rule masks as raw bytes, decision tables zlib-compressed and
+  inflated the first time a key of their group is looked up) and the
+  generated conditions module
+
+evaluate_scenarios.load_config, normalize_scenarios and
+scenario_index.load_index use the bundle while it is up to date: every
+source has the recorded size and mtime (or, when touched, the recorded
+hash) and the versions match.  Otherwise, or without msgpack installed, they
+read the JSON as before.  The bundle is only written by this script; run it
+again after editing scenarios.json or ConditionsCsv.csv.
+
+Usage
+-----
+$ python scenario_bundle.py                                      # bundle the default scenarios.json
+$ python scenario_bundle.py -c ../ESLFeeder/Config/scenarios.json --conditions-csv ../ConditionsCsv.csv
+$ python scenario_bundle.py --check                              # exit 1 when the bundle is stale
+$ python scenario_bundle.py --stats
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+
+# ----- Configuration ---------------------------------------------------------
+
+BUNDLE_VERSION = 2
+
+MAGIC = b"ESLBNDL\0"
+
+CACHE_DIR_NAME = ".esl_cache"
+
+BUNDLE_SUFFIX = ".bundle"
+
+# Bytes of the header length after MAGIC
+LENGTH_BYTES = 4
+
+# Bundles opened in this process: path -> (stat of the bundle and its sources, Bundle)
+_opened = {}
+
+
+def default_bundle_path(config_path):
+    config_path = Path(config_path)
+    return config_path.resolve().parent / CACHE_DIR_NAME / f"{config_path.stem}{BUNDLE_SUFFIX}"
+
+
+def _versions():
+    from compile_conditions import COMPILER_VERSION
+    from evaluate_scenarios import CONDITIONS
+    from scenario_index import INDEX_VERSION
+    return {"bundle": BUNDLE_VERSION, "index": INDEX_VERSION, "compiler": COMPILER_VERSION,
+            "conditions": sorted(CONDITIONS)}
+
+
+def _stat(path):
+    stat = Path(path).stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _sha256(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _source(kind, path):
+    size, mtime = _stat(path)
+    return {"kind": kind, "path": str(Path(path).resolve()), "size": size, "mtime_ns": mtime,
+            "sha256": _sha256(path)}
+
+
+def content_hash(versions, sources):
+    """Hash of everything a bundle is built from."""
+    digest = hashlib.sha256(json.dumps(versions, sort_keys=True).encode())
+    for source in sources:
+        digest.update(f"\0{source['kind']}\0{source['sha256']}".encode())
+    return digest.hexdigest()
+
+
+# ----- Encoding --------------------------------------------------------------
+
+def _encode_array(array, compress=False):
+    data = array.tobytes()
+    if compress:
+        return {"dtype": array.dtype.str, "shape": list(array.shape), "zlib": zlib.compress(data)}
+    return {"dtype": array.dtype.str, "shape": list(array.shape), "data": data}
+
+
+def _decode_array(data):
+    # Read-only views of the payload bytes; the index never writes to them
+    raw = zlib.decompress(data["zlib"]) if "zlib" in data else data["data"]
+    return np.frombuffer(raw, dtype=np.dtype(data["dtype"])).reshape(data["shape"])
+
+
+class _Group(dict):
+    """An index group whose decision table is decompressed on first access."""
+
+    def __init__(self, arrays, table):
+        super().__init__(arrays)
+        self._table = table
+
+    def __missing__(self, key):
+        if key != "table":
+            raise KeyError(key)
+        self["table"] = _decode_array(self._table)
+        self._table = None
+        return self["table"]
+
+
+def _encode_index(index):
+    groups = []
+    for group in index["groups"]:
+        arrays = {key: _encode_array(group[key]) for key in ("required", "forbidden", "ids")}
+        # Dense tables are mostly runs of the same id and shrink 100x or more
+        arrays["table"] = None if group["table"] is None else _encode_array(group["table"], compress=True)
+        groups.append(dict(arrays, bits=group["bits"]))
+    keys = [[reason, level, group] for (reason, level), group in sorted(index["keys"].items())]
+    return {"keys": keys, "groups": groups, "default_group": index["default_group"]}
+
+
+def _decode_index(data):
+    groups = []
+    for group in data["groups"]:
+        arrays = {key: _decode_array(group[key]) for key in ("required", "forbidden", "ids")}
+        arrays["bits"] = group["bits"]
+        if group["table"] is None:
+            groups.append(dict(arrays, table=None))
+        else:
+            groups.append(_Group(arrays, group["table"]))
+    keys = {(reason, int(level)): group for reason, level, group in data["keys"]}
+    return {"keys": keys, "groups": groups, "default_group": data["default_group"]}
+
+
+def _encode_scenarios(scenarios):
+    """normalize_scenarios output by key (one list per key), with the update field definitions interned."""
+    from scenario_catalog import _Interner
+    fields, columns = _Interner(), _Interner()
+    encoded = {key: [s[key] for s in scenarios] for key in (scenarios[0] if scenarios else ())}
+    if scenarios:
+        encoded["process_levels"] = [sorted(levels) for levels in encoded["process_levels"]]
+        encoded["order"] = [columns.id(order) for order in encoded["order"]]
+        encoded["fields"] = [[columns.id(list(f)), [fields.id(field) for field in f.values()]]
+                             for f in encoded["fields"]]
+    return {"field_table": fields.values, "column_lists": columns.values, "by_key": encoded}
+
+
+def _decode_scenarios(data):
+    field_table, column_lists = data["field_table"], data["column_lists"]
+    keys = list(data["by_key"])
+    scenarios = []
+    for values in zip(*data["by_key"].values()):
+        scenario = dict(zip(keys, values))
+        columns, ids = scenario["fields"]
+        scenario["process_levels"] = set(scenario["process_levels"])
+        scenario["order"] = list(column_lists[scenario["order"]])
+        scenario["fields"] = dict(zip(column_lists[columns], [field_table[i] for i in ids]))
+        scenarios.append(scenario)
+    return scenarios
+
+
+# ----- Building --------------------------------------------------------------
+
+def build_bundle(config_path, conditions_csv=None):
+    """The (header, payload) of a bundle for scenarios.json and an optional conditions CSV."""
+    from evaluate_scenarios import CONDITIONS, normalize_scenarios
+    from scenario_catalog import compact_catalog, compact_lines, expand_catalog, load_catalog
+    from scenario_index import build_index
+
+    # Always the JSON itself, never an older bundle of it
+    full = expand_catalog(load_catalog(config_path))
+    sources = [_source("config", config_path)]
+
+    conditions, module = dict(CONDITIONS), None
+    if conditions_csv:
+        from compile_conditions import conditions_digest, generate_module, import_source, read_conditions_csv
+        digest = conditions_digest(conditions_csv)
+        text = generate_module(read_conditions_csv(conditions_csv), source=Path(conditions_csv).name, digest=digest)
+        loaded = import_source(text, digest)
+        conditions.update({name: getattr(loaded, name) for name in loaded.CONDITION_LOGIC})
+        module = {"digest": digest, "source": text}
+        sources.append(_source("conditions", conditions_csv))
+
+    scenarios = normalize_scenarios(full)
+    versions = _versions()
+    header = {
+        "versions": versions,
+        "content_hash": content_hash(versions, sources),
+        "sources": sources,
+        "known_conditions": sorted(conditions),
+        "scenarios": len(scenarios),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    payload = {
+        "catalog": compact_lines(compact_catalog(full)),
+        "normalized": _encode_scenarios(scenarios),
+        "index": _encode_index(build_index(full, conditions)),
+        "conditions": module,
+    }
+    return header, payload
+
+
+def write_bundle(header, payload, path):
+    import msgpack
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    head = msgpack.packb(header, use_bin_type=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + len(head).to_bytes(LENGTH_BYTES, "little") + head)
+        f.write(msgpack.packb(payload, use_bin_type=True))
+    tmp_path.replace(path)
+
+
+# ----- Loading ---------------------------------------------------------------
+
+def read_header(data):
+    """(header, payload offset) of the bundle bytes ``data``."""
+    import msgpack
+    if not data.startswith(MAGIC):
+        raise ValueError("not a scenario bundle")
+    start = len(MAGIC) + LENGTH_BYTES
+    end = start + int.from_bytes(data[len(MAGIC):start], "little")
+    return msgpack.unpackb(data[start:end], raw=False), end
+
+
+def stale_reasons(header, config_path):
+    """Why a bundle header no longer describes ``config_path`` and its sources ([] when up to date)."""
+    reasons = []
+    if header.get("versions") != _versions():
+        reasons.append("built by another version of the scoring tools")
+    sources = header.get("sources") or []
+    if not sources or sources[0].get("path") != str(Path(config_path).resolve()):
+        reasons.append(f"built from {sources[0].get('path') if sources else 'nothing'}")
+    for source in sources:
+        path = Path(source["path"])
+        if not path.is_file():
+            reasons.append(f"{source['kind']} file {path} is missing")
+        elif _stat(path) != (source["size"], source["mtime_ns"]) and _sha256(path) != source["sha256"]:
+            reasons.append(f"{source['kind']} file {path} has changed")
+    return reasons
+
+
+class BundledConfig(dict):
+    """A config dictionary read from a bundle, carrying its normalized scenarios."""
+
+    def __init__(self, config, normalized):
+        super().__init__(config)
+        self._scenarios = self.get("scenarios")
+        self._normalized = normalized
+
+    @property
+    def normalized(self):
+        # Only while "scenarios" is still the list the bundle was built from
+        return self._normalized if self.get("scenarios") is self._scenarios else None
+
+
+class Bundle:
+    """A loaded, up-to-date bundle."""
+
+    def __init__(self, path, header, payload):
+        from scenario_catalog import open_lines
+        self.path = Path(path)
+        self.header = header
+        self.known_conditions = header["known_conditions"]
+        # The scenario records are only parsed when a tool reads them; scoring uses the normalized ones
+        config = open_lines(payload["catalog"], check=False)
+        if config is None:
+            raise ValueError("the bundled catalog is not in the compact layout")
+        self.config = BundledConfig(config, _decode_scenarios(payload["normalized"]))
+        self.index = _decode_index(payload["index"])
+        module = payload.get("conditions")
+        if module:
+            # load_conditions() for the CSV then reuses this module instead of compiling it
+            from compile_conditions import import_source
+            import_source(module["source"], module["digest"])
+
+    @property
+    def sources(self):
+        return self.header["sources"]
+
+
+def _fingerprint(path, sources):
+    try:
+        return (_stat(path),) + tuple(_stat(source["path"]) for source in sources)
+    except OSError:
+        return None
+
+
+def open_bundle(config_path, bundle_path=None):
+    """The bundle of scenarios.json when it exists and is up to date, otherwise None."""
+    path = Path(bundle_path) if bundle_path else default_bundle_path(config_path)
+    if not path.is_file():
+        return None
+    cached = _opened.get(str(path))
+    if (cached and cached[1].sources[0]["path"] == str(Path(config_path).resolve())
+            and cached[0] is not None and cached[0] == _fingerprint(path, cached[1].sources)):
+        return cached[1]
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    try:
+        data = path.read_bytes()
+        header, offset = read_header(data)
+        if stale_reasons(header, config_path):
+            return None
+        bundle = Bundle(path, header, msgpack.unpackb(data[offset:], raw=False))
+    except (OSError, ValueError, KeyError, TypeError, msgpack.UnpackException):
+        return None
+    _opened[str(path)] = (_fingerprint(path, bundle.sources), bundle)
+    return bundle
+
+
+def bundled_config(config_path):
+    """load_config from the bundle, or None when there is no up-to-date bundle."""
+    bundle = open_bundle(config_path)
+    return bundle.config if bundle else None
+
+
+def bundled_index(config_path, known_conditions=None):
+    """The scenario_index structure from the bundle, when it was built against the same conditions."""
+    from evaluate_scenarios import CONDITIONS
+    bundle = open_bundle(config_path)
+    known = sorted(CONDITIONS if known_conditions is None else known_conditions)
+    return bundle.index if bundle and bundle.known_conditions == known else None
+
+
+# ----- Statistics ------------------------------------------------------------
+
+def measure(config_path, bundle_path, repeat=3):
+    """
+    Best-of-``repeat`` milliseconds to load and normalize the scenarios and
+    get their index, from the JSON (with scenario_index's cached .npz) and
+    from the bundle.
+    """
+    from evaluate_scenarios import normalize_scenarios
+    from scenario_catalog import load_catalog
+    from scenario_index import default_index_path, load_index
+
+    from_json = from_bundle = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        normalize_scenarios(load_catalog(config_path))
+        load_index(config_path, default_index_path(config_path))
+        from_json = min(from_json, time.perf_counter() - start)
+
+        _opened.clear()
+        start = time.perf_counter()
+        bundle = open_bundle(config_path, bundle_path)
+        normalize_scenarios(bundle.config)
+        from_bundle = min(from_bundle, time.perf_counter() - start)
+    return from_json * 1000, from_bundle * 1000
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    from evaluate_scenarios import DEFAULT_CONFIG
+
+    ap = argparse.ArgumentParser(description="Precompile scenarios.json into a binary bundle for fast start-up.")
+    ap.add_argument("-c", "--config", default=str(DEFAULT_CONFIG), help="Path to scenarios.json")
+    ap.add_argument("--conditions-csv", help="Also bundle the compiled formulas of ConditionsCsv.csv")
+    ap.add_argument("-o", "--output", help=f"Bundle path (default: {CACHE_DIR_NAME}/<config>{BUNDLE_SUFFIX} "
+                                           "next to the config; the tools only read the default path)")
+    ap.add_argument("--check", action="store_true", help="Only report whether the bundle is up to date")
+    ap.add_argument("--stats", action="store_true", help="Compare the start-up time from the JSON and the bundle")
+    args = ap.parse_args()
+
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        print("Error: msgpack is not installed (pip install msgpack); the tools read scenarios.json directly")
+        sys.exit(1)
+    if not Path(args.config).is_file():
+        print(f"Error: config not found: {args.config}")
+        sys.exit(1)
+    out_path = Path(args.output) if args.output else default_bundle_path(args.config)
+
+    if args.check:
+        try:
+            header, _ = read_header(out_path.read_bytes())
+        except (OSError, ValueError) as exc:
+            print(f"No usable bundle at {out_path}: {exc}")
+            sys.exit(1)
+        reasons = stale_reasons(header, args.config)
+        for reason in reasons:
+            print(f"Stale: {reason}")
+        if reasons:
+            sys.exit(1)
+        print(f"Up to date: {header['scenarios']} scenarios, built {header['built_at']}, "
+              f"content hash {header['content_hash'][:16]}")
+        return
+
+    if args.conditions_csv and not Path(args.conditions_csv).is_file():
+        print(f"Error: conditions CSV not found: {args.conditions_csv}")
+        sys.exit(1)
+    start = time.perf_counter()
+    header, payload = build_bundle(args.config, args.conditions_csv)
+    write_bundle(header, payload, out_path)
+    elapsed = time.perf_counter() - start
+    print(f"Bundled {header['scenarios']} scenarios, {len(payload['index']['groups'])} decision tables"
+          + (f", {len(header['known_conditions'])} conditions" if args.conditions_csv else "")
+          + f" in {elapsed:.2f} s ({out_path.stat().st_size:,} bytes) → {out_path.resolve()}")
+
+    if args.stats:
+        json_ms, bundle_ms = measure(args.config, out_path)
+        print(f"Start-up: {json_ms:.1f} ms from the JSON, {bundle_ms:.1f} ms from the bundle")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+scenario_catalog.py
+-------------------
+Compact catalog form of scenarios.json, and a converter in both directions.
+
+Every scenario in scenarios.json spells out the same 15 updates.fields
+entries ({"source": "0", "type": "double"}, the CHECK_KRONOS / AUTH_BY /
+ENTRY_DATE defaults, ...) and the same updates.order list.  The compact form
+interns them into one table of field definitions and one of column lists,
+referenced by position, and writes one scenario per line:
+
+    {"schema_version": "1.0", "metadata": {...}, "catalog_format": "compact",
+     "field_table": [{"source": "0", "type": "double"}, ...],
+     "column_lists": [["CHECK_KRONOS", "LM_PTO_HRS", ...], ...],
+     "scenario_count": 76, "scenario_digest": "9f2c...", "scenarios": [
+    {"id": 1, ..., "updates": {"order": 0, "fields": [4, 0, 0, ...]}},
+    ...
+    ]}
+
+``order`` is an index into column_lists, and ``fields`` lists field_table ids
+in that order (or is {"columns": <column list>, "ids": [...]} when the field
+keys are not the order list).  Everything else is kept as it is, so expanding
+a compact catalog gives back the original JSON.
+
+The file is plain JSON, but the loader reads it by line: the first line
+holds the metadata, the two tables and the count and sha256 of the scenario
+lines, and every other line one scenario record (lines that do not match
+the count and digest are parsed as a whole, so a damaged file fails the
+load).  Each scenario is a Scenario object, a read-only mapping with
+__slots__ that parses its line and builds ``updates`` from the shared tables
+on first access (the field definitions are not copied).
+evaluate_scenarios.load_config opens compact catalogs this way, so every
+scoring tool reads both forms.  The tools that edit scenarios.json
+(update_scenarios.py, append_scenarios.py) expand a compact target first.
+
+Usage
+-----
+$ python scenario_catalog.py ../ESLFeeder/Config/scenarios.json -o scenarios.compact.json
+$ python scenario_catalog.py scenarios.compact.json -o scenarios.json
+$ python scenario_catalog.py ../ESLFeeder/Config/scenarios.json --stats
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import sys
+import time
+import tracemalloc
+from collections.abc import Mapping
+from pathlib import Path
+
+
+# ----- Configuration ---------------------------------------------------------
+
+CATALOG_FORMAT = "compact"
+
+# Keys of the compact layout that today's layout does not have
+CATALOG_KEYS = ("catalog_format", "field_table", "column_lists", "scenario_count", "scenario_digest")
+
+# End of the first line of a compact file written by write_compact
+SCENARIOS_OPEN = '"scenarios": ['
+
+_decoder = json.JSONDecoder()
+
+
+def is_compact(data):
+    return isinstance(data, dict) and data.get("catalog_format") == CATALOG_FORMAT
+
+
+# ----- Compacting ------------------------------------------------------------
+
+class _Interner:
+    """Table of distinct JSON values; ``id(value)`` returns the value's position."""
+
+    def __init__(self):
+        self.values = []
+        self._ids = {}
+
+    def id(self, value):
+        # Key order is kept, so expanding gives back the same JSON
+        key = json.dumps(value)
+        if key not in self._ids:
+            self._ids[key] = len(self.values)
+            self.values.append(value)
+        return self._ids[key]
+
+
+def _compact_updates(updates, fields, columns):
+    compact = {}
+    for key, value in updates.items():
+        if key == "order" and isinstance(value, list):
+            compact[key] = columns.id(value)
+        elif key == "fields" and isinstance(value, dict):
+            ids = [fields.id(field) for field in value.values()]
+            if list(value) == updates.get("order"):
+                compact[key] = ids
+            else:
+                compact[key] = {"columns": columns.id(list(value)), "ids": ids}
+        else:
+            compact[key] = value
+    return compact
+
+
+def compact_catalog(config):
+    """The compact form of a scenarios.json dictionary in today's layout."""
+    fields, columns = _Interner(), _Interner()
+    scenarios = []
+    for raw in config.get("scenarios", []):
+        scenario = dict(raw)
+        if isinstance(scenario.get("updates"), dict):
+            scenario["updates"] = _compact_updates(scenario["updates"], fields, columns)
+        scenarios.append(scenario)
+
+    compact = {key: value for key, value in config.items() if key != "scenarios"}
+    compact["catalog_format"] = CATALOG_FORMAT
+    compact["field_table"] = fields.values
+    compact["column_lists"] = columns.values
+    compact["scenarios"] = scenarios
+    return compact
+
+
+def lines_digest(lines):
+    """sha256 of scenario lines, ignoring the whitespace around each line."""
+    digest = hashlib.sha256()
+    for line in lines:
+        digest.update(line.strip().encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+def compact_lines(compact):
+    """
+    The lines of a compact catalog: the tables on the first line, then one
+    scenario per line.  The first line also records the number of scenario
+    lines and their digest, so a loader can tell they are intact without
+    parsing them.
+    """
+    scenarios = [json.dumps(s, ensure_ascii=False) for s in compact.get("scenarios", [])]
+    scenarios = [line + "," for line in scenarios[:-1]] + scenarios[-1:]
+    header = {key: value for key, value in compact.items() if key != "scenarios"}
+    header["scenario_count"] = len(scenarios)
+    header["scenario_digest"] = lines_digest(scenarios)
+    return [json.dumps(header, ensure_ascii=False)[:-1] + ", " + SCENARIOS_OPEN] + scenarios + ["]}"]
+
+
+def write_compact(compact, path):
+    Path(path).write_text("\n".join(compact_lines(compact)) + "\n", encoding="utf-8")
+
+
+# ----- Expanding -------------------------------------------------------------
+
+def _expand_updates(compact, field_table, column_lists):
+    updates = {}
+    order = None
+    if isinstance(compact.get("order"), int):
+        order = column_lists[compact["order"]]
+    for key, value in compact.items():
+        if key == "order" and order is not None:
+            updates[key] = list(order)
+        elif key == "fields" and isinstance(value, list):
+            updates[key] = {column: field_table[i] for column, i in zip(order or [], value)}
+        elif key == "fields" and isinstance(value, dict) and "ids" in value:
+            updates[key] = {column: field_table[i] for column, i in zip(column_lists[value["columns"]], value["ids"])}
+        else:
+            updates[key] = value
+    return updates
+
+
+class Scenario(Mapping):
+    """
+    One scenario of a compact catalog, read like the scenario dict of today's
+    layout.  ``updates`` is expanded (and the record parsed, when given as a
+    line) on first access; the field definitions are shared with the catalog
+    and must not be modified.
+    """
+
+    __slots__ = ("_line", "_record", "_tables", "_updates")
+
+    def __init__(self, tables, record=None, line=None):
+        self._tables = tables
+        self._record = record
+        self._line = line
+        self._updates = None
+
+    @property
+    def record(self):
+        if self._record is None:
+            # The line ends with the "," that separates it from the next one
+            self._record = _decoder.raw_decode(self._line)[0]
+            self._line = None
+        return self._record
+
+    def __getitem__(self, key):
+        record = self.record
+        if key == "updates" and "updates" in record:
+            if self._updates is None:
+                self._updates = _expand_updates(record["updates"], *self._tables)
+            return self._updates
+        return record[key]
+
+    def __iter__(self):
+        return iter(self.record)
+
+    def __len__(self):
+        return len(self.record)
+
+    def __repr__(self):
+        return f"Scenario({self.get('id')!r}, {self.get('name', '')!r})"
+
+    def to_dict(self):
+        return {key: self[key] for key in self}
+
+
+def open_catalog(compact):
+    """
+    A config dictionary for the scoring tools from a parsed compact catalog:
+    the same keys as today's layout, with Scenario objects as scenarios.
+    """
+    tables = (compact["field_table"], compact["column_lists"])
+    config = {key: value for key, value in compact.items() if key not in CATALOG_KEYS}
+    config["scenarios"] = [Scenario(tables, record=record) for record in compact.get("scenarios", [])]
+    return config
+
+
+def _check_line(line, last):
+    """The scenario record on one line of write_compact's layout, or None when the line is not one."""
+    line = line.strip()
+    try:
+        record, end = _decoder.raw_decode(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or line[end:].strip() != ("" if last else ","):
+        return None
+    return record
+
+
+def open_lines(lines, check=True):
+    """
+    open_catalog for the lines of write_compact's layout; None when they are
+    not in it.  Each scenario line is parsed on first access.  A damaged or
+    edited file is not accepted: the scenario lines must match the count and
+    digest on the first line, or, in a file written without them, each line
+    is decoded up front.  ``check=False`` (for lines this module wrote
+    itself, as in a scenario bundle) skips the check.
+    """
+    if len(lines) < 2 or not lines[0].rstrip().endswith(SCENARIOS_OPEN) or lines[-1].strip() != "]}":
+        return None
+    try:
+        header = json.loads(lines[0].rstrip()[:-len(SCENARIOS_OPEN)].rstrip().rstrip(",") + "}")
+    except ValueError:
+        return None
+    if not is_compact(header):
+        return None
+    tables = (header["field_table"], header["column_lists"])
+    config = {key: value for key, value in header.items() if key not in CATALOG_KEYS}
+    body = [line for line in lines[1:-1] if line.strip()]
+    if check and "scenario_digest" in header:
+        if len(body) != header.get("scenario_count") or lines_digest(body) != header["scenario_digest"]:
+            return None
+        check = False
+    if not check:
+        config["scenarios"] = [Scenario(tables, line=line.strip()) for line in body]
+        return config
+    scenarios = []
+    for i, line in enumerate(body):
+        record = _check_line(line, last=i == len(body) - 1)
+        if record is None:
+            return None
+        scenarios.append(Scenario(tables, record=record))
+    config["scenarios"] = scenarios
+    return config
+
+
+def loads_catalog(text):
+    """scenarios.json text in either layout; a compact catalog is opened with Scenario objects."""
+    if '"catalog_format"' in text.partition("\n")[0]:
+        config = open_lines(text.rstrip().split("\n"))
+        if config is not None:
+            return config
+    data = json.loads(text)
+    return open_catalog(data) if is_compact(data) else data
+
+
+def load_catalog(path):
+    """
+    loads_catalog for a file; the lines of a compact catalog are read without
+    holding the whole text.  A compact file whose lines do not all hold one
+    scenario is parsed as a whole, so a damaged one raises ValueError here.
+    """
+    with open(path, encoding="utf-8") as f:
+        first = f.readline()
+        if '"catalog_format"' not in first:
+            return loads_catalog(first + f.read())
+        lines = [first] + f.readlines()
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return open_lines(lines) or loads_catalog("".join(lines))
+
+
+def is_compact_file(path):
+    """Whether the file at ``path`` is a compact catalog (in any JSON layout)."""
+    return is_compact(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+def expand_catalog(config):
+    """Today's scenarios.json layout (plain dictionaries throughout) from a loaded or parsed catalog."""
+    if is_compact(config):
+        config = open_catalog(config)
+    expanded = dict(config)
+    expanded["scenarios"] = [copy.deepcopy(s.to_dict()) if isinstance(s, Scenario) else s
+                             for s in config.get("scenarios", [])]
+    return expanded
+
+
+# ----- Statistics ------------------------------------------------------------
+
+def measure(path, repeat=3):
+    """
+    Milliseconds to open ``path`` and to read every scenario's updates (best
+    of ``repeat``), and the bytes allocated (peak) for each, as
+    ((open ms, all ms), (open KB, all KB)).
+    """
+    opened = everything = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        config = load_catalog(path)
+        opened = min(opened, time.perf_counter() - start)
+        for scenario in config.get("scenarios", []):
+            scenario.get("updates")
+        everything = min(everything, time.perf_counter() - start)
+        del config
+
+    tracemalloc.start()
+    config = load_catalog(path)
+    open_peak = tracemalloc.get_traced_memory()[1]
+    for scenario in config.get("scenarios", []):
+        scenario.get("updates")
+    all_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (opened * 1000, everything * 1000), (open_peak / 1024, all_peak / 1024)
+
+
+def write_json(data, path):
+    Path(path).write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert scenarios.json to and from the compact catalog form.")
+    ap.add_argument("input", help="scenarios.json in today's layout or in the compact form")
+    ap.add_argument("-o", "--output", help="Write the other form here")
+    ap.add_argument("--stats", action="store_true", help="Compare the size, load time and memory of both forms")
+    args = ap.parse_args()
+
+    try:
+        config = load_catalog(args.input)
+    except (OSError, ValueError) as exc:
+        print(f"Error: cannot read {args.input}: {exc}")
+        sys.exit(1)
+
+    was_compact = any(isinstance(s, Scenario) for s in config.get("scenarios", []))
+    full = expand_catalog(config)
+    compact = compact_catalog(full)
+
+    if args.output:
+        if was_compact:
+            write_json(full, args.output)
+        else:
+            write_compact(compact, args.output)
+        print(f"{'Expanded' if was_compact else 'Compacted'} {len(full.get('scenarios', []))} scenarios "
+              f"({len(compact['field_table'])} distinct field definitions) → {Path(args.output).resolve()}")
+
+    if args.stats:
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = {"full": Path(tmp) / "full.json", "compact": Path(tmp) / "compact.json"}
+            write_json(full, paths["full"])
+            write_compact(compact, paths["compact"])
+            print(f"{'form':<8} {'bytes':>12} {'open ms':>9} {'all ms':>9} {'open KB':>10} {'all KB':>10}")
+            for form, path in paths.items():
+                (open_ms, all_ms), (open_kb, all_kb) = measure(path)
+                print(f"{form:<8} {path.stat().st_size:>12,} {open_ms:>9.1f} {all_ms:>9.1f} "
+                      f"{open_kb:>10,.0f} {all_kb:>10,.0f}")
+        print(f"{len(full.get('scenarios', []))} scenarios, {len(compact['field_table'])} distinct field "
+              f"definitions, {len(compact['column_lists'])} distinct column lists")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+scenario_diff.py
+----------------
+Structural diff of scenarios.  Instead of pretty-printing two scenarios and
+running difflib over the text, the scenario dicts are walked directly and
+every difference becomes a typed Change record:
+
+    Change(scenario_id=3, kind="changed", path=("updates", "fields", "PTO_HRS", "source"),
+           old="0", new="variables.ScheduledHours * 0.4")
+
+Subtrees that compare equal are skipped without being visited.  The text
+report, the interactive review of update_scenarios.py --review
+(review_changes) and the JSON change report are all rendered from these
+records.
+
+Kinds
+-----
+scenario_added / scenario_removed   a whole scenario
+added / removed / changed           a key (or list element) of a scenario
+items_added / items_removed         members of a set-like list (conditions, process levels, ...)
+reordered                           same members, different order (e.g. updates.order)
+
+Usage
+-----
+$ python scenario_diff.py old_scenarios.json ../ESLFeeder/Config/scenarios.json
+$ python scenario_diff.py old_scenarios.json new_scenarios.json --json changes.json
+"""
+
+import argparse
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+# ----- Configuration ---------------------------------------------------------
+
+# Lists whose order carries no meaning for the feeder
+SET_LIKE_PATHS = {
+    ("conditions", "required"),
+    ("conditions", "forbidden"),
+    ("conditions", "optional"),
+    ("process_levels",),
+    ("variables_required",),
+}
+
+# Lists where order matters but members are unique names
+ORDERED_NAME_PATHS = {
+    ("updates", "order"),
+}
+
+GREEN, RED, YELLOW, CYAN, RESET = "\033[92m", "\033[91m", "\033[93m", "\033[96m", "\033[0m"
+
+
+class Change(NamedTuple):
+    scenario_id: Any
+    kind: str
+    path: Tuple
+    old: Any = None
+    new: Any = None
+
+    @property
+    def location(self) -> str:
+        return ".".join(str(p) for p in self.path) or "(scenario)"
+
+    def to_dict(self) -> Dict:
+        record = {"scenario_id": self.scenario_id, "kind": self.kind, "path": self.location}
+        if self.old is not None or self.kind in ("removed", "changed"):
+            record["old"] = self.old
+        if self.new is not None or self.kind in ("added", "changed"):
+            record["new"] = self.new
+        return record
+
+
+# ----- Diffing ---------------------------------------------------------------
+
+def diff_values(scenario_id, path: Tuple, old: Any, new: Any, out: List[Change]) -> None:
+    """Append the changes between two JSON values at ``path`` to ``out``."""
+    if old is new or (type(old) is type(new) and old == new):
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, old_value in old.items():
+            if key not in new:
+                out.append(Change(scenario_id, "removed", path + (key,), old=old_value))
+            else:
+                diff_values(scenario_id, path + (key,), old_value, new[key], out)
+        for key, new_value in new.items():
+            if key not in old:
+                out.append(Change(scenario_id, "added", path + (key,), new=new_value))
+        return
+    if isinstance(old, list) and isinstance(new, list):
+        if path in SET_LIKE_PATHS or path in ORDERED_NAME_PATHS:
+            _diff_members(scenario_id, path, old, new, out)
+        elif len(old) == len(new):
+            for i, (a, b) in enumerate(zip(old, new)):
+                diff_values(scenario_id, path + (i,), a, b, out)
+        else:
+            out.append(Change(scenario_id, "changed", path, old=old, new=new))
+        return
+    out.append(Change(scenario_id, "changed", path, old=old, new=new))
+
+
+def _diff_members(scenario_id, path: Tuple, old: List, new: List, out: List[Change]) -> None:
+    """Members added / removed as multisets, so a duplicate entry gained or lost is reported too."""
+    try:
+        extra_old, extra_new = Counter(old) - Counter(new), Counter(new) - Counter(old)
+    except TypeError:
+        out.append(Change(scenario_id, "changed", path, old=old, new=new))
+        return
+    removed = _take(old, extra_old)
+    added = _take(new, extra_new)
+    if removed:
+        out.append(Change(scenario_id, "items_removed", path, old=removed))
+    if added:
+        out.append(Change(scenario_id, "items_added", path, new=added))
+    if not removed and not added and path in ORDERED_NAME_PATHS:
+        out.append(Change(scenario_id, "reordered", path, old=old, new=new))
+
+
+def _take(values: List, counts: Counter) -> List:
+    """The last ``counts[v]`` occurrences of each value, in list order."""
+    seen = Counter(values)
+    taken = []
+    for value in values:
+        seen[value] -= 1
+        if seen[value] < counts[value]:
+            taken.append(value)
+    return taken
+
+
+def diff_scenario(old: Dict, new: Dict, scenario_id=None) -> List[Change]:
+    """Changes needed to turn scenario ``old`` into ``new``."""
+    if scenario_id is None:
+        scenario_id = new.get("id", old.get("id"))
+    changes: List[Change] = []
+    diff_values(scenario_id, (), old, new, changes)
+    return changes
+
+
+def diff_catalogs(old_scenarios: Iterable[Dict], new_scenarios: Iterable[Dict]) -> List[Change]:
+    """Changes between two scenario lists, matched by id (new-list order)."""
+    old_by_id = {s.get("id"): s for s in old_scenarios}
+    changes: List[Change] = []
+    seen = set()
+    for scenario in new_scenarios:
+        scenario_id = scenario.get("id")
+        seen.add(scenario_id)
+        if scenario_id not in old_by_id:
+            changes.append(Change(scenario_id, "scenario_added", (), new=scenario))
+        else:
+            diff_values(scenario_id, (), old_by_id[scenario_id], scenario, changes)
+    for scenario_id, scenario in old_by_id.items():
+        if scenario_id not in seen:
+            changes.append(Change(scenario_id, "scenario_removed", (), old=scenario))
+    return changes
+
+
+def group_by_scenario(changes: Iterable[Change]) -> Dict[Any, List[Change]]:
+    grouped: Dict[Any, List[Change]] = {}
+    for change in changes:
+        grouped.setdefault(change.scenario_id, []).append(change)
+    return grouped
+
+
+# ----- Rendering -------------------------------------------------------------
+
+def _short(value: Any, limit: int = 120) -> str:
+    text = value if isinstance(value, str) else json.dumps(value)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def describe_change(change: Change, color: bool = False) -> List[str]:
+    """One or more display lines for a change record."""
+    g, r, y, reset = (GREEN, RED, YELLOW, RESET) if color else ("", "", "", "")
+    where = change.location
+    kind = change.kind
+    if kind == "scenario_added":
+        return [f"{g}+ new scenario: {change.new.get('name', '')}{reset}"]
+    if kind == "scenario_removed":
+        return [f"{r}- scenario removed: {change.old.get('name', '')}{reset}"]
+    if kind == "added":
+        return [f"{g}+ {where}: {_short(change.new)}{reset}"]
+    if kind == "removed":
+        return [f"{r}- {where}: {_short(change.old)}{reset}"]
+    if kind == "items_added":
+        return [f"{g}+ {where}: {', '.join(_short(v) for v in change.new)}{reset}"]
+    if kind == "items_removed":
+        return [f"{r}- {where}: {', '.join(_short(v) for v in change.old)}{reset}"]
+    if kind == "reordered":
+        return [f"{y}~ {where} reordered: {', '.join(map(str, change.new))}{reset}"]
+    return [f"{r}- {where}: {_short(change.old)}{reset}",
+            f"{g}+ {where}: {_short(change.new)}{reset}"]
+
+
+def summary_lines(changes: List[Change]) -> List[str]:
+    """Short per-section summary, e.g. '• Conditions updated'."""
+    sections = []
+    for change in changes:
+        if change.kind == "scenario_added":
+            return ["• Adding new scenario"]
+        if change.kind == "scenario_removed":
+            return ["• Scenario removed"]
+        top = change.path[0] if change.path else ""
+        label = {
+            "name": "Name changed", "description": "Description updated",
+            "reason_code": "Reason code changed", "process_levels": "Process levels changed",
+            "process_level": "Process level changed", "conditions": "Conditions updated",
+            "variables_required": "Required variables changed", "logging": "Logging configuration updated",
+            "updates": "Updates section modified",
+        }.get(top, f"{top} changed")
+        if label not in sections:
+            sections.append(label)
+    return [f"• {s}" for s in sections] or ["• No changes required"]
+
+
+REPORT_HEADER = "ESL Scenarios Update Review\n=========================\n\n"
+
+
+def render_scenario(scenario_id, changes: List[Change], name: Optional[str] = None, color: bool = False) -> str:
+    """Report block for one scenario's changes."""
+    c, reset = (CYAN, RESET) if color else ("", "")
+    prefix = "NEW " if changes and changes[0].kind == "scenario_added" else ""
+    if name is None and prefix:
+        name = changes[0].new.get("name", "")
+    lines = [f"{c}{prefix}Scenario #{scenario_id}: {name or ''}{reset}", "=" * 80]
+    for change in changes:
+        lines.extend("  " + line for line in describe_change(change, color))
+    lines += ["", "Changes Summary:", "-" * 40]
+    lines.extend(summary_lines(changes))
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def render_text(changes: List[Change], names: Optional[Dict] = None, color: bool = False) -> str:
+    """Text change report grouped by scenario."""
+    names = names or {}
+    blocks = [render_scenario(scenario_id, scenario_changes, names.get(scenario_id), color)
+              for scenario_id, scenario_changes in group_by_scenario(changes).items()]
+    return REPORT_HEADER + ("".join(blocks) if blocks else "No changes.\n")
+
+
+def render_json(changes: List[Change]) -> str:
+    """JSON change report: a summary plus one record per change."""
+    counts: Dict[str, int] = {}
+    for change in changes:
+        counts[change.kind] = counts.get(change.kind, 0) + 1
+    report = {
+        "scenarios_changed": len(group_by_scenario(changes)),
+        "counts": counts,
+        "changes": [change.to_dict() for change in changes],
+    }
+    return json.dumps(report, indent=2)
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def _load_scenarios(path: str) -> List[Dict]:
+    from scenario_catalog import expand_catalog, load_catalog
+    data = load_catalog(path)
+    return expand_catalog(data).get("scenarios", []) if isinstance(data, dict) else data
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Structural diff between two scenario files.")
+    ap.add_argument("old", help="Old scenarios.json (or scenario list)")
+    ap.add_argument("new", help="New scenarios.json (or scenario list)")
+    ap.add_argument("--json", help="Write the JSON change report to this path")
+    ap.add_argument("--color", action="store_true", help="Color the text report")
+    args = ap.parse_args()
+
+    old, new = _load_scenarios(args.old), _load_scenarios(args.new)
+    changes = diff_catalogs(old, new)
+    names = {s.get("id"): s.get("name", "") for s in new}
+    names.update({s.get("id"): s.get("name", "") for s in old if s.get("id") not in names})
+    print(render_text(changes, names, color=args.color), end="")
+    if args.json:
+        Path(args.json).write_text(render_json(changes), encoding="utf-8")
+        print(f"Wrote {len(changes)} change records → {Path(args.json).resolve()}")
+
+
+if __name__ == "__main__":
+    main()
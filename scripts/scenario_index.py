@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+scenario_index.py
+-----------------
+Build a precomputed lookup index from scenarios.json so a row's scenario is
+found with one bitmask lookup instead of a scan over every scenario.
+
+For every (REASON_CODE, PROCESS_LEVEL) key the candidates are ordered the way
+ScenarioConfiguration.GetScenariosForReasonCode orders them (skip scenarios
+first, then the regular scenarios, by id).  The conditions those candidates
+use are given bit positions, and a decision table maps every combination of
+condition results to the first scenario that would match (-1 = none).  Keys
+with the same candidate list share one table.
+
+The index is saved as a compressed .npz next to scenarios.json (in
+.esl_cache/) together with a hash of its source, and load_index() rebuilds it
+whenever scenarios.json has changed.
+
+Usage
+-----
+$ python scenario_index.py                      # build/refresh the default index
+$ python scenario_index.py -c ../ESLFeeder/Config/scenarios.json --show
+"""
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+from evaluate_scenarios import (
+    CONDITIONS,
+    DEFAULT_CONFIG,
+    candidate_scenarios,
+    load_config,
+    normalize_scenarios,
+)
+
+
+# ----- Configuration ---------------------------------------------------------
+
+INDEX_VERSION = 2
+
+CACHE_DIR_NAME = ".esl_cache"
+
+# Keys whose candidates use more conditions than this keep their rules as
+# bitmask arrays and resolve each distinct row combination once instead.
+MAX_TABLE_BITS = 22
+
+NO_MATCH = -1
+
+# Scenario ids in the rule arrays and decision tables
+ID_DTYPE = np.int32
+
+
+# ----- Building --------------------------------------------------------------
+
+def source_hash(config_path, known_conditions=None, data=None):
+    """
+    Hash of scenarios.json (or of its bytes ``data``, already read) plus the
+    condition registry the index was built against.
+    """
+    known = sorted(CONDITIONS if known_conditions is None else known_conditions)
+    digest = hashlib.sha256()
+    digest.update(f"v{INDEX_VERSION}\0".encode())
+    digest.update(",".join(known).encode() + b"\0")
+    digest.update(Path(config_path).read_bytes() if data is None else data)
+    return digest.hexdigest()
+
+
+def _rule_masks(candidates, bits):
+    """(required, forbidden, id) arrays; unknown condition names are ignored as in the C# registry."""
+    position = {name: i for i, name in enumerate(bits)}
+    required = np.zeros(len(candidates), dtype=np.uint64)
+    forbidden = np.zeros(len(candidates), dtype=np.uint64)
+    for i, scenario in enumerate(candidates):
+        for name in scenario["required"]:
+            if name in position:
+                required[i] |= np.uint64(1 << position[name])
+        for name in scenario["forbidden"]:
+            if name in position:
+                forbidden[i] |= np.uint64(1 << position[name])
+    ids = np.array([s["id"] for s in candidates], dtype=ID_DTYPE)
+    return required, forbidden, ids
+
+
+def resolve_codes(codes, required, forbidden, ids):
+    """First matching scenario id for each condition bitmask in ``codes``."""
+    codes = np.asarray(codes, dtype=np.uint64)
+    result = np.full(len(codes), NO_MATCH, dtype=ID_DTYPE)
+    open_ = np.ones(len(codes), dtype=bool)
+    for req, forb, sid in zip(required, forbidden, ids):
+        hit = open_ & ((codes & req) == req) & ((codes & forb) == 0)
+        result[hit] = sid
+        open_ &= ~hit
+        if not open_.any():
+            break
+    return result
+
+
+def build_index(config, known_conditions=None, max_table_bits=MAX_TABLE_BITS):
+    """
+    Build the index structure from a loaded scenarios.json.
+
+    Returns {"keys": {(reason, level): group}, "groups": [...]} where each group
+    holds its condition bit order, the rule masks and (when small enough) the
+    dense decision table.
+    """
+    known = set(CONDITIONS if known_conditions is None else known_conditions)
+    scenarios = normalize_scenarios(config)
+    metadata = config.get("metadata") or {}
+
+    reasons = {s["reason_code"] for s in scenarios if not s["is_skip_scenario"]}
+    reasons |= {str(r).strip().upper() for r in metadata.get("valid_reason_codes") or []}
+    levels = {lvl for s in scenarios for lvl in s["process_levels"]}
+    levels |= {int(lvl) for lvl in metadata.get("valid_process_levels") or []}
+
+    keys, groups, group_of = {}, [], {}
+    for reason in sorted(r for r in reasons if r):
+        for level in sorted(lvl for lvl in levels if lvl):
+            candidates = candidate_scenarios(scenarios, reason, level)
+            signature = tuple(s["id"] for s in candidates)
+            if signature not in group_of:
+                group_of[signature] = len(groups)
+                groups.append(_build_group(candidates, known, max_table_bits))
+            keys[(reason, level)] = group_of[signature]
+
+    # Any other key only sees the skip scenarios
+    skip_only = [s for s in scenarios if s["is_skip_scenario"]]
+    signature = tuple(s["id"] for s in skip_only)
+    if signature not in group_of:
+        group_of[signature] = len(groups)
+        groups.append(_build_group(skip_only, known, max_table_bits))
+    return {"keys": keys, "groups": groups, "default_group": group_of[signature]}
+
+
+def _build_group(candidates, known, max_table_bits):
+    bits = sorted({n for s in candidates for n in s["required"] + s["forbidden"] if n in known},
+                  key=lambda n: (len(n), n))
+    required, forbidden, ids = _rule_masks(candidates, bits)
+    table = None
+    if len(bits) <= max_table_bits:
+        table = resolve_codes(np.arange(1 << len(bits), dtype=np.uint64), required, forbidden, ids)
+    return {"bits": bits, "required": required, "forbidden": forbidden, "ids": ids, "table": table}
+
+
+# ----- Persistence -----------------------------------------------------------
+
+def default_index_path(config_path):
+    config_path = Path(config_path)
+    return config_path.resolve().parent / CACHE_DIR_NAME / f"{config_path.stem}_index.npz"
+
+
+def save_index(index, path, digest):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {
+        "version": INDEX_VERSION,
+        "source_hash": digest,
+        "keys": [[reason, level, group] for (reason, level), group in sorted(index["keys"].items())],
+        "default_group": index["default_group"],
+        "groups": [{"bits": g["bits"], "has_table": g["table"] is not None} for g in index["groups"]],
+    }
+    arrays = {"meta": np.array(json.dumps(meta))}
+    for i, group in enumerate(index["groups"]):
+        arrays[f"required_{i}"] = group["required"]
+        arrays[f"forbidden_{i}"] = group["forbidden"]
+        arrays[f"ids_{i}"] = group["ids"]
+        if group["table"] is not None:
+            arrays[f"table_{i}"] = group["table"]
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    tmp_path.replace(path)
+
+
+def read_index(path):
+    """Read a saved index; returns (index, source_hash)."""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {meta.get('version')}")
+        groups = []
+        for i, info in enumerate(meta["groups"]):
+            groups.append({
+                "bits": info["bits"],
+                "required": data[f"required_{i}"],
+                "forbidden": data[f"forbidden_{i}"],
+                "ids": data[f"ids_{i}"],
+                "table": data[f"table_{i}"] if info["has_table"] else None,
+            })
+    keys = {(reason, int(level)): group for reason, level, group in meta["keys"]}
+    index = {"keys": keys, "groups": groups, "default_group": meta["default_group"]}
+    return index, meta["source_hash"]
+
+
+def load_index(config_path=DEFAULT_CONFIG, index_path=None, known_conditions=None, rebuild=False):
+    """
+    Load the index for scenarios.json, rebuilding it if missing or out of date.
+    An up-to-date scenario bundle (scenario_bundle.py) is used when it was
+    built against the same conditions and no index_path is given.
+    """
+    if index_path is None and not rebuild:
+        from scenario_bundle import bundled_index
+        index = bundled_index(config_path, known_conditions)
+        if index is not None:
+            return ScenarioIndex(index)
+    index_path = Path(index_path) if index_path else default_index_path(config_path)
+    digest = source_hash(config_path, known_conditions)
+    return _cached_index(index_path, digest, lambda: load_config(config_path), known_conditions, rebuild)
+
+
+def snapshot_index(config, data, config_path, known_conditions=None):
+    """
+    load_index for a config that was already read: ``data`` are the
+    scenarios.json bytes ``config`` was parsed from, and the cached index is
+    checked against them instead of reading the file again.
+    """
+    digest = source_hash(config_path, known_conditions, data)
+    return _cached_index(default_index_path(config_path), digest, lambda: config, known_conditions)
+
+
+def _cached_index(index_path, digest, config, known_conditions, rebuild=False):
+    """The index saved at ``index_path`` when it matches ``digest``, else built from ``config()`` and saved."""
+    if index_path.exists() and not rebuild:
+        try:
+            index, stored = read_index(index_path)
+            if stored == digest:
+                return ScenarioIndex(index)
+        except (OSError, ValueError, KeyError):
+            pass
+    index = build_index(config(), known_conditions)
+    save_index(index, index_path, digest)
+    return ScenarioIndex(index)
+
+
+# ----- Lookup ----------------------------------------------------------------
+
+class ScenarioIndex:
+    """Bitmask lookup of the first matching scenario per row."""
+
+    def __init__(self, index):
+        self.keys = index["keys"]
+        self.groups = index["groups"]
+        self.default_group = index["default_group"]
+
+    def group_for(self, reason_code, process_level):
+        return self.keys.get((reason_code, process_level), self.default_group)
+
+    def lookup(self, group, condition_results, rows):
+        """Scenario ids for ``rows`` (indices) using the group's decision table."""
+        info = self.groups[group]
+        codes = np.zeros(len(rows), dtype=np.uint64)
+        for bit, name in enumerate(info["bits"]):
+            values = condition_results.get(name)
+            if values is not None:
+                codes |= values[rows].astype(np.uint64) << np.uint64(bit)
+        if info["table"] is not None:
+            return info["table"][codes.astype(np.int64)]
+        unique, inverse = np.unique(codes, return_inverse=True)
+        return resolve_codes(unique, info["required"], info["forbidden"], info["ids"])[inverse]
+
+    def match(self, table, eligible, condition_results):
+        """Drop-in replacement for evaluate_scenarios.match_scenarios."""
+        matched = np.full(len(table), NO_MATCH, dtype=np.int64)
+        reasons = np.array([r.strip().upper() for r in table.text("REASON_CODE")], dtype=object)
+        levels = table.numbers("PROCESS_LEVEL")
+        ok = eligible & ~np.isnan(levels) & (levels == np.floor(levels)) & (reasons != "")
+        if not ok.any():
+            return matched
+        rows = np.flatnonzero(ok)
+        key_codes, key_inverse = np.unique(
+            np.char.add(reasons[rows].astype(str), np.char.add("|", levels[rows].astype(np.int64).astype(str))),
+            return_inverse=True)
+        for k, key in enumerate(key_codes):
+            reason, level = key.rsplit("|", 1)
+            if int(level) == 0:
+                continue
+            group_rows = rows[key_inverse == k]
+            matched[group_rows] = self.lookup(self.group_for(reason, int(level)), condition_results, group_rows)
+        return matched
+
+    def condition_names(self):
+        return sorted({n for g in self.groups for n in g["bits"]})
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Build the (reason code, process level) scenario index.")
+    ap.add_argument("-c", "--config", default=str(DEFAULT_CONFIG), help="Path to scenarios.json")
+    ap.add_argument("-o", "--output", help="Index path (default: .esl_cache/<config>_index.npz next to the config)")
+    ap.add_argument("--rebuild", action="store_true", help="Rebuild even if the index is up to date")
+    ap.add_argument("--show", action="store_true", help="Print the keys and their condition bits")
+    args = ap.parse_args()
+
+    index = load_index(args.config, args.output, rebuild=args.rebuild)
+    out_path = Path(args.output) if args.output else default_index_path(args.config)
+
+    if args.show:
+        for (reason, level), group in sorted(index.keys.items()):
+            info = index.groups[group]
+            kind = f"table[{len(info['table'])}]" if info["table"] is not None else "rules"
+            print(f"{reason:<22} {level:>4}  group {group}  {len(info['ids'])} scenarios  "
+                  f"{len(info['bits'])} bits  {kind}")
+    print(f"Index: {len(index.keys)} keys, {len(index.groups)} decision tables → {out_path.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+scenario_profile.py
+-------------------
+Profiling of scoring runs: where the time goes and how selective each
+condition and scenario is.
+
+A RunProfile passed to evaluate_scenarios.score_table (``--profile`` on
+evaluate_scenarios.py and stream_scenarios.py) records:
+
+- the time of each pipeline stage (clean, validate, variables, conditions,
+  match, output);
+- per condition (C6..C28): calls, rows evaluated, rows true / false,
+  cumulative time, and calls that failed (missing column -> all False);
+- per scenario: rows it was tested against, rows it matched, cumulative
+  time of its mask tests;
+- per (REASON_CODE, PROCESS_LEVEL) group: the first-match search time and
+  rows.
+
+The profile is saved as JSON, plus a collapsed-stack file (<name>.folded,
+one "score;stage;frame microseconds" line per frame) that flamegraph.pl,
+speedscope or inferno render directly.  Several runs (e.g. the chunks of a
+streamed file) accumulate into the same profile.  This script prints the
+report of a saved profile.
+
+Usage
+-----
+$ python evaluate_scenarios.py -i input.csv --profile run_profile.json
+$ python scenario_profile.py run_profile.json
+$ python scenario_profile.py run_profile.json --sort selectivity --top 30
+$ flamegraph.pl run_profile.folded > run_profile.svg
+"""
+
+import argparse
+import json
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+
+# ----- Configuration ---------------------------------------------------------
+
+PROFILE_VERSION = 1
+
+FOLDED_SUFFIX = ".folded"
+
+# Root frame of the collapsed stacks
+ROOT_FRAME = "score"
+
+
+# ----- Profile ---------------------------------------------------------------
+
+class RunProfile:
+    """Counters and timings collected while scoring; see the module docstring."""
+
+    def __init__(self):
+        self.rows = 0
+        self.runs = 0
+        self.stages = {}
+        self.conditions = {}
+        self.scenarios = {}
+        self.groups = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def run(self, rows):
+        self.runs += 1
+        self.rows += rows
+
+    def condition(self, name, values, seconds, failed=False):
+        entry = self.conditions.setdefault(name, {"calls": 0, "rows": 0, "true": 0, "failed": 0, "seconds": 0.0})
+        entry["calls"] += 1
+        entry["rows"] += len(values)
+        entry["true"] += int(np.count_nonzero(values))
+        entry["failed"] += int(failed)
+        entry["seconds"] += seconds
+
+    def scenario(self, scenario, group, tested, matched, seconds):
+        entry = self.scenarios.setdefault(scenario["id"], {
+            "name": scenario["name"], "reason_code": scenario["reason_code"], "skip": scenario["is_skip_scenario"],
+            "groups": {}, "tested": 0, "matched": 0, "seconds": 0.0})
+        entry["tested"] += tested
+        entry["matched"] += matched
+        entry["seconds"] += seconds
+        entry["groups"][group] = entry["groups"].get(group, 0.0) + seconds
+
+    def search(self, group, rows, matched, tried, seconds):
+        entry = self.groups.setdefault(group, {"rows": 0, "matched": 0, "scenarios_tried": 0, "seconds": 0.0})
+        entry["rows"] += rows
+        entry["matched"] += matched
+        entry["scenarios_tried"] += tried
+        entry["seconds"] += seconds
+
+    # ----- export -----
+
+    def to_dict(self):
+        conditions = {
+            name: dict(entry, false=entry["rows"] - entry["true"],
+                       true_rate=entry["true"] / entry["rows"] if entry["rows"] else 0.0)
+            for name, entry in sorted(self.conditions.items(), key=lambda item: _condition_order(item[0]))
+        }
+        scenarios = {
+            str(sid): dict(entry, match_rate=entry["matched"] / entry["tested"] if entry["tested"] else 0.0)
+            for sid, entry in sorted(self.scenarios.items())
+        }
+        return {
+            "version": PROFILE_VERSION,
+            "runs": self.runs,
+            "rows": self.rows,
+            "stages": self.stages,
+            "first_match_seconds": sum(entry["seconds"] for entry in self.groups.values()),
+            "conditions": conditions,
+            "scenarios": scenarios,
+            "groups": dict(sorted(self.groups.items())),
+        }
+
+    def collapsed_stacks(self):
+        """Flame-graph lines ("frame;frame;... microseconds"); each frame's self time is its own line."""
+        lines = []
+
+        def emit(frames, seconds):
+            micros = int(round(seconds * 1e6))
+            if micros > 0:
+                lines.append(";".join(_frame(f) for f in frames) + f" {micros}")
+
+        condition_seconds = sum(e["seconds"] for e in self.conditions.values())
+        # A lazy matcher (--selective) evaluates its conditions inside the match stage
+        lazy = max(0.0, condition_seconds - self.stages.get("conditions", 0.0))
+        children = {
+            "conditions": condition_seconds - lazy,
+            "match": sum(e["seconds"] for e in self.groups.values()) + lazy,
+        }
+        for stage, seconds in self.stages.items():
+            emit([ROOT_FRAME, stage], seconds - children.get(stage, 0.0))
+        for name, entry in self.conditions.items():
+            emit([ROOT_FRAME, "conditions", name], entry["seconds"])
+        for group, entry in self.groups.items():
+            own = sum(s["groups"].get(group, 0.0) for s in self.scenarios.values())
+            emit([ROOT_FRAME, "match", group], entry["seconds"] - own)
+        for sid, entry in self.scenarios.items():
+            for group, seconds in entry["groups"].items():
+                emit([ROOT_FRAME, "match", group, f"scenario {sid}"], seconds)
+        return lines
+
+    def save(self, path):
+        """Write the JSON profile to ``path`` and the collapsed stacks next to it; returns both paths."""
+        path = Path(path)
+        folded = path.with_suffix(FOLDED_SUFFIX)
+        if folded == path:
+            # profile.folded: keep the JSON and write profile.folded.folded
+            folded = path.with_name(path.name + FOLDED_SUFFIX)
+        path.write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+        folded.write_text("\n".join(self.collapsed_stacks()) + "\n", encoding="utf-8")
+        return path, folded
+
+
+def _condition_order(name):
+    """C6 < C7 < ... < C28, other names after them."""
+    digits = name[1:]
+    return (0, int(digits), name) if name[:1] == "C" and digits.isdigit() else (1, 0, name)
+
+
+def _frame(name):
+    # ';' separates frames and the last space separates the count
+    return str(name).replace(";", ",").replace(" ", "_") if name != ROOT_FRAME else name
+
+
+# ----- Report ----------------------------------------------------------------
+
+SORT_KEYS = {
+    "time": lambda entry: -entry["seconds"],
+    "selectivity": lambda entry: entry.get("true_rate", entry.get("match_rate", 0.0)),
+    "calls": lambda entry: -entry.get("rows", entry.get("tested", 0)),
+}
+
+
+def report(profile, sort="time", top=20):
+    """Text report of a profile dictionary (RunProfile.to_dict or a saved JSON)."""
+    lines = [f"{profile['rows']:,} rows in {profile['runs']} run(s)", "", "Stages"]
+    total = sum(profile["stages"].values())
+    for stage, seconds in profile["stages"].items():
+        lines.append(f"  {stage:<12} {seconds:9.3f} s  {seconds / total if total else 0:6.1%}")
+    lines.append(f"  (first-match search over {len(profile['groups'])} groups: {profile['first_match_seconds']:.3f} s)")
+
+    key = SORT_KEYS[sort]
+    lines += ["", f"Conditions (by {sort})",
+              f"  {'name':<8} {'rows':>12} {'true':>8} {'failed':>7} {'seconds':>9} {'us/krow':>9}"]
+    for name, entry in sorted(profile["conditions"].items(), key=lambda item: key(item[1]))[:top]:
+        per_k = entry["seconds"] / entry["rows"] * 1e9 if entry["rows"] else 0.0
+        lines.append(f"  {name:<8} {entry['rows']:>12,} {entry['true_rate']:>8.1%} {entry['failed']:>7} "
+                     f"{entry['seconds']:>9.4f} {per_k:>9.1f}")
+
+    lines += ["", f"Scenarios (by {sort})",
+              f"  {'id':>4} {'tested':>12} {'matched':>10} {'rate':>7} {'seconds':>9}  name"]
+    for sid, entry in sorted(profile["scenarios"].items(), key=lambda item: key(item[1]))[:top]:
+        lines.append(f"  {sid:>4} {entry['tested']:>12,} {entry['matched']:>10,} {entry['match_rate']:>7.1%} "
+                     f"{entry['seconds']:>9.4f}  {entry['name']}")
+    return "\n".join(lines)
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Report a scoring profile saved with --profile.")
+    ap.add_argument("profile", help="Profile JSON written by evaluate_scenarios.py / stream_scenarios.py --profile")
+    ap.add_argument("--sort", choices=sorted(SORT_KEYS), default="time",
+                    help="Order of conditions and scenarios (default: time)")
+    ap.add_argument("--top", type=int, default=20, help="Conditions and scenarios to list (default: 20)")
+    args = ap.parse_args()
+
+    try:
+        profile = json.loads(Path(args.profile).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        print(f"Error: cannot read {args.profile}: {exc}")
+        sys.exit(1)
+    print(report(profile, args.sort, args.top))
+
+
+if __name__ == "__main__":
+    main()
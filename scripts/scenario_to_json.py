@@ -8,12 +8,20 @@ into a structured JSON file – one object per scenario column.
 Usage
 -----
 $ python scenario_to_json.py -i ESL_Scenario.xlsx -o scenarios.json
+$ python scenario_to_json.py -i ESL_Scenario.csv -o scenarios.json      # CSV / Parquet export
+
+# Batch: every workbook in a directory (or matching a glob), merged into one list
+$ python scenario_to_json.py -i workbooks/ -o scenarios.json
+$ python scenario_to_json.py -i "matrices/ESL Scenario_2025-*.xlsx" -o scenarios.json -j 8
 """
 
 import argparse
+import glob
 import json
 import math
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import numpy as np
@@ -73,73 +81,192 @@ def split_process_levels(raw):
     return result
 
 
+# ----- Reading ---------------------------------------------------------------
+
+# Strings pandas.read_excel treats as missing by default
+NA_STRINGS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+HEADER_ROWS = 5          # id, name, description, PROCESS_LEVEL, REASON_CODE
+_COND_RE = re.compile(r"^C\d+")
+
+
+def _needed_row(idx, row):
+    """Header rows, condition rows (column 0 = "C…") and field rows (column 1 label)."""
+    if idx < HEADER_ROWS:
+        return True
+    first = row[0] if len(row) > 0 else None
+    second = row[1] if len(row) > 1 else None
+    return ((isinstance(first, str) and _COND_RE.match(first) is not None)
+            or (isinstance(second, str) and second.strip() in FIELDS_MAP))
+
+
+def _excel_cell(val):
+    """Cell value as pandas.read_excel would return it."""
+    if isinstance(val, str) and val in NA_STRINGS:
+        return None
+    if isinstance(val, float) and val.is_integer():
+        return int(val)
+    return val
+
+
+def _text_cell(val):
+    """Typed value for a cell read from a CSV/Parquet export (text "TRUE" → True, "24" → 24)."""
+    if not isinstance(val, str):
+        return val
+    if val in NA_STRINGS:
+        return None
+    low = val.strip().lower()
+    if low in ("true", "false"):
+        return low == "true"
+    try:
+        return int(val)
+    except ValueError:
+        pass
+    try:
+        return float(val)
+    except ValueError:
+        return val
+
+
+def read_excel_rows(path, sheet=0):
+    """
+    Read only the rows extract_scenarios needs from a workbook, streaming the
+    sheet with openpyxl in read-only mode.  Returns a DataFrame indexed by the
+    original sheet row numbers.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet] if isinstance(sheet, int) else wb[sheet]
+        index, rows = [], []
+        for idx, row in enumerate(ws.iter_rows(values_only=True)):
+            if _needed_row(idx, row):
+                index.append(idx)
+                rows.append([_excel_cell(v) for v in row])
+    finally:
+        wb.close()
+    return _frame(rows, index)
+
+
+def read_text_rows(path):
+    """Read a CSV or Parquet export of the matrix (no header row) and keep the needed rows."""
+    path = Path(path)
+    if path.suffix.lower() in (".parquet", ".pq"):
+        # Column names of the export are positional; row 0 is still the ID row
+        raw = pd.read_parquet(path)
+        rows = raw.astype(object).where(raw.notna(), None).values.tolist()
+    else:
+        raw = pd.read_csv(path, header=None, dtype=str, keep_default_na=False)
+        rows = raw.values.tolist()
+
+    index, kept = [], []
+    for idx, row in enumerate(rows):
+        # Name/description rows stay text; everything else gets typed values
+        row = [v if idx in (1, 2) else _text_cell(v) for v in row]
+        row = [None if (isinstance(v, str) and v in NA_STRINGS) else v for v in row]
+        if _needed_row(idx, row):
+            index.append(idx)
+            kept.append(row)
+    return _frame(kept, index)
+
+
+def _frame(rows, index):
+    width = max((len(r) for r in rows), default=0)
+    rows = [list(r) + [None] * (width - len(r)) for r in rows]
+    return pd.DataFrame(rows, index=index, dtype=object)
+
+
+def read_matrix(path, sheet=0):
+    """Load the scenario matrix from .xlsx/.xlsm, .csv or .parquet."""
+    suffix = Path(path).suffix.lower()
+    if suffix in (".csv", ".txt", ".parquet", ".pq"):
+        return read_text_rows(path)
+    return read_excel_rows(path, sheet)
+
+
 # ----- Core extraction -------------------------------------------------------
 
-def extract_scenarios(df):
-    """Return a list of scenario dictionaries from the dataframe."""
-    scenarios = []
+def _is_number(values):
+    """Mask of cells holding a real (non-NaN) number; bools count, as in Python."""
+    kinds = np.array([isinstance(v, (int, float, np.integer, np.floating)) for v in values], dtype=bool)
+    numbers = pd.to_numeric(pd.Series(np.where(kinds, values, np.nan)), errors="coerce").to_numpy(dtype=float)
+    return kinds & ~np.isnan(numbers), numbers
+
+
+def condition_states(cells):
+    """
+    Tri-state matrix for condition cells: 1 = required, 0 = forbidden, -1 = ignored.
+
+    True/False, numbers (0 is False) and the strings "true"/"false" count;
+    blanks and any other text are ignored.
+    """
+    flat = cells.ravel()
+    states = np.full(flat.shape, -1, dtype=np.int8)
+    numeric, numbers = _is_number(flat)
+    states[numeric] = (numbers[numeric] != 0).astype(np.int8)
 
-    # Identify rows that hold condition IDs (column 0 values look like "C6", "C21", …)
-    cond_rows = [idx for idx, val in enumerate(df.iloc[:, 0])
-                 if isinstance(val, str) and re.match(r"^C\d+", val)]
+    is_text = np.array([isinstance(v, str) for v in flat], dtype=bool)
+    if is_text.any():
+        low = pd.Series(flat[is_text], dtype=object).str.strip().str.lower().to_numpy()
+        text_states = np.where(low == "true", 1, np.where(low == "false", 0, -1))
+        states[is_text] = text_states
+    return states.reshape(cells.shape)
 
-    # Map "field label row → DataFrame row index"
-    field_row_idx = {label: idx for idx, label in enumerate(df.iloc[:, 1])
+
+def extract_scenarios(df):
+    """
+    Return a list of scenario dictionaries from the dataframe.
+
+    The frame is the sheet without header handling (pd.read_excel(header=None)
+    or read_matrix); its index holds the sheet row numbers.  All scenario
+    columns are processed at once: the condition block becomes a tri-state
+    matrix and the required/forbidden lists are read off its masks.
+    """
+    values = df.to_numpy(dtype=object)
+    rows = list(df.index)
+    pos = {r: i for i, r in enumerate(rows)}
+
+    # Scenario columns: row 0 holds a numeric ID
+    id_row = values[pos[0]]
+    is_scenario, ids = _is_number(id_row)
+    cols = np.flatnonzero(is_scenario)
+    if not len(cols):
+        return []
+
+    # Condition rows (column 0 = "C6", "C21", …) and field rows (column 1 label)
+    first, second = values[:, 0], values[:, 1]
+    cond_idx = [i for i, v in enumerate(first) if isinstance(v, str) and _COND_RE.match(v)]
+    cond_ids = [first[i].strip() for i in cond_idx]
+    field_row_idx = {label: i for i, label in enumerate(second)
                      if isinstance(label, str) and label.strip() in FIELDS_MAP}
 
-    # Iterate over every numeric "scenario" column (row 0 holds the ID)
-    for col in range(df.shape[1]):
-        scenario_id = df.iat[0, col]
-        if not isinstance(scenario_id, (int, float)) or math.isnan(scenario_id):
-            continue  # skip non-scenario columns
-        scenario_id = int(scenario_id)
-
-        # --- header data ---
-        name         = df.iat[1, col]
-        description  = df.iat[2, col]
-        proc_levels  = split_process_levels(df.iat[3, col])
-        reason_code  = df.iat[4, col]
-
-        # --- conditions ---
-        required, forbidden = [], []
-        for r in cond_rows:
-            cond_id  = df.iat[r, 0].strip()
-            cell_val = df.iat[r, col]
-
-            if isinstance(cell_val, (bool, np.bool_)):
-                (required if cell_val else forbidden).append(cond_id)
-            elif isinstance(cell_val, (int, float)) and not math.isnan(cell_val):
-                # treat 0 as FALSE, anything else as TRUE
-                (required if cell_val else forbidden).append(cond_id)
-            elif isinstance(cell_val, str):
-                val_norm = cell_val.strip().lower()
-                if val_norm == "true":
-                    required.append(cond_id)
-                elif val_norm == "false":
-                    forbidden.append(cond_id)
-            # blanks are ignored
-
-        # --- fields ---
-        fields_out = {}
-        for sheet_label, json_key in FIELDS_MAP.items():
-            row_idx = field_row_idx.get(sheet_label)
-            if row_idx is None:
-                continue  # safety
-            val = normalize_field_value(df.iat[row_idx, col])
-            fields_out[json_key] = val
+    states = condition_states(values[np.ix_(cond_idx, cols)]) if cond_idx else np.empty((0, len(cols)))
+    cond_ids = np.array(cond_ids, dtype=object)
+
+    header = {r: values[pos[r], cols] if r in pos else np.full(len(cols), np.nan, dtype=object)
+              for r in range(1, HEADER_ROWS)}
+    field_cells = {json_key: values[field_row_idx[label], cols]
+                   for label, json_key in FIELDS_MAP.items() if label in field_row_idx}
 
+    scenarios = []
+    for j, col in enumerate(cols):
+        column_states = states[:, j]
         scenarios.append({
-            "id":            scenario_id,
-            "name":          name,
-            "description":   description,
-            "process_levels": proc_levels,
-            "reason_code":   reason_code,
+            "id":            int(ids[col]),
+            "name":          header[1][j],
+            "description":   header[2][j],
+            "process_levels": split_process_levels(header[3][j]),
+            "reason_code":   header[4][j],
             "is_skip_scenario": False,
             "conditions": {
-                "forbidden": forbidden,
-                "required":  required,
+                "forbidden": cond_ids[column_states == 0].tolist(),
+                "required":  cond_ids[column_states == 1].tolist(),
             },
-            "fields": fields_out,
+            "fields": {key: normalize_field_value(cells[j]) for key, cells in field_cells.items()},
         })
 
     # Keep scenarios sorted by ID (optional)
@@ -147,20 +274,92 @@ def extract_scenarios(df):
     return scenarios
 
 
+# ----- Batch conversion ------------------------------------------------------
+
+# Directories are searched for workbooks only; name CSV/Parquet exports with a glob
+WORKBOOK_SUFFIXES = (".xlsx", ".xlsm")
+
+
+class ScenarioConflictError(ValueError):
+    """The same scenario ID appears with different content in two inputs."""
+
+
+def resolve_inputs(pattern):
+    """A file, a directory (all workbooks in it) or a glob pattern → sorted file list."""
+    path = Path(pattern)
+    if path.is_dir():
+        candidates = [p for p in path.iterdir() if p.suffix.lower() in WORKBOOK_SUFFIXES]
+    elif path.is_file():
+        return [path]
+    else:
+        candidates = [Path(p) for p in glob.glob(pattern)]
+    # Excel keeps "~$name.xlsx" lock files next to open workbooks
+    return sorted(p for p in candidates if p.is_file() and not p.name.startswith("~$"))
+
+
+def convert_file(path, sheet=0):
+    """Worker: parse one matrix file; returns (path, scenarios)."""
+    return str(path), extract_scenarios(read_matrix(path, sheet))
+
+
+def merge_scenarios(results):
+    """
+    Merge per-file scenario lists into one list sorted by ID.
+
+    An ID found in several files must have identical content there;
+    otherwise ScenarioConflictError lists every conflict.
+    """
+    merged, origin, conflicts = {}, {}, []
+    for path, scenarios in results:
+        for scenario in scenarios:
+            sid = scenario["id"]
+            if sid not in merged:
+                merged[sid], origin[sid] = scenario, path
+            elif merged[sid] != scenario:
+                conflicts.append(f"ID {sid}: {origin[sid]} vs {path}")
+    if conflicts:
+        raise ScenarioConflictError("Conflicting scenario IDs:\n  " + "\n  ".join(conflicts))
+    return [merged[sid] for sid in sorted(merged)]
+
+
+def convert_batch(paths, sheet=0, jobs=None):
+    """Parse the files in a process pool (one worker per core by default) and merge them."""
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) == 1:
+        results = [convert_file(p, sheet) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+            results = list(pool.map(convert_file, paths, [sheet] * len(paths)))
+    return merge_scenarios(results)
+
+
 # ----- CLI -------------------------------------------------------------------
 
 def main():
     ap = argparse.ArgumentParser(description="Convert ESL scenario matrix → JSON.")
-    ap.add_argument("-i", "--input",  required=True, help="Path to XLSX file")
+    ap.add_argument("-i", "--input",  required=True,
+                    help="XLSX file (or CSV/Parquet export), or a directory / glob of them for batch mode")
     ap.add_argument("-o", "--output", required=True, help="Path to write JSON")
     ap.add_argument("-s", "--sheet",  default=0,
                     help='Sheet name or index (default: first sheet)')
+    ap.add_argument("-j", "--jobs", type=int, default=None,
+                    help="Worker processes for batch mode (default: one per core)")
     args = ap.parse_args()
 
-    # Load the sheet exactly as it appears – no header rows from pandas
-    df = pd.read_excel(args.input, sheet_name=args.sheet, header=None)
-
-    scenarios = extract_scenarios(df)
+    if Path(args.input).is_file():
+        # Load only the header, condition and field rows of the sheet
+        df = read_matrix(args.input, args.sheet)
+        scenarios = extract_scenarios(df)
+    else:
+        paths = resolve_inputs(args.input)
+        if not paths:
+            ap.error(f"No scenario matrix files found for {args.input}")
+        try:
+            scenarios = convert_batch(paths, args.sheet, args.jobs)
+        except ScenarioConflictError as exc:
+            print(f"Error: {exc}")
+            raise SystemExit(1)
+        print(f"Converted {len(paths)} files")
 
     # Pretty-print JSON
     out_path = Path(args.output)
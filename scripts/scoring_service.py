@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+scoring_service.py
+------------------
+Local scoring service: keeps scenarios.json compiled and warm and scores
+single rows or micro-batches over HTTP (TCP or a Unix socket).
+
+A batch run of evaluate_scenarios.py spends most of a one-row call on
+start-up: importing pandas, parsing scenarios.json, compiling the update
+fields, the condition formulas and the (reason code, process level) index.
+The service does that once.  When scenarios.json (or the --conditions-csv
+file) changes on disk, the new config is compiled in the background and
+swapped in as a whole; requests already running finish with the config they
+started with, and a config that fails to load leaves the current one in
+place.
+
+Endpoints
+---------
+POST /score    {"row": {...}} or {"rows": [{...}, ...]} -> {"config": ..., "rows": [...]};
+               a text/csv body is answered with the processed CSV
+GET  /status   config digest, load time, scenario count, requests served
+POST /reload   compile and swap in the config now
+
+Usage
+-----
+$ python scoring_service.py --port 8765
+$ python scoring_service.py --socket /tmp/esl_scoring.sock --conditions-csv ../ConditionsCsv.csv
+$ curl -s localhost:8765/score -d '{"row": {"CLAIM_ID": "1", "REASON_CODE": "BONDING", ...}}'
+$ curl -s localhost:8765/score -H "Content-Type: text/csv" --data-binary @one_claim.csv
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+
+from evaluate_scenarios import (CONDITIONS, DEFAULT_CONFIG, ColumnTable, clean_frame, normalize_scenarios,
+                                score_table)
+
+
+# ----- Configuration ---------------------------------------------------------
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Seconds between checks of scenarios.json for changes
+DEFAULT_POLL = 2.0
+
+# Rows accepted per request
+DEFAULT_MAX_ROWS = 10_000
+
+# Request body size accepted, checked against Content-Length before the body is read
+DEFAULT_MAX_BODY_MB = 32
+
+MAX_HEADER_BYTES = 64 * 1024
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# ----- Compiled config -------------------------------------------------------
+
+class CompiledConfig(NamedTuple):
+    """Everything scoring needs, built once per version of the config files."""
+    config: dict
+    digest: str
+    fingerprint: tuple
+    conditions: dict
+    index: object
+    scenarios: int
+    loaded_at: datetime
+
+
+def file_fingerprint(paths):
+    """(size, mtime) of each path, to notice changes without reading the files."""
+    fingerprint = []
+    for path in paths:
+        stat = Path(path).stat()
+        fingerprint.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+def compile_config(config_path, conditions_csv=None):
+    """
+    Parse and compile the config: scenarios, update field code, condition
+    formulas and the scenario index, then score one row so every code path
+    is warm.  scenarios.json is read once; the digest, the config and the
+    index (or the check of its cached copy) all come from that snapshot, so
+    a file replaced mid-compile cannot mix two versions.
+    """
+    from field_expressions import compile_scenario
+    from row_store import SCHEMA
+    from scenario_catalog import loads_catalog
+    from scenario_index import snapshot_index
+
+    paths = [config_path] + ([conditions_csv] if conditions_csv else [])
+    fingerprint = file_fingerprint(paths)
+    config_bytes = Path(config_path).read_bytes()
+    digest = hashlib.sha256(config_bytes)
+    if conditions_csv:
+        digest.update(Path(conditions_csv).read_bytes())
+    config = loads_catalog(config_bytes.decode("utf-8"))
+
+    conditions = CONDITIONS
+    if conditions_csv:
+        from compile_conditions import load_conditions
+        conditions = dict(CONDITIONS, **load_conditions(conditions_csv))
+    scenarios = normalize_scenarios(config)
+    for scenario in scenarios:
+        compile_scenario(scenario)
+    index = snapshot_index(config, config_bytes, config_path, known_conditions=conditions)
+
+    compiled = CompiledConfig(config, digest.hexdigest(), fingerprint, conditions, index, len(scenarios),
+                              datetime.now())
+    score_rows(compiled, pd.DataFrame({column: [""] for column in SCHEMA}))
+    return compiled
+
+
+def score_rows(compiled, frame, now=None):
+    table = ColumnTable(clean_frame(frame))
+    return score_table(table, compiled.config, compiled.conditions, now or datetime.now(), compiled.index)
+
+
+# ----- Service ---------------------------------------------------------------
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ScoringService:
+    """The current CompiledConfig plus the HTTP handlers; see the module docstring."""
+
+    def __init__(self, config_path, conditions_csv=None, max_rows=DEFAULT_MAX_ROWS,
+                 max_body_bytes=DEFAULT_MAX_BODY_MB * 1024 * 1024, log=print):
+        self.config_path = config_path
+        self.conditions_csv = conditions_csv
+        self.max_rows = max_rows
+        self.max_body_bytes = max_body_bytes
+        self.log = log
+        self.current = compile_config(config_path, conditions_csv)
+        self.requests = 0
+        self.rows = 0
+        self.reload_error = None
+        self._failed_fingerprint = None
+        self._reload_lock = asyncio.Lock()
+
+    # ----- hot reload -----
+
+    def _paths(self):
+        return [self.config_path] + ([self.conditions_csv] if self.conditions_csv else [])
+
+    async def reload(self, force=False):
+        """Compile the config files in a worker thread and swap them in; True if the config changed."""
+        async with self._reload_lock:
+            try:
+                fingerprint = file_fingerprint(self._paths())
+            except OSError as exc:  # e.g. the file is being replaced
+                return self._reload_failed(None, exc)
+            if not force and fingerprint in (self.current.fingerprint, self._failed_fingerprint):
+                return False
+            loop = asyncio.get_running_loop()
+            try:
+                compiled = await loop.run_in_executor(None, compile_config, self.config_path, self.conditions_csv)
+            except Exception as exc:  # keep serving the config that works
+                return self._reload_failed(fingerprint, exc)
+            self.reload_error = None
+            self._failed_fingerprint = None
+            if compiled.digest == self.current.digest:
+                self.current = self.current._replace(fingerprint=compiled.fingerprint)
+                return False
+            self.current = compiled
+            self.log(f"Loaded config {compiled.digest[:12]} ({compiled.scenarios} scenarios)")
+            return True
+
+    def _reload_failed(self, fingerprint, exc):
+        # The same files are not retried until they change again
+        self._failed_fingerprint = fingerprint
+        error = f"{type(exc).__name__}: {exc}"
+        if error != self.reload_error:
+            self.log(f"Reload failed, keeping config {self.current.digest[:12]}: {error}")
+        self.reload_error = error
+        return False
+
+    async def watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await self.reload()
+
+    # ----- requests -----
+
+    async def handle(self, method, path, headers, body):
+        """(status, content type, payload bytes) for one request."""
+        route = path.split("?", 1)[0].rstrip("/") or "/"
+        if route == "/status":
+            if method != "GET":
+                raise HttpError(405, "use GET")
+            return _json(200, self.status())
+        if route == "/reload":
+            if method != "POST":
+                raise HttpError(405, "use POST")
+            changed = await self.reload(force=True)
+            return _json(200 if self.reload_error is None else 500,
+                         dict(self.status(), changed=changed, error=self.reload_error))
+        if route == "/score":
+            if method != "POST":
+                raise HttpError(405, "use POST")
+            return await self.score(headers, body)
+        raise HttpError(404, f"unknown path {route}")
+
+    async def score(self, headers, body):
+        compiled = self.current  # the whole request uses one config version
+        is_csv = headers.get("content-type", "").split(";")[0].strip() == "text/csv"
+        frame = _csv_rows(body) if is_csv else _json_rows(body)
+        if len(frame) > self.max_rows:
+            raise HttpError(413, f"{len(frame)} rows; at most {self.max_rows} per request")
+
+        loop = asyncio.get_running_loop()
+        processed = await loop.run_in_executor(None, score_rows, compiled, frame)
+        self.requests += 1
+        self.rows += len(processed)
+        if is_csv:
+            return 200, "text/csv; charset=utf-8", processed.to_csv(index=False, lineterminator="\n").encode("utf-8")
+        return _json(200, {"config": compiled.digest[:12], "rows": processed.to_dict("records")})
+
+    def status(self):
+        compiled = self.current
+        return {
+            "config_path": str(Path(self.config_path).resolve()),
+            "config": compiled.digest[:12],
+            "loaded_at": compiled.loaded_at.isoformat(timespec="seconds"),
+            "scenarios": compiled.scenarios,
+            "conditions_csv": self.conditions_csv,
+            "requests": self.requests,
+            "rows": self.rows,
+            "reload_error": self.reload_error,
+        }
+
+    # ----- HTTP -----
+
+    async def connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection (keep-alive until the client closes)."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await _respond(writer, *_json(400, {"error": "request header too large"}), keep_alive=False)
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, _ = request_line.split(" ", 2)
+                except ValueError:
+                    await _respond(writer, *_json(400, {"error": "malformed request line"}), keep_alive=False)
+                    break
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length") or "0"
+                # The body cannot be skipped without a valid length, so these close the connection
+                if not length.isdigit():
+                    await _respond(writer, *_json(400, {"error": f"invalid Content-Length: {length!r}"}),
+                                   keep_alive=False)
+                    break
+                if int(length) > self.max_body_bytes:
+                    await _respond(writer, *_json(413, {"error": f"body of {int(length):,} bytes; "
+                                                                 f"at most {self.max_body_bytes:,} per request"}),
+                                   keep_alive=False)
+                    break
+                body = await reader.readexactly(int(length))
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                start = time.perf_counter()
+                try:
+                    response = await self.handle(method.upper(), path, headers, body)
+                except HttpError as exc:
+                    response = _json(exc.status, {"error": str(exc)})
+                except Exception as exc:  # one bad request must not stop the service
+                    response = _json(500, {"error": f"{type(exc).__name__}: {exc}"})
+                await _respond(writer, *response, keep_alive=keep_alive)
+                self.log(f"{method} {path} {response[0]} {(time.perf_counter() - start) * 1000:.1f} ms")
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _json_rows(body):
+    try:
+        payload = json.loads(body or b"null")
+    except ValueError as exc:
+        raise HttpError(400, f"invalid JSON: {exc}")
+    rows = payload.get("rows", [payload["row"]] if "row" in payload else None) if isinstance(payload, dict) else payload
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise HttpError(400, 'expected {"row": {...}}, {"rows": [...]} or a list of row objects')
+    # Values are read like CSV cells: all strings, missing or null values empty
+    rows = [{column: "" if value is None else str(value) for column, value in row.items()} for row in rows]
+    return pd.DataFrame(rows).fillna("").astype(str)
+
+
+def _csv_rows(body):
+    try:
+        return pd.read_csv(io.StringIO(body.decode("utf-8-sig")), dtype=str, keep_default_na=False,
+                           skipinitialspace=False)
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise HttpError(400, f"invalid CSV: {exc}")
+
+
+def _json(status, payload):
+    return status, "application/json", json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+async def _respond(writer, status, content_type, payload, keep_alive=True):
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + payload)
+    await writer.drain()
+
+
+async def serve(args):
+    service = ScoringService(args.config, args.conditions_csv, args.max_rows,
+                             int(args.max_body_mb * 1024 * 1024))
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        server = await asyncio.start_unix_server(service.connection, path=args.socket, limit=MAX_HEADER_BYTES)
+        where = args.socket
+    else:
+        server = await asyncio.start_server(service.connection, args.host, args.port, limit=MAX_HEADER_BYTES)
+        where = f"http://{args.host}:{args.port}"
+    print(f"Scoring service on {where} (config {service.current.digest[:12]}, "
+          f"{service.current.scenarios} scenarios)", flush=True)
+    watcher = asyncio.ensure_future(service.watch(args.poll))
+    try:
+        # Stop cleanly (and remove the socket) on SIGTERM too
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, AttributeError):
+        pass
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Local HTTP scoring service with hot-reloaded scenarios.json.")
+    ap.add_argument("-c", "--config", default=str(DEFAULT_CONFIG), help="Path to scenarios.json")
+    ap.add_argument("--conditions-csv", help="Use the formulas in ConditionsCsv.csv instead of the built-in ports")
+    ap.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default: {DEFAULT_PORT})")
+    ap.add_argument("--socket", help="Listen on this Unix socket path instead of TCP")
+    ap.add_argument("--poll", type=float, default=DEFAULT_POLL,
+                    help=f"Seconds between checks for a changed config (default: {DEFAULT_POLL})")
+    ap.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS,
+                    help=f"Rows accepted per request (default: {DEFAULT_MAX_ROWS:,})")
+    ap.add_argument("--max-body-mb", type=float, default=DEFAULT_MAX_BODY_MB,
+                    help=f"Largest request body accepted, in MB (default: {DEFAULT_MAX_BODY_MB})")
+    args = ap.parse_args()
+
+    if args.poll <= 0:
+        ap.error("--poll must be positive")
+    if args.max_body_mb <= 0:
+        ap.error("--max-body-mb must be positive")
+    if args.socket and not hasattr(asyncio, "start_unix_server"):
+        ap.error("--socket needs a platform with Unix sockets")
+    for path in [args.config] + ([args.conditions_csv] if args.conditions_csv else []):
+        if not Path(path).is_file():
+            print(f"Error: file not found: {path}")
+            sys.exit(1)
+
+    try:
+        asyncio.run(serve(args))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+selective_matching.py
+---------------------
+First-match scenario assignment that evaluates conditions lazily, cheapest
+and most often failing first.
+
+evaluate_scenarios.match_scenarios needs every condition of every scenario
+evaluated over every row beforehand.  SelectiveMatcher (``--selective`` on
+evaluate_scenarios.py) evaluates nothing up front.  It first measures, on a
+sample of the rows, the cost per row and the true rate of each condition.
+Each scenario's required/forbidden checks are then ordered by expected
+cost (cost / probability that the check fails), and a scenario's rows are
+narrowed check by check, so a condition is only evaluated on rows that
+passed the cheaper checks before it.  Results are memoized per condition and
+row: rows evaluated for one scenario (or for the sample) are never
+evaluated again for another.
+
+The checks of a scenario are all ANDed and each condition depends on its own
+row only, so the order cannot change which rows match; scenarios are still
+tried in config order.  --verify scores a file both ways and compares them.
+
+Usage
+-----
+$ python selective_matching.py -i ../ESL_Test_Hao_2025-04-25_Input.csv --verify
+$ python selective_matching.py -i big_input.csv --show-order
+$ python evaluate_scenarios.py -i big_input.csv --selective
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from evaluate_scenarios import (CONDITIONS, DEFAULT_CONFIG, ColumnTable, candidate_scenarios, clean_frame,
+                                load_config, load_input, normalize_scenarios, score_table)
+
+
+# ----- Configuration ---------------------------------------------------------
+
+# Rows measured per condition to estimate its cost and true rate
+DEFAULT_SAMPLE_ROWS = 5_000
+
+SAMPLE_SEED = 17
+
+# Lower bound of a check's failure probability, so checks that never failed in
+# the sample still sort by cost
+MIN_FAIL_RATE = 0.001
+
+
+# ----- Row views -------------------------------------------------------------
+
+class RowView(ColumnTable):
+    """
+    Some rows of a ColumnTable.  Columns and variables are taken from the
+    parent, which parses each column once for all views.
+    """
+
+    def __init__(self, parent, rows):
+        super().__init__(parent.frame)
+        self.parent = parent
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def text(self, column):
+        if column not in self._text:
+            self._text[column] = self.parent.text(column)[self.rows]
+        return self._text[column]
+
+    def dates(self, column):
+        if column not in self._dates:
+            self._dates[column] = self.parent.dates(column)[self.rows]
+        return self._dates[column]
+
+    def numbers(self, column):
+        if column not in self._numbers:
+            self._numbers[column] = self.parent.numbers(column)[self.rows]
+        return self._numbers[column]
+
+    def var(self, name):
+        return self.parent.var(name)[self.rows]
+
+
+# ----- Memoized conditions ---------------------------------------------------
+
+class ConditionMemo:
+    """
+    Condition results per row, computed on demand.  A condition that cannot
+    be evaluated (KeyError) is False, as in evaluate_conditions.  Each
+    evaluation (of the rows not known yet) is recorded in ``profile``.
+    """
+
+    def __init__(self, table, conditions=None, profile=None):
+        self.table = table
+        self.conditions = CONDITIONS if conditions is None else conditions
+        self.profile = profile
+        self.values = {}
+        self.known = {}
+        self.evaluated = {}
+        self.seconds = 0.0
+
+    def __contains__(self, name):
+        return name in self.conditions
+
+    def get(self, name, rows):
+        """Values of condition ``name`` at row positions ``rows``."""
+        if name not in self.values:
+            self.values[name] = np.zeros(len(self.table), dtype=bool)
+            self.known[name] = np.zeros(len(self.table), dtype=bool)
+            self.evaluated[name] = 0
+        values, known = self.values[name], self.known[name]
+        todo = rows[~known[rows]]
+        if len(todo):
+            start = time.perf_counter()
+            failed = False
+            try:
+                values[todo] = np.asarray(self.conditions[name](RowView(self.table, todo)), dtype=bool)
+            except KeyError:
+                values[todo] = False
+                failed = True
+            known[todo] = True
+            self.evaluated[name] += len(todo)
+            seconds = time.perf_counter() - start
+            self.seconds += seconds
+            if self.profile is not None:
+                self.profile.condition(name, values[todo], seconds, failed)
+        return values[rows]
+
+
+def condition_stats(memo, names, sample_rows=DEFAULT_SAMPLE_ROWS, seed=SAMPLE_SEED):
+    """
+    {name: (seconds per row, true rate)} measured on a seeded sample of the
+    rows.  The sample results stay in ``memo``.
+    """
+    n = len(memo.table)
+    rows = np.arange(n)
+    if n > sample_rows:
+        rows = np.sort(np.random.default_rng(seed).choice(n, sample_rows, replace=False))
+    stats = {}
+    for name in names:
+        if name not in memo:
+            continue
+        start = time.perf_counter()
+        values = memo.get(name, rows)
+        seconds = time.perf_counter() - start
+        stats[name] = (seconds / max(1, len(rows)), float(values.mean()) if len(rows) else 0.5)
+    return stats
+
+
+def ordered_checks(scenario, stats):
+    """
+    The scenario's (condition, wanted value) checks, cheapest expected cost
+    first.  Unknown conditions are left out, as scenario_mask ignores them.
+    """
+    checks = [(name, True) for name in scenario["required"]] + [(name, False) for name in scenario["forbidden"]]
+    checks = [check for check in checks if check[0] in stats]
+
+    def expected_cost(check):
+        cost, true_rate = stats[check[0]]
+        fail_rate = 1.0 - true_rate if check[1] else true_rate
+        return cost / max(fail_rate, MIN_FAIL_RATE)
+
+    return sorted(checks, key=expected_cost)
+
+
+# ----- Matching --------------------------------------------------------------
+
+class SelectiveMatcher:
+    """
+    Drop-in replacement for match_scenarios (passed as ``index`` to
+    score_table): evaluates conditions lazily in selectivity order.  A
+    ``profile`` gets the conditions as they are evaluated (sample included)
+    and the scenario and group timings, like match_scenarios records them;
+    the scenario and group times leave out the condition evaluations, which
+    are recorded as conditions.
+    """
+
+    def __init__(self, config, conditions=None, sample_rows=DEFAULT_SAMPLE_ROWS, profile=None):
+        self.scenarios = normalize_scenarios(config)
+        self.conditions = conditions
+        self.sample_rows = sample_rows
+        self.profile = profile
+        self.stats = {}
+        self.memo = None
+
+    def condition_names(self):
+        # Nothing is evaluated up front
+        return []
+
+    def match(self, table, eligible, condition_results):
+        n = len(table)
+        matched = np.full(n, -1, dtype=np.int64)
+        self.memo = ConditionMemo(table, self.conditions, self.profile)
+        names = sorted({c for s in self.scenarios for c in s["required"] + s["forbidden"]})
+        self.stats = condition_stats(self.memo, names, self.sample_rows)
+        order = {s["id"]: ordered_checks(s, self.stats) for s in self.scenarios}
+
+        keys = pd.DataFrame({
+            "reason": pd.Series(table.text("REASON_CODE")).str.upper(),
+            "level": table.numbers("PROCESS_LEVEL"),
+        })
+        for (reason, level), index in keys[eligible].groupby(["reason", "level"], dropna=True).groups.items():
+            if level != int(level):
+                continue
+            group_start, group_conditions = time.perf_counter(), self.memo.seconds
+            group = f"{reason} {int(level)}"
+            remaining = np.asarray(index, dtype=np.int64)
+            tried = 0
+            for scenario in candidate_scenarios(self.scenarios, reason, int(level)):
+                start, conditions_before = time.perf_counter(), self.memo.seconds
+                alive = remaining
+                for name, wanted in order[scenario["id"]]:
+                    alive = alive[self.memo.get(name, alive) == wanted]
+                    if not len(alive):
+                        break
+                if self.profile is not None:
+                    seconds = time.perf_counter() - start - (self.memo.seconds - conditions_before)
+                    self.profile.scenario(scenario, group, len(remaining), len(alive), seconds)
+                tried += 1
+                if len(alive):
+                    matched[alive] = scenario["id"]
+                    remaining = remaining[matched[remaining] < 0]
+                    if not len(remaining):
+                        break
+            if self.profile is not None:
+                self.profile.search(group, len(index), len(index) - len(remaining), tried,
+                                    time.perf_counter() - group_start - (self.memo.seconds - group_conditions))
+        return matched
+
+    def summary(self):
+        """(name, seconds per row, true rate, rows evaluated) per condition, in evaluation-cost order."""
+        evaluated = self.memo.evaluated if self.memo else {}
+        return [(name, cost, rate, evaluated.get(name, 0))
+                for name, (cost, rate) in sorted(self.stats.items(), key=lambda item: item[1][0])]
+
+
+def verify(frame, config, conditions=None, sample_rows=DEFAULT_SAMPLE_ROWS, now=None):
+    """
+    Score ``frame`` with config-order matching and with SelectiveMatcher.
+    Returns (rows that differ, the matcher, seconds config order, seconds selective).
+    """
+    now = now or datetime.now()
+    start = time.perf_counter()
+    expected = score_table(ColumnTable(clean_frame(frame)), config, conditions, now)
+    middle = time.perf_counter()
+    matcher = SelectiveMatcher(config, conditions, sample_rows)
+    actual = score_table(ColumnTable(clean_frame(frame)), config, conditions, now, index=matcher)
+    end = time.perf_counter()
+    differs = ~(expected == actual).all(axis=1).to_numpy()
+    return np.flatnonzero(differs), matcher, middle - start, end - middle
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Selectivity-ordered, memoized scenario matching.")
+    ap.add_argument("-i", "--input", required=True, help="Path to the input CSV (or .parquet / .arrow)")
+    ap.add_argument("-c", "--config", default=str(DEFAULT_CONFIG), help="Path to scenarios.json")
+    ap.add_argument("--conditions-csv", help="Use the formulas in ConditionsCsv.csv instead of the built-in ports")
+    ap.add_argument("--sample", type=int, default=DEFAULT_SAMPLE_ROWS,
+                    help=f"Rows sampled for the condition statistics (default: {DEFAULT_SAMPLE_ROWS:,})")
+    ap.add_argument("--verify", action="store_true",
+                    help="Score the file in config order and selectively, and compare every row")
+    ap.add_argument("--show-order", action="store_true", help="Print each scenario's check order")
+    args = ap.parse_args()
+
+    if args.sample < 1:
+        ap.error("--sample must be at least 1")
+    if not Path(args.input).is_file():
+        print(f"Error: input not found: {args.input}")
+        sys.exit(1)
+
+    conditions = None
+    if args.conditions_csv:
+        from compile_conditions import load_conditions
+        conditions = dict(CONDITIONS, **load_conditions(args.conditions_csv))
+    config = load_config(args.config)
+    frame = load_input(args.input)
+
+    if args.verify:
+        differs, matcher, ordered_time, selective_time = verify(frame, config, conditions, args.sample)
+    else:
+        matcher = SelectiveMatcher(config, conditions, args.sample)
+        start = time.perf_counter()
+        score_table(ColumnTable(clean_frame(frame)), config, conditions, index=matcher)
+        selective_time = time.perf_counter() - start
+
+    print(f"{'condition':<10} {'us/row':>8} {'true':>7} {'rows evaluated':>15}")
+    for name, cost, rate, evaluated in matcher.summary():
+        print(f"{name:<10} {cost * 1e6:>8.2f} {rate:>7.1%} {evaluated:>15,}")
+    if args.show_order:
+        print()
+        for scenario in matcher.scenarios:
+            checks = ", ".join(("" if wanted else "not ") + name for name, wanted in ordered_checks(scenario, matcher.stats))
+            print(f"{scenario['id']:>4}  {checks}")
+
+    if not args.verify:
+        print(f"\nScored {len(frame)} rows in {selective_time:.2f} s")
+        return
+    print(f"\nConfig order {ordered_time:.2f} s, selective {selective_time:.2f} s")
+    if len(differs):
+        print(f"Error: {len(differs)} of {len(frame)} rows differ (first: row {differs[0] + 1})")
+        sys.exit(1)
+    print(f"Identical: all {len(frame)} rows match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+stream_scenarios.py
+-------------------
+Score a leave input file in fixed-size chunks and append the processed rows
+to the output as each chunk finishes.
+
+evaluate_scenarios.py (like CsvProcessor.LoadCsvFile / ProcessRecords /
+SaveToCsv) holds the whole table until the end.  Here the input is read
+``--chunk-size`` rows at a time; each chunk is cleaned, gets its variables,
+is matched and written before the next one is read, so memory stays bounded
+by the chunk size and the first rows appear after the first chunk.  Rows are
+scored independently, so the output is identical to a single
+evaluate_scenarios.py run.
+
+After every chunk the output is flushed and a checkpoint
+(<input>.progress.json) records the rows done, the input offset after them,
+the output size and the run timestamp.  If the run stops, running the same
+command again truncates the output to the last completed chunk and seeks
+the input to the recorded offset, so the rows already done are not read
+again, and continues with the same ENTRY_DATE.  The checkpoint is removed when the run completes; it is ignored
+(and the run restarts) if the input, the config, the --conditions-csv file,
+the --index setting or the chunk size changed.
+
+Usage
+-----
+$ python stream_scenarios.py -i ../ESL_Test_Hao_2025-04-25_Input.csv
+$ python stream_scenarios.py -i big_input.csv -o big_processed.csv --chunk-size 100000
+$ python stream_scenarios.py -i big_input.csv --restart
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from evaluate_scenarios import CONDITIONS, DEFAULT_CONFIG, default_output_path, load_config, score_frame
+
+
+# ----- Configuration ---------------------------------------------------------
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+CHECKPOINT_SUFFIX = ".progress.json"
+
+
+# ----- Checkpoint ------------------------------------------------------------
+
+def checkpoint_path(input_path):
+    input_path = Path(input_path)
+    return input_path.with_name(input_path.name + CHECKPOINT_SUFFIX)
+
+
+def input_fingerprint(path):
+    stat = Path(path).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def config_digest(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def read_checkpoint(path):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def write_checkpoint(path, state):
+    """Replace the checkpoint atomically, so a crash leaves the old or the new one."""
+    path = Path(path)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def conditions_identity(conditions_csv):
+    """Hash of the --conditions-csv file (None for the built-in conditions)."""
+    if not conditions_csv:
+        return None
+    from compile_conditions import conditions_digest
+    return conditions_digest(conditions_csv)
+
+
+def resumable(state, input_path, config_path, chunk_rows, output_path=None, conditions_csv=None, use_index=False):
+    """True when a checkpoint belongs to this input, config, conditions, matcher and chunk size."""
+    if not state:
+        return False
+    if output_path is not None and Path(state["output"]) != Path(output_path):
+        return False
+    return (state.get("input") == input_fingerprint(input_path)
+            and state.get("config") == config_digest(config_path)
+            and state.get("conditions") == conditions_identity(conditions_csv)
+            and state.get("index") == use_index
+            and state.get("chunk_rows") == chunk_rows
+            and "input_bytes" in state
+            and Path(state["output"]).exists()
+            and Path(state["output"]).stat().st_size >= state["output_bytes"])
+
+
+# ----- Streaming -------------------------------------------------------------
+
+def read_record(handle):
+    """
+    The next CSV record as bytes (b"" at the end).  A quoted value may hold
+    line breaks, so lines are joined until the quotes are balanced.
+    """
+    record = handle.readline()
+    while record.count(b'"') % 2:
+        line = handle.readline()
+        if not line:
+            break
+        record += line
+    return record
+
+
+def read_chunks(path, chunk_rows, offset=0):
+    """
+    Input rows as (string frame of up to ``chunk_rows`` rows, byte offset
+    after it), starting at byte ``offset`` (0: after the header).  Resuming
+    seeks straight to the offset instead of re-reading the rows before it.
+    """
+    with open(path, "rb") as handle:
+        header = read_record(handle)
+        names = pd.read_csv(io.BytesIO(header), dtype=str, nrows=0).columns.tolist()
+        if offset:
+            handle.seek(offset)
+        while True:
+            records = []
+            while len(records) < chunk_rows:
+                record = read_record(handle)
+                if not record:
+                    break
+                records.append(record)
+            if not records:
+                return
+            chunk = pd.read_csv(io.BytesIO(b"".join(records)), header=None, names=names, dtype=str,
+                                keep_default_na=False, skipinitialspace=False)
+            if len(chunk):  # blank lines only
+                yield chunk, handle.tell()
+
+
+def stream_file(input_path, output_path, config_path=DEFAULT_CONFIG, chunk_rows=DEFAULT_CHUNK_ROWS,
+                conditions=None, index=None, restart=False, progress=print, profile=None, conditions_csv=None):
+    """
+    Score ``input_path`` chunk by chunk into ``output_path`` (None: the default
+    *_processed_<timestamp>.csv name, or the one being resumed).  Returns the
+    output path.  A ``profile`` (scenario_profile.RunProfile) accumulates the
+    timings of every chunk.  ``conditions_csv`` is the file ``conditions``
+    were compiled from; it is part of the checkpoint identity.
+    """
+    checkpoint = checkpoint_path(input_path)
+    state = None if restart else read_checkpoint(checkpoint)
+    if resumable(state, input_path, config_path, chunk_rows, output_path, conditions_csv, index is not None):
+        output_path = Path(state["output"])
+        now = datetime.fromisoformat(state["now"])
+        with open(output_path, "r+b") as handle:
+            handle.truncate(state["output_bytes"])
+        progress(f"Resuming {output_path.name} after {state['rows']} rows")
+    else:
+        if state:
+            progress(f"Not resuming: {checkpoint.name} was written with a different input, config, "
+                     f"conditions, --index setting, chunk size or output")
+        now = datetime.now()
+        output_path = Path(output_path) if output_path else default_output_path(input_path, now)
+        state = {
+            "input": input_fingerprint(input_path),
+            "config": config_digest(config_path),
+            "conditions": conditions_identity(conditions_csv),
+            "index": index is not None,
+            "chunk_rows": chunk_rows,
+            "output": str(output_path),
+            "now": now.isoformat(),
+            "rows": 0,
+            "input_bytes": 0,
+            "output_bytes": 0,
+        }
+        output_path.write_bytes(b"")
+        write_checkpoint(checkpoint, state)
+
+    config = load_config(config_path)
+    start = time.perf_counter()
+    streamed = 0
+    with open(output_path, "a", encoding="utf-8", newline="") as out:
+        for chunk, input_bytes in read_chunks(input_path, chunk_rows, state["input_bytes"]):
+            processed = score_frame(chunk, config, conditions=conditions, now=now, index=index, profile=profile)
+            processed.to_csv(out, index=False, header=state["output_bytes"] == 0, lineterminator="\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+            streamed += len(processed)
+            state["rows"] += len(processed)
+            state["output_bytes"] = out.tell()
+            state["input_bytes"] = input_bytes
+            write_checkpoint(checkpoint, state)
+
+            elapsed = time.perf_counter() - start
+            progress(f"{state['rows']:>12,} rows  {elapsed:8.1f} s  {streamed / elapsed if elapsed else 0:10,.0f} rows/s")
+
+    if state["output_bytes"] == 0:
+        # Header-only input: write the header the whole-file run would write
+        score_frame(pd.read_csv(input_path, dtype=str, keep_default_na=False, nrows=0), config,
+                    conditions=conditions, now=now, index=index).to_csv(output_path, index=False, lineterminator="\n")
+    checkpoint.unlink()
+    return output_path
+
+
+# ----- CLI -------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Score an ESL input CSV in chunks, resuming after interruptions.")
+    ap.add_argument("-i", "--input", required=True, help="Path to the input CSV")
+    ap.add_argument("-c", "--config", default=str(DEFAULT_CONFIG), help="Path to scenarios.json")
+    ap.add_argument("-o", "--output", help="Output path (default: <input>_processed_<timestamp>.csv, "
+                                           "or the output of the run being resumed)")
+    ap.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_ROWS,
+                    help=f"Rows per chunk (default: {DEFAULT_CHUNK_ROWS:,})")
+    ap.add_argument("--conditions-csv", help="Use the formulas in ConditionsCsv.csv instead of the built-in ports")
+    ap.add_argument("--index", action="store_true", help="Match through the precomputed scenario index")
+    ap.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start from the first row")
+    ap.add_argument("--profile", metavar="PATH",
+                    help="Save stage/condition/scenario timings as JSON (and a .folded flame-graph file)")
+    args = ap.parse_args()
+
+    if args.chunk_size < 1:
+        ap.error("--chunk-size must be at least 1")
+    if not Path(args.input).is_file():
+        print(f"Error: input not found: {args.input}")
+        sys.exit(1)
+
+    conditions = None
+    if args.conditions_csv:
+        from compile_conditions import load_conditions
+        conditions = dict(CONDITIONS, **load_conditions(args.conditions_csv))
+    index = None
+    if args.index:
+        from scenario_index import load_index
+        index = load_index(args.config, known_conditions=conditions or CONDITIONS)
+
+    profile = None
+    if args.profile:
+        from scenario_profile import RunProfile
+        profile = RunProfile()
+
+    out_path = stream_file(args.input, args.output, args.config, args.chunk_size,
+                           conditions=conditions, index=index, restart=args.restart, profile=profile,
+                           conditions_csv=args.conditions_csv)
+    print(f"Done → {out_path.resolve()}")
+    if profile is not None:
+        json_path, folded_path = profile.save(args.profile)
+        print(f"Profile → {json_path.resolve()} (flame graph stacks: {folded_path.name})")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,74 +2,34 @@
 """
 ESL Scenarios Update Tool
 
-This script updates the scenarios.json file based on data from the ESLScenarios.json file.
+This script updates the scenarios.json file based on data from the ESLScenarios.json file
+(or the new_scenarios.json written by scenario_to_json.py).
+
+Syncs are incremental: a manifest next to scenarios.json (scenarios.manifest.json) records a
+hash of every source scenario and of the text of every target scenario, so later runs only
+transform, diff and rewrite the scenarios whose hash changed. Unchanged scenarios are copied
+through byte for byte.
 """
 import argparse
+import hashlib
+import itertools
 import json
 import os
 import sys
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from difflib import unified_diff
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
 import re
 import copy
 import shutil
 
-def format_json_diff(old_json: Dict, new_json: Dict) -> str:
-    """Format a diff between two JSON objects with color coding"""
-    old_str = json.dumps(old_json, indent=2).splitlines()
-    new_str = json.dumps(new_json, indent=2).splitlines()
-    diff = unified_diff(old_str, new_str, fromfile='Current', tofile='Proposed', n=0)
-    
-    # Color code the diff output
-    colored_diff = []
-    for line in diff:
-        if line.startswith('+'):
-            colored_diff.append(f"\033[92m{line}\033[0m")  # Green for additions
-        elif line.startswith('-'):
-            colored_diff.append(f"\033[91m{line}\033[0m")  # Red for removals
-        else:
-            colored_diff.append(line)
-    
-    return '\n'.join(colored_diff)
+from append_scenarios import transform_scenario
+from scenario_catalog import is_compact, is_compact_file, write_compact
+from scenario_diff import (
+    REPORT_HEADER, Change, diff_scenario, group_by_scenario, render_json, render_scenario, render_text,
+)
 
-def review_changes(target_json: Dict, scenario_map: Dict) -> None:
-    """Show a diff of changes for each scenario"""
-    print("\033[92mReview Changes:\033[0m")
-    print("\033[92m---------------\033[0m")
-    
-    for scenario in target_json.get('scenarios', []):
-        scenario_id = scenario.get('id')
-        if scenario_id in scenario_map:
-            source_scenario = scenario_map[scenario_id]
-            print(f"\033[96mScenario #{scenario_id}: {scenario.get('name', '')}\033[0m")
-            
-            # Create a copy of the current scenario for comparison
-            current_scenario = scenario.copy()
-            
-            # Update the fields as we would in the real update
-            current_scenario.update({
-                'name': source_scenario['name'],
-                'description': source_scenario['description'],
-                'reason_code': source_scenario['reason_code'],
-                'process_levels': source_scenario['process_levels'],
-                'conditions': source_scenario['conditions'],
-                'variables_required': source_scenario['variables_required'],
-                'logging': source_scenario['logging'],
-                'updates': source_scenario['updates']
-            })
-            
-            # Show the diff
-            diff = format_json_diff(scenario, current_scenario)
-            if diff:
-                print(diff)
-                print("\033[93mPress Enter to continue, 'q' to quit review...\033[0m")
-                response = input()
-                if response.lower() == 'q':
-                    break
-            else:
-                print("\033[92mNo changes\033[0m")
-            print("\033[92m" + "="*80 + "\033[0m")
+MANIFEST_VERSION = 1
 
 def extract_variables_from_expression(expr):
     """Extract variable names from an expression string."""
@@ -351,151 +311,321 @@ def create_new_scenario(source_scenario):
     
     return new_scenario
 
-def save_changes_to_file(target_json: Dict, scenario_map: Dict, output_file: str) -> None:
-    """Save the full changes to a file for review"""
+def iter_changes(target_json: Dict, scenario_map: Dict):
+    """(scenario_id, name, change records) for applying scenario_map (source scenarios by id) to target_json"""
+    existing = set()
+    for scenario in target_json.get('scenarios', []):
+        scenario_id = scenario.get('id')
+        if scenario_id in scenario_map:
+            existing.add(scenario_id)
+            updated_scenario = update_scenario(scenario, scenario_map[scenario_id])
+            yield scenario_id, scenario.get('name', ''), diff_scenario(scenario, updated_scenario, scenario_id)
+    for scenario_id, source_data in scenario_map.items():
+        if scenario_id not in existing:
+            new_scenario = create_new_scenario(source_data)
+            yield scenario_id, new_scenario.get('name', ''), [Change(scenario_id, 'scenario_added', (), new=new_scenario)]
+
+def write_change_reports(changes: List[Change], names: Dict, output_file: Optional[str] = None,
+                         json_file: Optional[str] = None) -> None:
+    """Render the text review report and/or the JSON change report from change records"""
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(render_text(changes, names))
+    if json_file:
+        with open(json_file, 'w', encoding='utf-8') as f:
+            f.write(render_json(changes))
+
+def review_changes(changes: List[Change], names: Dict) -> None:
+    """Show the changes one scenario at a time, rendered from the change records"""
+    print("\033[92mReview Changes:\033[0m")
+    print("\033[92m---------------\033[0m")
+    for scenario_id, scenario_changes in group_by_scenario(changes).items():
+        print(render_scenario(scenario_id, scenario_changes, names.get(scenario_id), color=True), end='')
+        print("\033[93mPress Enter to continue, 'q' to quit review...\033[0m")
+        if input().strip().lower() == 'q':
+            break
+
+def save_changes_to_file(target_json: Dict, scenario_map: Dict, output_file: str,
+                         json_file: Optional[str] = None) -> None:
+    """Save the full changes to a file for review (one scenario at a time)"""
+    records = [] if json_file else None
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("ESL Scenarios Update Review\n")
-        f.write("=========================\n\n")
-        
-        # First process existing scenarios
-        existing_scenarios = []
-        for scenario in target_json.get('scenarios', []):
-            scenario_id = scenario.get('id')
-            if scenario_id in scenario_map:
-                existing_scenarios.append(scenario_id)
-                # Create an updated version of the scenario
-                source_scenario = scenario_map[scenario_id]
-                updated_scenario = update_scenario(scenario, source_scenario)
-                
-                # Write scenario header
-                f.write(f"Scenario #{scenario_id}: {scenario.get('name', '')}\n")
-                f.write("=" * 80 + "\n\n")
-                
-                # Write current values
-                f.write("Current Values:\n")
-                f.write("-" * 40 + "\n")
-                f.write(f"Name: {scenario.get('name', '')}\n")
-                f.write(f"Description: {scenario.get('description', '')}\n")
-                f.write(f"Reason Code: {scenario.get('reason_code', '')}\n")
-                
-                if 'process_level' in scenario:
-                    f.write(f"Process Level: {scenario.get('process_level', '')}\n")
-                elif 'process_levels' in scenario:
-                    f.write(f"Process Levels: {json.dumps(scenario.get('process_levels', []), indent=2)}\n")
-                
-                f.write(f"Conditions: {json.dumps(scenario.get('conditions', {}), indent=2)}\n")
-                f.write(f"Variables Required: {json.dumps(scenario.get('variables_required', []), indent=2)}\n")
-                f.write(f"Logging: {json.dumps(scenario.get('logging', {}), indent=2)}\n")
-                f.write(f"Updates: {json.dumps(scenario.get('updates', {}), indent=2)}\n\n")
-                
-                # Write proposed values
-                f.write("Proposed Values:\n")
-                f.write("-" * 40 + "\n")
-                f.write(f"Name: {updated_scenario.get('name', '')}\n")
-                f.write(f"Description: {updated_scenario.get('description', '')}\n")
-                f.write(f"Reason Code: {updated_scenario.get('reason_code', '')}\n")
-                
-                if 'process_level' in updated_scenario:
-                    f.write(f"Process Level: {updated_scenario.get('process_level', '')}\n")
-                elif 'process_levels' in updated_scenario:
-                    f.write(f"Process Levels: {json.dumps(updated_scenario.get('process_levels', []), indent=2)}\n")
-                
-                f.write(f"Conditions: {json.dumps(updated_scenario.get('conditions', {}), indent=2)}\n")
-                f.write(f"Variables Required: {json.dumps(updated_scenario.get('variables_required', []), indent=2)}\n")
-                f.write(f"Logging: {json.dumps(updated_scenario.get('logging', {}), indent=2)}\n")
-                f.write(f"Updates: {json.dumps(updated_scenario.get('updates', {}), indent=2)}\n\n")
-                
-                # Write summary of changes
-                f.write("Changes Summary:\n")
-                f.write("-" * 40 + "\n")
-                
-                # Compare and list changes
-                changes = []
-                
-                if scenario.get('name') != updated_scenario.get('name'):
-                    changes.append(f"• Name changed from '{scenario.get('name')}' to '{updated_scenario.get('name')}'")
-                if scenario.get('description') != updated_scenario.get('description'):
-                    changes.append("• Description updated")
-                if scenario.get('reason_code') != updated_scenario.get('reason_code'):
-                    changes.append(f"• Reason code changed from '{scenario.get('reason_code')}' to '{updated_scenario.get('reason_code')}'")
-                
-                # Check for process level changes
-                if 'process_level' in scenario and 'process_level' in updated_scenario:
-                    if scenario.get('process_level') != updated_scenario.get('process_level'):
-                        changes.append(f"• Process level changed from {scenario.get('process_level')} to {updated_scenario.get('process_level')}")
-                elif 'process_levels' in scenario and 'process_levels' in updated_scenario:
-                    if scenario.get('process_levels') != updated_scenario.get('process_levels'):
-                        changes.append(f"• Process levels changed from {json.dumps(scenario.get('process_levels', []))} to {json.dumps(updated_scenario.get('process_levels', []))}")
-                elif 'process_level' in scenario and 'process_levels' in updated_scenario:
-                    changes.append(f"• Changed from process_level {scenario.get('process_level')} to process_levels {json.dumps(updated_scenario.get('process_levels', []))}")
-                elif 'process_levels' in scenario and 'process_level' in updated_scenario:
-                    changes.append(f"• Changed from process_levels {json.dumps(scenario.get('process_levels', []))} to process_level {updated_scenario.get('process_level')}")
-                
-                if scenario.get('conditions') != updated_scenario.get('conditions'):
-                    changes.append("• Conditions updated")
-                if scenario.get('variables_required') != updated_scenario.get('variables_required'):
-                    changes.append(f"• Required variables changed from {json.dumps(scenario.get('variables_required', []))} to {json.dumps(updated_scenario.get('variables_required', []))}")
-                if scenario.get('logging') != updated_scenario.get('logging'):
-                    changes.append("• Logging configuration updated")
-                if json.dumps(scenario.get('updates', {})) != json.dumps(updated_scenario.get('updates', {})):
-                    changes.append("• Updates section modified")
-                
-                if changes:
-                    f.write("\n".join(changes) + "\n")
-                else:
-                    f.write("• No changes required\n")
-                
-                f.write("\n" + "="*80 + "\n\n")
-        
-        # Now process new scenarios that don't exist in the target
-        for scenario_id, source_data in scenario_map.items():
-            if scenario_id not in existing_scenarios:
-                # This is a new scenario - create a properly formatted one
-                new_scenario = create_new_scenario(source_data)
-                
-                # Write scenario header
-                f.write(f"NEW Scenario #{scenario_id}: {new_scenario.get('name', '')}\n")
-                f.write("=" * 80 + "\n\n")
-                
-                # Write current values
-                f.write("Current Values:\n")
-                f.write("-" * 40 + "\n")
-                f.write("None - This is a new scenario that doesn't exist in the target file.\n\n")
-                
-                # Write proposed values
-                f.write("Proposed Values:\n")
-                f.write("-" * 40 + "\n")
-                f.write(f"Name: {new_scenario.get('name', '')}\n")
-                f.write(f"Description: {new_scenario.get('description', '')}\n")
-                f.write(f"Reason Code: {new_scenario.get('reason_code', '')}\n")
-                
-                if 'process_level' in new_scenario:
-                    f.write(f"Process Level: {new_scenario.get('process_level', '')}\n")
-                elif 'process_levels' in new_scenario:
-                    f.write(f"Process Levels: {json.dumps(new_scenario.get('process_levels', []), indent=2)}\n")
-                
-                f.write(f"Conditions: {json.dumps(new_scenario.get('conditions', {}), indent=2)}\n")
-                f.write(f"Variables Required: {json.dumps(new_scenario.get('variables_required', []), indent=2)}\n")
-                f.write(f"Logging: {json.dumps(new_scenario.get('logging', {}), indent=2)}\n")
-                f.write(f"Updates: {json.dumps(new_scenario.get('updates', {}), indent=2)}\n\n")
-                
-                # Write summary of changes
-                f.write("Changes Summary:\n")
-                f.write("-" * 40 + "\n")
-                f.write("• Adding new scenario\n")
-                
-                f.write("\n" + "="*80 + "\n\n")
+        f.write(REPORT_HEADER)
+        for scenario_id, name, changes in iter_changes(target_json, scenario_map):
+            if not changes:
+                continue
+            f.write(render_scenario(scenario_id, changes, name))
+            if records is not None:
+                records.extend(changes)
+    if json_file:
+        write_change_reports(records, {}, json_file=json_file)
 
-def main():
+def canonical_json(obj: Any) -> str:
+    """Canonical JSON form used for content hashes (sorted keys, no whitespace)."""
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+def content_hash(obj: Any) -> str:
+    """SHA-256 of the canonical JSON form of an object."""
+    return hashlib.sha256(canonical_json(obj).encode('utf-8')).hexdigest()
+
+def text_hash(text: str) -> str:
+    """SHA-256 of a piece of file text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def default_manifest_path(target_file: str) -> Path:
+    """scenarios.json -> scenarios.manifest.json in the same directory."""
+    target = Path(target_file)
+    return target.with_name(f"{target.stem}.manifest.json")
+
+def _skip_ws(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in ' \t\r\n':
+        pos += 1
+    return pos
+
+def scan_scenario_spans(text: str) -> Tuple[Dict[int, Tuple[int, int]], int]:
     """
-    Updates the scenarios.json file to remove process_levels and reason_code from skip scenarios.
+    Find the text span of every scenario in the "scenarios" array.
+
+    Returns ({id: (start, end)}, position of the array's closing bracket).
     """
+    decoder = json.JSONDecoder()
+    pos = _skip_ws(text, 0)
+    if text[pos:pos + 1] != '{':
+        raise ValueError("Target file is not a JSON object")
+    pos += 1
+    while True:
+        pos = _skip_ws(text, pos)
+        if text[pos] == '}':
+            break
+        key, pos = decoder.raw_decode(text, pos)
+        pos = _skip_ws(text, pos)
+        pos = _skip_ws(text, pos + 1)  # ':'
+        if key == 'scenarios' and text[pos] == '[':
+            spans = {}
+            pos = _skip_ws(text, pos + 1)
+            while text[pos] != ']':
+                scenario, end = decoder.raw_decode(text, pos)
+                spans[scenario.get('id')] = (pos, end)
+                pos = _skip_ws(text, end)
+                if text[pos] == ',':
+                    pos = _skip_ws(text, pos + 1)
+            return spans, pos
+        _, pos = decoder.raw_decode(text, pos)
+        pos = _skip_ws(text, pos)
+        if text[pos] == ',':
+            pos += 1
+    raise ValueError("No scenarios array found in the target file")
+
+def load_manifest(manifest_file: Path) -> Dict:
+    """Read the sync manifest; an unreadable or outdated one counts as empty."""
     try:
-        # Assuming the script is in the 'scripts' directory, and scenarios.json is in 'ESLFeeder/Config'
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(script_dir)
-        file_path = os.path.join(project_root, 'ESLFeeder', 'Config', 'scenarios.json')
+        manifest = json.loads(Path(manifest_file).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+def save_manifest(manifest_file: Path, file_hash: str, spans: Dict, array_end: int,
+                  target_hashes: Dict, source_hashes: Dict) -> None:
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'target_file_hash': file_hash,
+        'array_end': array_end,
+        'spans': {str(k): list(v) for k, v in spans.items()},
+        'target': {str(k): v for k, v in target_hashes.items()},
+        'source': {str(k): v for k, v in source_hashes.items()},
+    }
+    Path(manifest_file).write_text(json.dumps(manifest, indent=1), encoding='utf-8')
+
+def load_source_scenarios(source_file: str) -> List[Dict]:
+    """Source scenarios: a JSON list, or an object with a "scenarios" list."""
+    with open(source_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('scenarios', [])
+    return data
+
+def prepare_source(source_scenario: Dict) -> Dict:
+    """Workbook exports (scenario_to_json.py) carry "fields"; convert them to "updates" first."""
+    if 'fields' in source_scenario and 'updates' not in source_scenario:
+        return transform_scenario(source_scenario)
+    return source_scenario
+
+def _indent_at(text: str, pos: int) -> str:
+    line_start = text.rfind('\n', 0, pos) + 1
+    prefix = text[line_start:pos]
+    return prefix if not prefix.strip() else ' ' * len(prefix)
+
+def _dump_at(obj: Dict, indent: str) -> str:
+    return json.dumps(obj, indent=2).replace('\n', '\n' + indent)
+
+def rebuild_text(text: str, spans: Dict, array_end: int, replacements: Dict,
+                 additions: List[Dict]) -> Tuple[str, Dict, int]:
+    """
+    Splice replaced and added scenarios into the file text.
+
+    Everything outside the replaced spans is copied unchanged.  Returns the
+    new text, the new spans and the new position of the closing bracket.
+    """
+    if not spans and additions:
+        # Empty array: lay the new scenarios out one level deeper than the bracket line
+        open_pos = text.rfind('[', 0, array_end)
+        line_start = text.rfind('\n', 0, open_pos) + 1
+        outer = re.match(r'[ \t]*', text[line_start:open_pos]).group(0)
+        indent = outer + '  '
+        pieces, new_spans = [text[:open_pos + 1]], {}
+        out_len = open_pos + 1
+        for i, scenario in enumerate(additions):
+            sep = ('\n' if i == 0 else ',\n') + indent
+            chunk = _dump_at(scenario, indent)
+            new_spans[scenario['id']] = (out_len + len(sep), out_len + len(sep) + len(chunk))
+            pieces.append(sep + chunk)
+            out_len += len(sep) + len(chunk)
+        pieces.append('\n' + outer)
+        out_len += 1 + len(outer)
+        pieces.append(text[array_end:])
+        return ''.join(pieces), new_spans, out_len
+
+    pieces, new_spans, pos, out_len = [], {}, 0, 0
+    ordered = sorted(spans.items(), key=lambda item: item[1][0])
+
+    def emit(piece):
+        nonlocal out_len
+        pieces.append(piece)
+        out_len += len(piece)
+
+    for scenario_id, (start, end) in ordered:
+        emit(text[pos:start])
+        if scenario_id in replacements:
+            chunk = _dump_at(replacements[scenario_id], _indent_at(text, start))
+        else:
+            chunk = text[start:end]
+        new_spans[scenario_id] = (out_len, out_len + len(chunk))
+        emit(chunk)
+        pos = end
+
+    # New scenarios go right after the last existing one
+    if additions:
+        indent = _indent_at(text, ordered[-1][1][0])
+        for scenario in additions:
+            emit(',\n' + indent)
+            chunk = _dump_at(scenario, indent)
+            new_spans[scenario['id']] = (out_len, out_len + len(chunk))
+            emit(chunk)
+    emit(text[pos:array_end])
+    new_array_end = out_len
+    emit(text[array_end:])
+    return ''.join(pieces), new_spans, new_array_end
+
+def sync_scenarios(source_file: str, target_file: str, manifest_file: Optional[str] = None,
+                   full: bool = False, dry_run: bool = False, review_file: Optional[str] = None,
+                   json_report: Optional[str] = None, confirm=None) -> Dict:
+    """
+    Incrementally apply source scenarios to the target scenarios.json.
+
+    Only scenarios whose source hash or target text hash differs from the
+    manifest are transformed and compared; the rest are not even decoded when
+    the target file itself is unchanged since the last sync.
+    """
+    if is_compact_file(target_file):
+        # The sync rewrites scenario spans of today's layout in place
+        raise ValueError(f"{target_file} is a compact catalog; expand it first "
+                         f"(python scenario_catalog.py {target_file} -o scenarios.json)")
+    manifest_file = Path(manifest_file) if manifest_file else default_manifest_path(target_file)
+    with open(target_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+    file_hash = text_hash(text)
+    manifest = {} if full else load_manifest(manifest_file)
+
+    if manifest.get('target_file_hash') == file_hash:
+        spans = {int(k): tuple(v) for k, v in manifest['spans'].items()}
+        array_end = manifest['array_end']
+        target_hashes = {int(k): v for k, v in manifest['target'].items()}
+    else:
+        spans, array_end = scan_scenario_spans(text)
+        target_hashes = {k: text_hash(text[s:e]) for k, (s, e) in spans.items()}
+    known_source = {int(k): v for k, v in manifest.get('source', {}).items()}
+    known_target = {int(k): v for k, v in manifest.get('target', {}).items()}
+
+    source_scenarios = load_source_scenarios(source_file)
+    source_hashes = {}
+    changed = []
+    for source_scenario in source_scenarios:
+        scenario_id = source_scenario['id']
+        source_hashes[scenario_id] = content_hash(source_scenario)
+        if (source_hashes[scenario_id] != known_source.get(scenario_id)
+                or scenario_id not in spans
+                or target_hashes.get(scenario_id) != known_target.get(scenario_id)):
+            changed.append(source_scenario)
+
+    replacements, additions, changes, names = {}, [], [], {}
+    for source_scenario in changed:
+        scenario_id = source_scenario['id']
+        prepared = prepare_source(source_scenario)
+        if scenario_id in spans:
+            start, end = spans[scenario_id]
+            current = json.loads(text[start:end])
+            proposed = update_scenario(current, prepared)
+            scenario_changes = diff_scenario(current, proposed, scenario_id)
+            if scenario_changes:
+                replacements[scenario_id] = proposed
+                changes.extend(scenario_changes)
+                names[scenario_id] = current.get('name', '')
+        else:
+            new_scenario = create_new_scenario(prepared)
+            additions.append(new_scenario)
+            changes.append(Change(scenario_id, 'scenario_added', (), new=new_scenario))
+
+    summary = {
+        'source': len(source_scenarios),
+        'checked': len(changed),
+        'updated': sorted(replacements),
+        'added': [s['id'] for s in additions],
+        'changes': len(changes),
+        'written': False,
+    }
+
+    write_change_reports(changes, names, review_file if changes else None, json_report)
+    has_changes = bool(replacements or additions)
+    apply = has_changes and not dry_run and (confirm is None or confirm(changes, names))
+
+    if apply:
+        new_text, spans, array_end = rebuild_text(text, spans, array_end, replacements, additions)
+        backup_file = make_backup(target_file)
+        with open(target_file, 'w', encoding='utf-8', newline='') as f:
+            f.write(new_text)
+        text, file_hash = new_text, text_hash(new_text)
+        for scenario_id in list(replacements) + summary['added']:
+            start, end = spans[scenario_id]
+            target_hashes[scenario_id] = text_hash(text[start:end])
+        summary['written'] = True
+        summary['backup'] = backup_file
+
+    if apply or (not has_changes and not dry_run):
+        # Record the state we are in sync with; skipped/declined changes stay pending, and a
+        # dry run writes nothing
+        save_manifest(manifest_file, file_hash, spans, array_end, target_hashes, source_hashes)
+    return summary
 
+def make_backup(target_file: str) -> str:
+    """Copy target_file to <target>.<timestamp>.bak; an existing backup is never overwritten"""
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    for attempt in itertools.count():
+        backup_file = f"{target_file}.{stamp}{f'_{attempt}' if attempt else ''}.bak"
+        try:
+            with open(target_file, 'rb') as src, open(backup_file, 'xb') as dst:
+                shutil.copyfileobj(src, dst)
+        except FileExistsError:
+            continue
+        shutil.copystat(target_file, backup_file)
+        return backup_file
+
+def cleanup_skip_scenarios(file_path: str) -> None:
+    """
+    Updates the scenarios.json file to remove process_levels and reason_code from skip scenarios.
+    """
+    try:
         with open(file_path, 'r') as f:
             data = json.load(f)
 
@@ -515,16 +645,19 @@ def main():
                 if 'reason_code' in scenario:
                     del scenario['reason_code']
                     updated = True
-                
+
                 if updated:
                     updated_count += 1
 
         if updated_count > 0:
             print(f"Updated {updated_count} skip scenarios.")
-            with open(file_path, 'w') as f:
-                json.dump(data, f, indent=2)
-            print(f"Successfully updated {file_path}.")
+            if is_compact(data):
+                write_compact(data, file_path)
             else:
+                with open(file_path, 'w') as f:
+                    json.dump(data, f, indent=2)
+            print(f"Successfully updated {file_path}.")
+        else:
             print("No skip scenarios needed updating.")
 
     except FileNotFoundError:
@@ -537,5 +670,56 @@ def main():
         print(f"An unexpected error occurred: {e}")
         sys.exit(1)
 
+def main():
+    # Assuming the script is in the 'scripts' directory, and scenarios.json is in 'ESLFeeder/Config'
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(script_dir)
+    default_target = os.path.join(project_root, 'ESLFeeder', 'Config', 'scenarios.json')
+
+    parser = argparse.ArgumentParser(description="Update scenarios.json from ESLScenarios.json / new_scenarios.json.")
+    parser.add_argument('--source', help="Source scenarios (ESLScenarios.json or scenario_to_json.py output). "
+                                         "Without it, only skip scenarios are cleaned up.")
+    parser.add_argument('--target', default=default_target, help="Path to scenarios.json")
+    parser.add_argument('--review', action='store_true',
+                        help="Step through the changes, write a review file and ask before saving")
+    parser.add_argument('--review-file', default='scenario_update_review.txt', help="Where --review writes the changes")
+    parser.add_argument('--json-report', help="Also write the changes as a JSON change report")
+    parser.add_argument('--manifest', help="Sync manifest (default: scenarios.manifest.json next to the target)")
+    parser.add_argument('--full', action='store_true', help="Ignore the manifest and re-check every scenario")
+    parser.add_argument('--dry-run', action='store_true', help="Report changes without writing anything")
+    args = parser.parse_args()
+
+    if not args.source:
+        cleanup_skip_scenarios(args.target)
+        return
+
+    for path in (args.source, args.target):
+        if not os.path.exists(path):
+            print(f"Error: The file at {path} was not found.")
+            sys.exit(1)
+
+    def confirm(changes, names):
+        review_changes(changes, names)
+        print(f"\033[93mReview written to {args.review_file}. Apply these changes? (y/n)\033[0m")
+        return input().strip().lower() in ('y', 'yes')
+
+    try:
+        summary = sync_scenarios(args.source, args.target, args.manifest, full=args.full,
+                                 dry_run=args.dry_run,
+                                 review_file=args.review_file if args.review else None,
+                                 json_report=args.json_report,
+                                 confirm=confirm if args.review else None)
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"Error: Could not read scenarios: {e}")
+        sys.exit(1)
+
+    print(f"Checked {summary['checked']} of {summary['source']} source scenarios "
+          f"({summary['source'] - summary['checked']} unchanged since the last sync).")
+    print(f"Updated: {summary['updated'] or 'none'}  Added: {summary['added'] or 'none'}")
+    if summary['written']:
+        print(f"Successfully updated {args.target} (backup: {summary['backup']}).")
+    elif summary['updated'] or summary['added']:
+        print("No changes were written.")
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()